@@ -5,7 +5,8 @@ from .models import (
     OrdenPausa, OrdenDocumento, Producto, Servicio, OrdenItem, 
     Notificacion, Taller, LlaveVehiculo, PrestamoLlave, 
     LlaveHistorialEstado, AgendamientoHistorial, AgendamientoDocumento,
-    ChatRoom, ChatMessage
+    ChatRoom, ChatMessage, CorreoPendiente, NotificacionArchivada,
+    KitMantenimiento, KitMantenimientoItem, ReservaRepuesto
 )
 
 from .forms import UsuarioCreationForm 
@@ -130,6 +131,26 @@ class ServicioAdmin(admin.ModelAdmin):
     search_fields = ('nombre',)
 
 
+class KitMantenimientoItemInline(admin.TabularInline):
+    model = KitMantenimientoItem
+    extra = 1
+    autocomplete_fields = ['producto']
+
+@admin.register(KitMantenimiento)
+class KitMantenimientoAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'activo', 'actualizado_en')
+    list_filter = ('activo',)
+    inlines = [KitMantenimientoItemInline]
+
+@admin.register(ReservaRepuesto)
+class ReservaRepuestoAdmin(admin.ModelAdmin):
+    list_display = ('id', 'agendamiento', 'producto', 'cantidad', 'estado', 'actualizado_en')
+    list_select_related = ('agendamiento__vehiculo', 'producto')
+    list_filter = ('estado',)
+    search_fields = ('agendamiento__vehiculo__patente', 'producto__sku', 'producto__nombre')
+    readonly_fields = ('agendamiento', 'producto', 'cantidad', 'estado', 'orden_item', 'creado_en', 'actualizado_en')
+
+
 
 
 
@@ -176,11 +197,30 @@ class NotificacionAdmin(admin.ModelAdmin):
 
 
 
+@admin.register(NotificacionArchivada)
+class NotificacionArchivadaAdmin(admin.ModelAdmin):
+    list_display = ('usuario', 'mensaje', 'fecha', 'archivada_en')
+    search_fields = ('usuario__username', 'mensaje')
+    readonly_fields = ('usuario', 'mensaje', 'link', 'fecha', 'archivada_en')
+    list_per_page = 20
+
+
+@admin.register(CorreoPendiente)
+class CorreoPendienteAdmin(admin.ModelAdmin):
+    list_display = ('destinatario', 'asunto', 'estado', 'intentos', 'proximo_intento', 'enviado_en')
+    list_filter = ('estado',)
+    search_fields = ('destinatario', 'asunto')
+    readonly_fields = ('creado_en', 'enviado_en', 'ultimo_error')
+    list_per_page = 20
+
+
+
+
 class ChatMessageInline(admin.TabularInline):
     """Permite ver los mensajes dentro de la vista de la Sala de Chat."""
     model = ChatMessage
-    fields = ('autor', 'contenido', 'creado_en', 'leido_por')
-    readonly_fields = ('autor', 'contenido', 'creado_en', 'leido_por')
+    fields = ('autor', 'contenido', 'creado_en')
+    readonly_fields = ('autor', 'contenido', 'creado_en')
     extra = 0
     ordering = ('creado_en',)
 
@@ -202,4 +242,4 @@ class ChatMessageAdmin(admin.ModelAdmin):
     @admin.display(description='Leído', boolean=True)
     def leido(self, obj):
 
-        return obj.leido_por.exclude(id=obj.autor_id).exists()
\ No newline at end of file
+        return obj.room.lecturas.filter(ultimo_mensaje_leido__gte=obj.id).exclude(usuario_id=obj.autor_id).exists()
\ No newline at end of file
@@ -0,0 +1,432 @@
+"""
+Disponibilidad de los mecánicos para asignar citas.
+
+Las citas que ocupan a un mecánico (Confirmado / En Taller) se leen con una
+sola consulta por rango de fechas y se cargan en memoria como intervalos
+ordenados y fusionados (Ocupacion). Sobre esa estructura, saber si un
+horario está libre es una búsqueda binaria, y listar los huecos de un día
+es un recorrido lineal, sin volver a consultar la base de datos.
+"""
+
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .kits import kit_vigente, kits_disponibles, reservar_kits
+from .models import Agendamiento, AgendamientoHistorial
+from .notificaciones import notificar_roles, notificar_usuarios
+
+User = get_user_model()
+
+AGENDA_HORA_INICIO = getattr(settings, "AGENDA_HORA_INICIO", 9)
+AGENDA_HORA_FIN = getattr(settings, "AGENDA_HORA_FIN", 19)
+AGENDA_PASO_MINUTOS = getattr(settings, "AGENDA_PASO_MINUTOS", 30)
+# Margen mínimo entre "ahora" y el primer horario que se puede ofrecer.
+AGENDA_MARGEN_MINUTOS = getattr(settings, "AGENDA_MARGEN_MINUTOS", 5)
+
+# Estados en que una cita ocupa al mecánico (los mismos que valida
+# confirmar_y_asignar) y en que ocupa al vehículo.
+ESTADOS_OCUPAN_MECANICO = [
+    Agendamiento.Estado.CONFIRMADO,
+    Agendamiento.Estado.EN_TALLER,
+]
+# Lista positiva (y no "todo menos Finalizado/Cancelado") para que la
+# consulta pueda buscar en el índice agenda_vehiculo_estado_idx.
+ESTADOS_OCUPAN_VEHICULO = [
+    Agendamiento.Estado.PROGRAMADO,
+    Agendamiento.Estado.CONFIRMADO,
+    Agendamiento.Estado.EN_TALLER,
+]
+
+
+class Ocupacion:
+    """
+    Intervalos ocupados [inicio, fin) de un recurso, ordenados y sin
+    solaparse (los que se tocan o se cruzan se fusionan al cargar).
+    """
+
+    def __init__(self, intervalos=()):
+        self.inicios = []
+        self.fines = []
+        for inicio, fin in sorted(intervalos):
+            if self.fines and inicio <= self.fines[-1]:
+                self.fines[-1] = max(self.fines[-1], fin)
+            else:
+                self.inicios.append(inicio)
+                self.fines.append(fin)
+
+    def esta_libre(self, inicio, fin):
+        """True si [inicio, fin) no se cruza con ningún intervalo ocupado."""
+        # El único candidato a cruzarse es el último que empieza antes de 'fin'.
+        i = bisect_left(self.inicios, fin) - 1
+        return i < 0 or self.fines[i] <= inicio
+
+    def huecos(self, desde, hasta):
+        """Intervalos libres [inicio, fin) dentro de [desde, hasta)."""
+        huecos = []
+        cursor = desde
+        i = bisect_right(self.fines, desde)
+        while i < len(self.inicios) and self.inicios[i] < hasta:
+            if self.inicios[i] > cursor:
+                huecos.append((cursor, self.inicios[i]))
+            cursor = max(cursor, self.fines[i])
+            i += 1
+        if cursor < hasta:
+            huecos.append((cursor, hasta))
+        return huecos
+
+    def agregar(self, inicio, fin):
+        """Marca [inicio, fin) como ocupado, fusionándolo con sus vecinos."""
+        i = bisect_left(self.fines, inicio)
+        j = bisect_right(self.inicios, fin)
+        if i < j:
+            inicio = min(inicio, self.inicios[i])
+            fin = max(fin, self.fines[j - 1])
+        self.inicios[i:j] = [inicio]
+        self.fines[i:j] = [fin]
+
+    def unir(self, otra):
+        """Ocupación combinada de dos recursos (p. ej. mecánico + vehículo)."""
+        return Ocupacion(
+            list(zip(self.inicios, self.fines)) + list(zip(otra.inicios, otra.fines))
+        )
+
+
+def citas_que_ocupan(mecanico_ids, desde, hasta, vehiculo_ids=(), excluir_ids=()):
+    """
+    Citas que se cruzan con [desde, hasta) y que ocupan a alguno de los
+    mecánicos o de los vehículos indicados.
+    """
+    filtro = Q(
+        mecanico_asignado_id__in=mecanico_ids, estado__in=ESTADOS_OCUPAN_MECANICO
+    )
+    if vehiculo_ids:
+        filtro |= Q(vehiculo_id__in=vehiculo_ids, estado__in=ESTADOS_OCUPAN_VEHICULO)
+    return Agendamiento.objects.filter(
+        filtro, fecha_hora_programada__lt=hasta, fecha_hora_fin__gt=desde
+    ).exclude(pk__in=excluir_ids)
+
+
+def cargar_ocupaciones(mecanico_ids, desde, hasta, vehiculo_ids=(), excluir_ids=()):
+    """
+    Lee en una sola consulta (ver citas_que_ocupan) la ocupación de los
+    mecánicos y vehículos indicados en [desde, hasta). Devuelve dos
+    diccionarios {id: Ocupacion}: por mecánico y por vehículo.
+    """
+    citas = citas_que_ocupan(mecanico_ids, desde, hasta, vehiculo_ids, excluir_ids)
+
+    mecanicos, vehiculos = set(mecanico_ids), set(vehiculo_ids)
+    por_mecanico = defaultdict(list)
+    por_vehiculo = defaultdict(list)
+    for mecanico_id, vehiculo_id, estado, inicio, fin in citas.values_list(
+        "mecanico_asignado_id",
+        "vehiculo_id",
+        "estado",
+        "fecha_hora_programada",
+        "fecha_hora_fin",
+    ):
+        if mecanico_id in mecanicos and estado in ESTADOS_OCUPAN_MECANICO:
+            por_mecanico[mecanico_id].append((inicio, fin))
+        if vehiculo_id in vehiculos and estado in ESTADOS_OCUPAN_VEHICULO:
+            por_vehiculo[vehiculo_id].append((inicio, fin))
+
+    return (
+        {pk: Ocupacion(por_mecanico[pk]) for pk in mecanico_ids},
+        {pk: Ocupacion(por_vehiculo[pk]) for pk in vehiculo_ids},
+    )
+
+
+def jornadas(fecha_desde, fecha_hasta):
+    """(inicio, fin) del horario de atención de cada día, en la hora local."""
+    zona = timezone.get_current_timezone()
+    dia = fecha_desde
+    while dia <= fecha_hasta:
+        yield (
+            datetime.combine(dia, time(AGENDA_HORA_INICIO), tzinfo=zona),
+            datetime.combine(dia, time(AGENDA_HORA_FIN), tzinfo=zona),
+        )
+        dia += timedelta(days=1)
+
+
+def matriz_disponibilidad(mecanico_ids, fecha_desde, fecha_hasta, paso_minutos=None):
+    """
+    Mapa de bits por mecánico y día: un carácter por bloque de
+    'paso_minutos' del horario de atención, "1" si el bloque está (aunque
+    sea en parte) ocupado y "0" si está libre. Una sola consulta para
+    todos los mecánicos y días.
+    """
+    paso = timedelta(minutes=paso_minutos or AGENDA_PASO_MINUTOS)
+    dias = list(jornadas(fecha_desde, fecha_hasta))
+    if not dias:
+        return {pk: {} for pk in mecanico_ids}
+    ocupaciones, _ = cargar_ocupaciones(mecanico_ids, dias[0][0], dias[-1][1])
+
+    matriz = {}
+    for mecanico_id in mecanico_ids:
+        ocupacion = ocupaciones[mecanico_id]
+        por_dia = {}
+        for inicio_jornada, fin_jornada in dias:
+            bloques = []
+            inicio = inicio_jornada
+            while inicio < fin_jornada:
+                fin = min(inicio + paso, fin_jornada)
+                bloques.append("0" if ocupacion.esta_libre(inicio, fin) else "1")
+                inicio = fin
+            por_dia[inicio_jornada.date().isoformat()] = "".join(bloques)
+        matriz[mecanico_id] = por_dia
+    return matriz
+
+
+def _alinear(momento, inicio_jornada, paso):
+    """Primer múltiplo de 'paso' (contado desde el inicio de la jornada) >= momento."""
+    transcurrido = (momento - inicio_jornada).total_seconds()
+    pasos = -(-transcurrido // paso.total_seconds())
+    return inicio_jornada + pasos * paso
+
+
+def horarios_disponibles(
+    mecanico_ids,
+    fecha_desde,
+    fecha_hasta,
+    duracion_minutos,
+    vehiculo=None,
+    excluir=None,
+    paso_minutos=None,
+):
+    """
+    Para cada mecánico, los huecos libres dentro del horario de atención
+    entre las fechas indicadas donde cabe una cita de 'duracion_minutos',
+    y los horarios de inicio posibles (cada 'paso_minutos'). Si se indica
+    el vehículo, también se evitan sus otras citas activas.
+    """
+    duracion = timedelta(minutes=duracion_minutos)
+    paso = timedelta(minutes=paso_minutos or AGENDA_PASO_MINUTOS)
+    dias = list(jornadas(fecha_desde, fecha_hasta))
+    if not dias:
+        return {pk: {"huecos": [], "inicios": []} for pk in mecanico_ids}
+
+    vehiculo_ids = [vehiculo.pk] if vehiculo is not None else []
+    ocupaciones, por_vehiculo = cargar_ocupaciones(
+        mecanico_ids,
+        dias[0][0],
+        dias[-1][1],
+        vehiculo_ids=vehiculo_ids,
+        excluir_ids=[excluir.pk] if excluir is not None else [],
+    )
+    minimo = timezone.now() + timedelta(minutes=AGENDA_MARGEN_MINUTOS)
+
+    resultado = {}
+    for mecanico_id in mecanico_ids:
+        ocupacion = ocupaciones[mecanico_id]
+        if vehiculo is not None:
+            ocupacion = ocupacion.unir(por_vehiculo[vehiculo.pk])
+        huecos, inicios = [], []
+        for inicio_jornada, fin_jornada in dias:
+            desde = max(inicio_jornada, minimo)
+            for inicio, fin in ocupacion.huecos(desde, fin_jornada):
+                if fin - inicio < duracion:
+                    continue
+                huecos.append((timezone.localtime(inicio), timezone.localtime(fin)))
+                candidato = _alinear(inicio, inicio_jornada, paso)
+                while candidato + duracion <= fin:
+                    inicios.append(candidato)
+                    candidato += paso
+        resultado[mecanico_id] = {"huecos": huecos, "inicios": inicios}
+    return resultado
+
+
+def primer_inicio(ocupacion, extra, dias, desde, duracion, paso):
+    """
+    Primer horario (alineado a 'paso') desde 'desde' en que cabe 'duracion'
+    dentro de la jornada, libre en 'ocupacion' y en 'extra'. None si no hay.
+    """
+    for inicio_jornada, fin_jornada in dias:
+        if fin_jornada <= desde:
+            continue
+        for inicio, fin in ocupacion.huecos(max(inicio_jornada, desde), fin_jornada):
+            candidato = _alinear(inicio, inicio_jornada, paso)
+            while candidato + duracion <= fin:
+                if extra.esta_libre(candidato, candidato + duracion):
+                    return candidato
+                candidato += paso
+    return None
+
+
+def planificar_pendientes(fecha_desde, fecha_hasta, agendamiento_ids=None):
+    """
+    Asigna en una pasada mecánico y horario a las citas PROGRAMADO.
+
+    Las citas se atienden por orden de llegada (fecha solicitada y luego
+    creación). Cada una toma el primer horario libre desde su fecha
+    solicitada (o desde el inicio del horizonte) en que estén libres el
+    mecánico y el vehículo; entre mecánicos con el mismo horario, el que
+    lleva menos minutos asignados. Las citas de mantenimiento solo se
+    asignan mientras alcance el stock no reservado del kit activo.
+
+    Debe llamarse dentro de una transacción: bloquea las citas pendientes
+    y los repuestos. Devuelve (asignaciones, sin_asignar): listas de
+    (cita, mecanico, inicio) y de (cita, motivo).
+    """
+    dias = list(jornadas(fecha_desde, fecha_hasta))
+    if not dias:
+        return [], []
+    paso = timedelta(minutes=AGENDA_PASO_MINUTOS)
+    minimo = timezone.now() + timedelta(minutes=AGENDA_MARGEN_MINUTOS)
+
+    pendientes = Agendamiento.objects.filter(estado=Agendamiento.Estado.PROGRAMADO)
+    if agendamiento_ids is not None:
+        pendientes = pendientes.filter(pk__in=agendamiento_ids)
+    ids = list(pendientes.select_for_update().values_list("pk", flat=True))
+    citas = list(
+        Agendamiento.objects.filter(pk__in=ids)
+        .select_related("vehiculo", "chofer_asociado")
+        .order_by(F("fecha_hora_programada").asc(nulls_last=True), "creado_en", "pk")
+    )
+    mecanicos = list(User.activos.filter(groups__name="Mecanico").order_by("id"))
+    if not citas or not mecanicos:
+        motivo = "No hay mecánicos activos." if citas else ""
+        return [], [(cita, motivo) for cita in citas]
+
+    por_mecanico, por_vehiculo = cargar_ocupaciones(
+        [mecanico.id for mecanico in mecanicos],
+        dias[0][0],
+        dias[-1][1],
+        vehiculo_ids=list({cita.vehiculo_id for cita in citas}),
+        excluir_ids=ids,
+    )
+    carga = {mecanico.id: timedelta() for mecanico in mecanicos}
+    kit = kit_vigente() if any(cita.es_mantenimiento for cita in citas) else None
+    kits = kits_disponibles(kit, bloquear=True) if kit else 0
+
+    asignaciones, sin_asignar = [], []
+    for cita in citas:
+        if cita.es_mantenimiento and kits <= 0:
+            motivo = (
+                "Sin stock para el kit de mantenimiento."
+                if kit
+                else "No hay un kit de mantenimiento activo configurado."
+            )
+            sin_asignar.append((cita, motivo))
+            continue
+        desde = max(minimo, cita.fecha_hora_programada or minimo)
+        duracion = timedelta(minutes=cita.duracion_estimada_minutos)
+        vehiculo = por_vehiculo[cita.vehiculo_id]
+
+        mejor = None
+        for mecanico in mecanicos:
+            inicio = primer_inicio(
+                por_mecanico[mecanico.id], vehiculo, dias, desde, duracion, paso
+            )
+            if inicio is None:
+                continue
+            clave = (inicio, carga[mecanico.id], mecanico.id)
+            if mejor is None or clave < mejor[0]:
+                mejor = (clave, mecanico, inicio)
+
+        if mejor is None:
+            sin_asignar.append((cita, "No hay horario libre en el período."))
+            continue
+        _, mecanico, inicio = mejor
+        por_mecanico[mecanico.id].agregar(inicio, inicio + duracion)
+        vehiculo.agregar(inicio, inicio + duracion)
+        carga[mecanico.id] += duracion
+        if cita.es_mantenimiento:
+            kits -= 1
+        asignaciones.append((cita, mecanico, timezone.localtime(inicio)))
+
+    return asignaciones, sin_asignar
+
+
+def confirmar_asignaciones(asignaciones, usuario):
+    """
+    Confirma las citas planificadas (misma transacción que la planificación),
+    reserva los kits de las de mantenimiento y avisa a choferes, mecánicos
+    y Seguridad.
+    """
+    reservar_kits([cita for cita, _, _ in asignaciones])
+    historial = []
+    por_mecanico = defaultdict(list)
+    for cita, mecanico, inicio in asignaciones:
+        cita.mecanico_asignado = mecanico
+        cita.estado = Agendamiento.Estado.CONFIRMADO
+        cita.fecha_hora_programada = inicio
+        cita.save()
+        historial.append(
+            AgendamientoHistorial(
+                agendamiento=cita,
+                estado=cita.estado,
+                usuario=usuario,
+                comentario="Cita confirmada y asignada por planificación automática.",
+            )
+        )
+        por_mecanico[mecanico].append(cita)
+
+        if cita.chofer_asociado:
+            fecha_str = inicio.strftime("%d-%m-%Y a las %H:%M")
+            notificar_usuarios(
+                [cita.chofer_asociado],
+                f"Cita Confirmada: Su cita para {cita.vehiculo.patente} es el {fecha_str}.",
+                link="/historial",
+                asunto=f"Cita Confirmada: {cita.vehiculo.patente} el {fecha_str}",
+            )
+    AgendamientoHistorial.objects.bulk_create(historial)
+
+    for mecanico, citas in por_mecanico.items():
+        detalle = ", ".join(
+            f"{cita.vehiculo.patente} el {cita.fecha_hora_programada:%d-%m %H:%M}"
+            for cita in citas
+        )
+        notificar_usuarios(
+            [mecanico],
+            f"Nuevas Citas Asignadas ({len(citas)}): {detalle}.",
+            link="/proximas-citas",
+        )
+    if asignaciones:
+        notificar_roles(
+            ["Seguridad"],
+            f"Se confirmaron {len(asignaciones)} citas nuevas. Revise el panel de ingresos.",
+            link="/panel-ingresos",
+        )
+
+
+def planificar_agenda(fecha_desde, fecha_hasta, usuario, simular=False):
+    """
+    Planifica y (salvo que se pida simular) confirma todas las citas
+    pendientes del período en una sola transacción.
+    """
+    with transaction.atomic():
+        asignaciones, sin_asignar = planificar_pendientes(fecha_desde, fecha_hasta)
+        if not simular:
+            confirmar_asignaciones(asignaciones, usuario)
+    return asignaciones, sin_asignar
+
+
+def resumen_plan(asignaciones, sin_asignar):
+    """Representación del plan para la API y el comando."""
+    return {
+        "asignadas": [
+            {
+                "agendamiento": cita.pk,
+                "patente": cita.vehiculo.patente,
+                "mecanico": mecanico.id,
+                "mecanico_nombre": mecanico.get_full_name() or mecanico.username,
+                "inicio": inicio,
+                "fin": inicio + timedelta(minutes=cita.duracion_estimada_minutos),
+            }
+            for cita, mecanico, inicio in asignaciones
+        ],
+        "sin_asignar": [
+            {
+                "agendamiento": cita.pk,
+                "patente": cita.vehiculo.patente,
+                "motivo": motivo,
+            }
+            for cita, motivo in sin_asignar
+        ],
+    }
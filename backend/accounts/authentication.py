@@ -0,0 +1,39 @@
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from .roles import ROLES_CACHE_ATTR
+from .tokens import ROLES_CLAIM, ROLES_VERSION_CLAIM, TicketEventos
+
+
+class RolJWTAuthentication(JWTAuthentication):
+    """
+    Autenticación JWT que toma los roles desde los claims del token.
+
+    Si la versión de roles del token coincide con la del usuario (que ya se
+    carga para autenticar), los grupos no se vuelven a consultar en la BD.
+    Si no coincide (el usuario cambió de rol), se ignoran los claims y los
+    roles se resuelven desde la BD como siempre.
+    """
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+
+        roles = validated_token.get(ROLES_CLAIM)
+        version = validated_token.get(ROLES_VERSION_CLAIM)
+        if roles is not None and version == user.roles_version:
+            setattr(user, ROLES_CACHE_ATTR, frozenset(roles))
+        return user
+
+
+def usuario_desde_ticket(raw_ticket):
+    """
+    Valida un TicketEventos (firma, vencimiento y tipo) y devuelve su
+    usuario activo. Lanza InvalidToken o AuthenticationFailed.
+    """
+    if not raw_ticket:
+        raise InvalidToken("No se entregó un ticket.")
+    try:
+        ticket = TicketEventos(raw_ticket)
+    except TokenError as e:
+        raise InvalidToken(e.args[0])
+    return RolJWTAuthentication().get_user(ticket)
@@ -0,0 +1,223 @@
+"""
+Estado de lectura del chat.
+
+Cada participante tiene, por sala, una marca de agua (ChatLectura) con el
+id del último mensaje que leyó. Los mensajes no leídos son los de la sala
+con id mayor a esa marca y que no escribió él mismo.
+"""
+
+import re
+import unicodedata
+
+from django.db import transaction
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, IntegerField, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import ChatLectura, ChatMessage, ChatRoom, ChatTermino
+
+# Largo máximo de un término del índice de búsqueda (ChatTermino.termino).
+TERMINO_MAX = 40
+TERMINO_MIN = 2
+# Largo mínimo de la última palabra para buscarla también como prefijo.
+PREFIJO_MIN = 3
+
+
+def asegurar_lecturas(room_id, usuario_ids):
+    """Crea la marca de lectura (en 0) de los participantes que no la tengan."""
+    ChatLectura.objects.bulk_create(
+        [ChatLectura(room_id=room_id, usuario_id=pk) for pk in usuario_ids],
+        ignore_conflicts=True,
+    )
+
+
+def marcar_leido(room_id, usuario_id, hasta_id=None):
+    """
+    Avanza la marca de lectura del usuario en la sala hasta el último
+    mensaje existente con id <= 'hasta_id' (por defecto, el último de la
+    sala). Nunca retrocede ni apunta a mensajes que aún no existen.
+    Es un solo UPDATE; devuelve True si la marca avanzó.
+    """
+    ultimo = ChatMessage.objects.filter(room_id=room_id)
+    if hasta_id is not None:
+        ultimo = ultimo.filter(id__lte=hasta_id)
+    ultimo = Subquery(ultimo.order_by("-id").values("id")[:1])
+    actualizadas = ChatLectura.objects.filter(
+        room_id=room_id,
+        usuario_id=usuario_id,
+        ultimo_mensaje_leido__lt=ultimo,
+    ).update(ultimo_mensaje_leido=ultimo, leido_en=timezone.now())
+    return actualizadas > 0
+
+
+def mensajes_no_leidos(usuario):
+    """Mensajes de otros, posteriores a la marca de lectura del usuario."""
+    return ChatMessage.objects.filter(
+        room__lecturas__usuario=usuario,
+        id__gt=F("room__lecturas__ultimo_mensaje_leido"),
+    ).exclude(autor=usuario)
+
+
+def contar_no_leidos(usuario):
+    return mensajes_no_leidos(usuario).count()
+
+
+def bandeja_salas(usuario):
+    """
+    Salas visibles del usuario con su último mensaje y la cantidad de no
+    leídos de cada una, calculados con subconsultas correlacionadas (usan
+    los índices (room, id) y (room, usuario)). Los participantes y sus
+    grupos vienen con prefetch: el número de consultas no depende de
+    cuántas salas haya.
+    """
+    ultimo = ChatMessage.objects.filter(room=OuterRef("pk")).order_by("-id")
+    marca = ChatLectura.objects.filter(room=OuterRef("pk"), usuario=usuario).values(
+        "ultimo_mensaje_leido"
+    )[:1]
+    no_leidos = (
+        ChatMessage.objects.filter(room=OuterRef("pk"), id__gt=OuterRef("marca"))
+        .exclude(autor=usuario)
+        .order_by()
+        .values("room")
+        .annotate(total=Count("id"))
+        .values("total")
+    )
+    participantes = get_user_model().objects.prefetch_related("groups")
+    return (
+        usuario.chat_rooms.exclude(oculto_para=usuario)
+        .annotate(
+            ultimo_id=Subquery(ultimo.values("id")[:1]),
+            ultimo_autor_id=Subquery(ultimo.values("autor")[:1]),
+            ultimo_contenido=Subquery(ultimo.values("contenido")[:1]),
+            ultimo_archivo=Subquery(ultimo.values("archivo")[:1]),
+            ultimo_creado_en=Subquery(ultimo.values("creado_en")[:1]),
+            marca=Coalesce(Subquery(marca), Value(0)),
+        )
+        .annotate(
+            no_leidos=Coalesce(
+                Subquery(no_leidos, output_field=IntegerField()), Value(0)
+            )
+        )
+        .prefetch_related(Prefetch("participantes", queryset=participantes))
+        .order_by("-actualizado_en")
+    )
+
+
+def pagina_mensajes(mensajes, antes=None, despues=None, limite=50):
+    """
+    Pagina los mensajes de una sala por id (usa el índice (room, id)).
+    Con 'despues' devuelve los siguientes en orden; si no, los más
+    recientes anteriores a 'antes' (o a todo). Siempre en orden
+    cronológico. Devuelve (mensajes, hay_mas): 'hay_mas' indica si quedan
+    más mensajes en la misma dirección.
+    """
+    if despues is not None:
+        pagina = list(mensajes.filter(id__gt=despues).order_by("id")[: limite + 1])
+        return pagina[:limite], len(pagina) > limite
+
+    if antes is not None:
+        mensajes = mensajes.filter(id__lt=antes)
+    pagina = list(mensajes.order_by("-id")[: limite + 1])
+    hay_mas = len(pagina) > limite
+    return pagina[:limite][::-1], hay_mas
+
+
+def clave_par(usuario_a_id, usuario_b_id):
+    """Clave canónica de un chat 1-a-1: el orden de los usuarios no importa."""
+    menor, mayor = sorted((usuario_a_id, usuario_b_id))
+    return f"{menor}:{mayor}"
+
+
+def obtener_o_crear_sala_directa(usuario, otro):
+    """
+    Busca la sala 1-a-1 entre dos usuarios por su clave única (una consulta
+    por índice) o la crea. La restricción única evita que dos peticiones
+    simultáneas creen salas duplicadas. Devuelve (sala, creada).
+    """
+    with transaction.atomic():
+        room, creada = ChatRoom.objects.get_or_create(
+            clave_par=clave_par(usuario.pk, otro.pk),
+            defaults={
+                "nombre": f"Chat entre {usuario.get_full_name()} y {otro.get_full_name()}"
+            },
+        )
+        if creada:
+            room.participantes.add(usuario, otro)
+    return room, creada
+
+
+def terminos_busqueda(texto):
+    """
+    Palabras distintas de un texto, normalizadas para el índice: en
+    minúsculas, sin tildes y de al menos TERMINO_MIN caracteres.
+    """
+    texto = unicodedata.normalize("NFKD", (texto or "").lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return {
+        palabra[:TERMINO_MAX]
+        for palabra in re.findall(r"\w+", texto)
+        if len(palabra) >= TERMINO_MIN
+    }
+
+
+def indexar_mensaje(mensaje, creado=True):
+    """Guarda (o rehace) las entradas del índice de búsqueda de un mensaje."""
+    if not creado:
+        ChatTermino.objects.filter(mensaje=mensaje).delete()
+    ChatTermino.objects.bulk_create(
+        ChatTermino(termino=termino, room_id=mensaje.room_id, mensaje=mensaje)
+        for termino in terminos_busqueda(mensaje.contenido)
+    )
+
+
+def buscar_mensajes(usuario, consulta, room_id=None, antes=None, limite=50):
+    """
+    Busca mensajes que contengan todas las palabras de 'consulta' (la última
+    también como prefijo, para buscar mientras se escribe), solo en las
+    salas visibles del usuario (las de su bandeja). Cada palabra es una
+    búsqueda por el índice (termino, room, mensaje); no se recorre el texto
+    de los mensajes. Son dos consultas, tenga el usuario las salas que
+    tenga: los ids de la página y los mensajes.
+    Devuelve (mensajes, hay_mas), del más reciente al más antiguo.
+    """
+    palabras = re.findall(r"\w+", consulta or "")
+    terminos = terminos_busqueda(consulta)
+    if not terminos:
+        return [], False
+    ultimo = terminos_busqueda(palabras[-1]) if palabras else set()
+    prefijo = next((t for t in ultimo if len(t) >= PREFIJO_MIN), None)
+
+    salas = usuario.chat_rooms.exclude(oculto_para=usuario)
+    if room_id is not None:
+        salas = salas.filter(pk=room_id)
+    salas = salas.values("pk")
+
+    def coincidencias(termino):
+        filas = ChatTermino.objects.filter(room_id__in=salas)
+        if termino == prefijo:
+            # Prefijo como rango [termino, siguiente) para usar el índice
+            # (LIKE 'x%' no siempre lo usa).
+            siguiente = termino[:-1] + chr(ord(termino[-1]) + 1)
+            return filas.filter(termino__gte=termino, termino__lt=siguiente)
+        return filas.filter(termino=termino)
+
+    # Manda la palabra exacta más larga (suele ser la más selectiva) y el
+    # resto se exige sobre el mismo mensaje; solo se ordenan sus
+    # coincidencias en las salas del usuario. Una palabra exacta tiene una
+    # sola fila por mensaje; un prefijo puede tener varias.
+    primero, *resto = sorted(
+        terminos, key=lambda t: (t != prefijo, len(t)), reverse=True
+    )
+    ids = coincidencias(primero)
+    for termino in resto:
+        ids = ids.filter(mensaje_id__in=coincidencias(termino).values("mensaje_id"))
+    if antes is not None:
+        ids = ids.filter(mensaje_id__lt=antes)
+    ids = ids.order_by("-mensaje_id").values_list("mensaje_id", flat=True)
+    if primero == prefijo:
+        ids = ids.distinct()
+    ids = list(ids[: limite + 1])
+
+    pagina = list(ChatMessage.objects.filter(id__in=ids).order_by("-id"))
+    return pagina[:limite], len(pagina) > limite
@@ -0,0 +1,230 @@
+"""
+Bandeja de salida (outbox) de correos.
+
+Las vistas no envían correos: registran un CorreoPendiente junto con el
+cambio que lo origina (en la misma transacción solo si la vista es
+atómica; si no, justo después de guardarlo). El comando 'procesar_correos'
+los envía desde la bandeja en lotes:
+
+1. Reclama el lote en una transacción corta: adelanta 'proximo_intento'
+   EMAIL_RECLAMO_SEG (un arriendo), así otro proceso no lo toma, y hace
+   commit sin esperar al servidor SMTP.
+2. Envía fuera de la transacción con un grupo fijo de EMAIL_WORKERS hilos;
+   cada hilo reutiliza su propia conexión SMTP entre lotes.
+3. Guarda el resultado de cada correo por separado en cuanto se conoce.
+
+Si el proceso muere a mitad de un lote, los correos sin resultado vuelven
+a estar disponibles al vencer el arriendo, así que no se pierden (a lo
+sumo, alguno se envía dos veces).
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from .models import CorreoPendiente
+
+EMAIL_LOTE_MAXIMO = getattr(settings, "EMAIL_LOTE_MAXIMO", 50)
+EMAIL_MAX_INTENTOS = getattr(settings, "EMAIL_MAX_INTENTOS", 6)
+EMAIL_REINTENTO_BASE_SEG = getattr(settings, "EMAIL_REINTENTO_BASE_SEG", 30)
+EMAIL_REINTENTO_MAX_SEG = getattr(settings, "EMAIL_REINTENTO_MAX_SEG", 3600)
+EMAIL_WORKERS = getattr(settings, "EMAIL_WORKERS", 2)
+EMAIL_RECLAMO_SEG = getattr(settings, "EMAIL_RECLAMO_SEG", 300)
+# Fuera de producción, todos los correos van a esta casilla.
+EMAIL_DESTINATARIO_PRUEBA = getattr(settings, "EMAIL_DESTINATARIO_PRUEBA", "")
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_conexiones = []
+_conexiones_lock = threading.Lock()
+_local = threading.local()
+
+
+def encolar_correo(destinatario, asunto, cuerpo_texto, cuerpo_html=""):
+    """Registra un correo en la bandeja de salida."""
+    return CorreoPendiente.objects.create(
+        destinatario=destinatario,
+        asunto=asunto,
+        cuerpo_texto=cuerpo_texto,
+        cuerpo_html=cuerpo_html,
+    )
+
+
+def construir_correo_notificacion(usuario, subject, message_body):
+    """
+    Arma (sin guardar) el correo de notificación con la plantilla HTML.
+    Devuelve None si el usuario no tiene email.
+    """
+    if not usuario.email:
+        logger.info("Usuario %s no tiene email, no se envía correo.", usuario.username)
+        return None
+    recipient_email = EMAIL_DESTINATARIO_PRUEBA or usuario.email
+    if EMAIL_DESTINATARIO_PRUEBA:
+        logger.debug(
+            "Correo para %s redirigido a %s (EMAIL_DESTINATARIO_PRUEBA).",
+            usuario.email,
+            recipient_email,
+        )
+    context = {
+        "subject": subject,
+        "message_body": message_body,
+        "nombre_usuario": usuario.first_name or usuario.username,
+    }
+    html_message = render_to_string("emails/notificacion_base.html", context)
+    return CorreoPendiente(
+        destinatario=recipient_email,
+        asunto=subject,
+        cuerpo_texto=strip_tags(html_message),
+        cuerpo_html=html_message,
+    )
+
+
+def enviar_correo_notificacion(usuario, subject, message_body):
+    """
+    Deja en la bandeja de salida un correo de notificación.
+    No se conecta al servidor SMTP.
+    """
+    correo = construir_correo_notificacion(usuario, subject, message_body)
+    if correo is not None:
+        correo.save()
+    return correo
+
+
+def enviar_correos_notificacion(usuarios, subject, message_body):
+    """Igual que enviar_correo_notificacion, para varios usuarios en un INSERT."""
+    correos = [
+        correo
+        for correo in (
+            construir_correo_notificacion(usuario, subject, message_body)
+            for usuario in usuarios
+        )
+        if correo is not None
+    ]
+    return CorreoPendiente.objects.bulk_create(correos)
+
+
+def _construir_mensaje(correo, conexion):
+    mensaje = EmailMultiAlternatives(
+        correo.asunto,
+        correo.cuerpo_texto,
+        None,
+        [correo.destinatario],
+        connection=conexion,
+    )
+    if correo.cuerpo_html:
+        mensaje.attach_alternative(correo.cuerpo_html, "text/html")
+    return mensaje
+
+
+def _espera_reintento(intentos):
+    segundos = EMAIL_REINTENTO_BASE_SEG * 2 ** (intentos - 1)
+    return timedelta(seconds=min(segundos, EMAIL_REINTENTO_MAX_SEG))
+
+
+def _obtener_pool():
+    global _pool
+    with _conexiones_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=EMAIL_WORKERS, thread_name_prefix="correos"
+            )
+    return _pool
+
+
+def _conexion_del_hilo():
+    """La conexión SMTP del hilo actual, que se reutiliza entre lotes."""
+    conexion = getattr(_local, "conexion", None)
+    if conexion is None:
+        conexion = _local.conexion = get_connection(fail_silently=False)
+        with _conexiones_lock:
+            _conexiones.append(conexion)
+    return conexion
+
+
+def cerrar_conexiones():
+    """Cierra las sesiones SMTP de los hilos (p. ej. con la bandeja vacía)."""
+    with _conexiones_lock:
+        for conexion in _conexiones:
+            conexion.close()
+
+
+def _enviar(correo):
+    """Envía un correo desde un hilo del grupo. Devuelve el error o None."""
+    conexion = _conexion_del_hilo()
+    try:
+        conexion.open()
+        conexion.send_messages([_construir_mensaje(correo, conexion)])
+    except Exception as e:
+        # Una sesión SMTP que falló no es confiable: se reabre.
+        conexion.close()
+        return e
+    return None
+
+
+def _reclamar(limite):
+    """Toma un lote vencido y lo arrienda; la transacción dura solo esto."""
+    ahora = timezone.now()
+    with transaction.atomic():
+        lote = list(
+            CorreoPendiente.objects.select_for_update(skip_locked=True).filter(
+                estado=CorreoPendiente.Estado.PENDIENTE,
+                proximo_intento__lte=ahora,
+            )[:limite]
+        )
+        if lote:
+            CorreoPendiente.objects.filter(pk__in=[c.pk for c in lote]).update(
+                intentos=F("intentos") + 1,
+                proximo_intento=ahora + timedelta(seconds=EMAIL_RECLAMO_SEG),
+            )
+    for correo in lote:
+        correo.intentos += 1
+    return lote
+
+
+def _guardar_resultado(correo, error):
+    if error is None:
+        campos = {
+            "estado": CorreoPendiente.Estado.ENVIADO,
+            "enviado_en": timezone.now(),
+            "ultimo_error": "",
+        }
+    elif correo.intentos >= EMAIL_MAX_INTENTOS:
+        campos = {"estado": CorreoPendiente.Estado.FALLIDO, "ultimo_error": str(error)}
+    else:
+        campos = {
+            "proximo_intento": timezone.now() + _espera_reintento(correo.intentos),
+            "ultimo_error": str(error),
+        }
+    CorreoPendiente.objects.filter(pk=correo.pk).update(**campos)
+
+
+def procesar_lote(limite=None):
+    """
+    Envía un lote de correos pendientes cuyo próximo intento ya venció.
+    Devuelve (enviados, fallidos).
+    """
+    lote = _reclamar(limite or EMAIL_LOTE_MAXIMO)
+    if not lote:
+        return 0, 0
+
+    enviados = fallidos = 0
+    pool = _obtener_pool()
+    envios = {pool.submit(_enviar, correo): correo for correo in lote}
+    for envio in as_completed(envios):
+        error = envio.result()
+        _guardar_resultado(envios[envio], error)
+        if error is None:
+            enviados += 1
+        else:
+            fallidos += 1
+    return enviados, fallidos
@@ -0,0 +1,301 @@
+"""
+Eventos en tiempo real para los clientes conectados (SSE y WebSocket).
+
+Las vistas publican eventos en un "broker" y cada conexión abierta recibe
+los de sus canales (por ejemplo "usuario:7" o "sala:3"). Hay dos brokers:
+
+- BrokerEnMemoria: vive en el proceso y solo entrega eventos a las
+  conexiones atendidas por ese mismo proceso. Sirve para desarrollo o para
+  un único proceso ASGI.
+- BrokerRedis: usa Redis pub/sub, de modo que un evento publicado por
+  cualquier proceso (o por un comando) llega a las conexiones de todos.
+  Se usa automáticamente si está configurado EVENTOS_REDIS_URL.
+
+Con más de un proceso (EVENTOS_PROCESOS, que se toma de WEB_CONCURRENCY,
+el número de workers de uvicorn) el broker en memoria perdería eventos
+en silencio, así que el servidor no arranca (ver 'obtener_broker').
+
+Ambos requieren un servidor ASGI (ver PASOS.txt); bajo WSGI el stream no
+se abre y el frontend consulta periódicamente.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+EVENTOS_BROKER = getattr(settings, "EVENTOS_BROKER", "accounts.eventos.BrokerEnMemoria")
+EVENTOS_REDIS_URL = getattr(settings, "EVENTOS_REDIS_URL", "")
+EVENTOS_COLA_MAXIMA = getattr(settings, "EVENTOS_COLA_MAXIMA", 100)
+EVENTOS_HEARTBEAT_SEG = getattr(settings, "EVENTOS_HEARTBEAT_SEG", 20)
+EVENTOS_DURACION_MAX_SEG = getattr(settings, "EVENTOS_DURACION_MAX_SEG", 900)
+EVENTOS_PROCESOS = getattr(settings, "EVENTOS_PROCESOS", 1)
+
+
+def canal_usuario(usuario_id):
+    return f"usuario:{usuario_id}"
+
+
+def canal_sala(room_id):
+    return f"sala:{room_id}"
+
+
+class Suscripcion:
+    """Cola de eventos de una conexión, ligada al event loop que la atiende."""
+
+    def __init__(self, broker, canal, maximo):
+        self.broker = broker
+        self.canal = canal
+        self.loop = asyncio.get_running_loop()
+        self.cola = asyncio.Queue(maxsize=maximo)
+
+    def entregar(self, evento):
+        # Un cliente lento no debe frenar a los demás: se descarta lo más viejo.
+        if self.cola.full():
+            self.cola.get_nowait()
+        self.cola.put_nowait(evento)
+
+    async def recibir(self, timeout):
+        """Espera el próximo evento; devuelve None si se cumple el timeout."""
+        try:
+            return await asyncio.wait_for(self.cola.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def cancelar(self):
+        self.broker.cancelar(self)
+
+
+class BrokerEnMemoria:
+    """
+    Broker dentro del proceso. 'publicar' puede llamarse desde cualquier
+    hilo (las vistas síncronas corren en hilos); la entrega se agenda en
+    el event loop de cada suscripción.
+    """
+
+    def __init__(self):
+        self._suscripciones = defaultdict(set)
+        self._lock = threading.Lock()
+
+    async def suscribir(self, canal):
+        suscripcion = Suscripcion(self, canal, EVENTOS_COLA_MAXIMA)
+        with self._lock:
+            self._suscripciones[canal].add(suscripcion)
+        return suscripcion
+
+    def cancelar(self, suscripcion):
+        with self._lock:
+            suscritos = self._suscripciones.get(suscripcion.canal)
+            if suscritos is not None:
+                suscritos.discard(suscripcion)
+                if not suscritos:
+                    del self._suscripciones[suscripcion.canal]
+
+    def tiene_suscriptores(self, canal):
+        return canal in self._suscripciones
+
+    def canales_con_suscriptores(self, canales):
+        return {canal for canal in canales if canal in self._suscripciones}
+
+    def publicar(self, canal, evento):
+        self._entregar(canal, evento)
+
+    def _entregar(self, canal, evento):
+        """Reparte el evento entre las suscripciones locales del canal."""
+        with self._lock:
+            suscritos = list(self._suscripciones.get(canal, ()))
+        for suscripcion in suscritos:
+            try:
+                suscripcion.loop.call_soon_threadsafe(suscripcion.entregar, evento)
+            except RuntimeError:
+                # El loop ya se cerró (conexión terminada).
+                self.cancelar(suscripcion)
+
+
+class BrokerRedis(BrokerEnMemoria):
+    """
+    Broker entre procesos con Redis pub/sub. Publicar es un PUBLISH (desde
+    cualquier hilo o proceso). Cada event loop abre una sola conexión de
+    suscripción, se suscribe a los canales que tienen conexiones locales y
+    reparte lo que llega entre ellas.
+    """
+
+    def __init__(self):
+        super().__init__()
+        import redis
+
+        self._redis = redis.Redis.from_url(EVENTOS_REDIS_URL)
+        self._lectores = {}
+
+    async def suscribir(self, canal):
+        suscripcion = await super().suscribir(canal)
+        lector = self._lectores.get(suscripcion.loop)
+        if lector is None:
+            lector = self._lectores[suscripcion.loop] = _LectorRedis(self)
+        await lector.escuchar(canal)
+        return suscripcion
+
+    def cancelar(self, suscripcion):
+        super().cancelar(suscripcion)
+        lector = self._lectores.get(suscripcion.loop)
+        if lector is not None and not self.tiene_suscriptores_locales(
+            suscripcion.canal
+        ):
+            lector.dejar(suscripcion.canal)
+
+    def tiene_suscriptores_locales(self, canal):
+        return canal in self._suscripciones
+
+    def tiene_suscriptores(self, canal):
+        return bool(self.canales_con_suscriptores([canal]))
+
+    def canales_con_suscriptores(self, canales):
+        # Un solo PUBSUB NUMSUB para todos los canales.
+        canales = list(canales)
+        if not canales:
+            return set()
+        return {
+            canal.decode() if isinstance(canal, bytes) else canal
+            for canal, cantidad in self._redis.pubsub_numsub(*canales)
+            if cantidad
+        }
+
+    def publicar(self, canal, evento):
+        self._redis.publish(canal, json.dumps(evento, cls=DjangoJSONEncoder))
+
+
+class _LectorRedis:
+    """Conexión de suscripción a Redis de un event loop."""
+
+    def __init__(self, broker):
+        import redis.asyncio
+
+        self.broker = broker
+        self.loop = asyncio.get_running_loop()
+        self.pubsub = redis.asyncio.Redis.from_url(EVENTOS_REDIS_URL).pubsub(
+            ignore_subscribe_messages=True
+        )
+        self.tarea = None
+
+    async def escuchar(self, canal):
+        await self.pubsub.subscribe(canal)
+        if self.tarea is None:
+            self.tarea = self.loop.create_task(self._leer())
+
+    def dejar(self, canal):
+        async def desuscribir():
+            # Pudo llegar otra conexión al canal mientras tanto.
+            if not self.broker.tiene_suscriptores_locales(canal):
+                await self.pubsub.unsubscribe(canal)
+
+        try:
+            self.loop.call_soon_threadsafe(self.loop.create_task, desuscribir())
+        except RuntimeError:
+            pass  # El loop ya se cerró.
+
+    async def _leer(self):
+        while True:
+            try:
+                mensaje = await self.pubsub.get_message(timeout=EVENTOS_HEARTBEAT_SEG)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Error leyendo eventos desde Redis; se reintenta.")
+                await asyncio.sleep(1)
+                continue
+            if mensaje is None or mensaje["type"] != "message":
+                continue
+            canal = mensaje["channel"]
+            if isinstance(canal, bytes):
+                canal = canal.decode()
+            self.broker._entregar(canal, json.loads(mensaje["data"]))
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def obtener_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                broker = import_string(EVENTOS_BROKER)()
+                if type(broker) is BrokerEnMemoria and EVENTOS_PROCESOS > 1:
+                    raise ImproperlyConfigured(
+                        f"Hay {EVENTOS_PROCESOS} procesos (WEB_CONCURRENCY) y el "
+                        "broker de eventos es en memoria: los eventos publicados "
+                        "en un proceso no llegarían a las conexiones de los "
+                        "otros. Configure EVENTOS_REDIS_URL o use un solo proceso."
+                    )
+                _broker = broker
+    return _broker
+
+
+def usuarios_conectados(usuario_ids):
+    """Filtra los ids de usuarios que tienen al menos una conexión abierta."""
+    usuario_ids = list(usuario_ids)
+    canales = obtener_broker().canales_con_suscriptores(
+        canal_usuario(pk) for pk in usuario_ids
+    )
+    return [pk for pk in usuario_ids if canal_usuario(pk) in canales]
+
+
+def publicar_eventos(eventos):
+    """
+    Publica eventos (usuario_id, tipo, datos) cuando la transacción actual
+    se confirme (si no hay transacción, de inmediato). Así un cliente nunca
+    recibe un evento de algo que finalmente no se guardó.
+    """
+    eventos = list(eventos)
+    if not eventos:
+        return
+
+    def publicar():
+        broker = obtener_broker()
+        for usuario_id, tipo, datos in eventos:
+            broker.publicar(canal_usuario(usuario_id), {"tipo": tipo, "datos": datos})
+
+    transaction.on_commit(publicar)
+
+
+def publicar_a_usuarios(usuario_ids, tipo, datos):
+    """Publica el mismo evento a varios usuarios conectados."""
+    publicar_eventos((pk, tipo, datos) for pk in usuarios_conectados(usuario_ids))
+
+
+def publicar_en_sala(room_id, tipo, datos):
+    """
+    Publica un evento a las conexiones WebSocket abiertas en una sala de
+    chat, cuando la transacción actual se confirme.
+    """
+    canal = canal_sala(room_id)
+    broker = obtener_broker()
+    if not broker.tiene_suscriptores(canal):
+        return
+    transaction.on_commit(
+        lambda: broker.publicar(canal, {"tipo": tipo, "datos": datos})
+    )
+
+
+def avisar_cambio_participantes(room_ids):
+    """
+    Avisa a las conexiones de esas salas que cambiaron los participantes:
+    cada WebSocket vuelve a comprobar que su usuario siga en la sala.
+    """
+    for room_id in room_ids:
+        publicar_en_sala(room_id, "participantes", {})
+
+
+def formato_sse(evento):
+    datos = json.dumps(evento["datos"], cls=DjangoJSONEncoder)
+    return f"event: {evento['tipo']}\ndata: {datos}\n\n"
@@ -0,0 +1,235 @@
+"""
+Kits de mantenimiento y reservas de repuestos.
+
+Al confirmar una cita de mantenimiento se reservan los repuestos del kit
+activo (ReservaRepuesto en estado RESERVADO); el ingreso convierte esas
+reservas en OrdenItem y descuenta el stock, y la cancelación las libera
+(solo cuando la cita pasa a Cancelado o Finalizado, no en cada guardado).
+Lo disponible de un producto es su stock menos lo reservado, calculado en
+una sola consulta junto con el bloqueo de las filas de producto, que se
+toma solo al reservar y en orden de SKU para no provocar esperas cruzadas.
+"""
+
+from django.db.models import F, OuterRef, Prefetch, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import (
+    Agendamiento,
+    KitMantenimiento,
+    KitMantenimientoItem,
+    OrdenItem,
+    Producto,
+    ReservaRepuesto,
+)
+
+
+class StockInsuficiente(Exception):
+    """No alcanza el stock disponible para los kits pedidos."""
+
+    def __init__(self, mensaje, faltantes=()):
+        super().__init__(mensaje)
+        self.faltantes = list(faltantes)
+
+
+def kit_vigente():
+    """El kit activo con sus repuestos, o None si no hay uno configurado."""
+    return (
+        KitMantenimiento.objects.filter(activo=True)
+        .prefetch_related(
+            Prefetch(
+                "items",
+                queryset=KitMantenimientoItem.objects.select_related("producto"),
+            )
+        )
+        .first()
+    )
+
+
+def requeridos(kit):
+    """{sku: cantidad} de un kit."""
+    return {item.producto_id: item.cantidad for item in kit.items.all()}
+
+
+def disponibilidad(skus, bloquear=False):
+    """
+    {sku: (producto, disponible)} en una consulta: el stock menos lo que
+    tienen reservado las citas confirmadas. Con 'bloquear' toma además el
+    bloqueo de esas filas hasta el fin de la transacción.
+    """
+    reservado = (
+        ReservaRepuesto.objects.filter(
+            producto=OuterRef("pk"), estado=ReservaRepuesto.Estado.RESERVADO
+        )
+        .values("producto")
+        .annotate(total=Sum("cantidad"))
+        .values("total")
+    )
+    productos = (
+        Producto.objects.filter(sku__in=skus)
+        .annotate(reservado=Coalesce(Subquery(reservado), Value(0)))
+        .order_by("sku")
+    )
+    if bloquear:
+        productos = productos.select_for_update()
+    return {p.sku: (p, p.stock - p.reservado) for p in productos}
+
+
+def faltantes_kit(kit, veces=1, bloquear=False):
+    """Repuestos del kit que no alcanzan para 'veces' citas."""
+    necesarios = requeridos(kit)
+    disponibles = disponibilidad(necesarios, bloquear=bloquear)
+    faltantes = []
+    for sku, cantidad in necesarios.items():
+        producto, disponible = disponibles[sku]
+        if disponible < cantidad * veces:
+            faltantes.append(
+                {
+                    "nombre": producto.nombre,
+                    "sku": sku,
+                    "stock_actual": max(disponible, 0),
+                    "necesario": cantidad * veces,
+                }
+            )
+    return faltantes
+
+
+def kits_disponibles(kit, bloquear=False):
+    """Cuántas citas más se pueden cubrir con el stock no reservado."""
+    necesarios = requeridos(kit)
+    if not necesarios:
+        return 0
+    disponibles = disponibilidad(necesarios, bloquear=bloquear)
+    return max(
+        min(disponibles[sku][1] // cantidad for sku, cantidad in necesarios.items()),
+        0,
+    )
+
+
+def reservar_kits(citas, kit=None):
+    """
+    Reserva un kit por cada cita de mantenimiento que aún no tenga reservas.
+    Debe llamarse dentro de una transacción. Lanza StockInsuficiente si no
+    alcanza para todas (y no reserva nada).
+    """
+    citas = [cita for cita in citas if cita.es_mantenimiento]
+    if not citas:
+        return []
+    con_reserva = set(
+        ReservaRepuesto.objects.filter(
+            agendamiento__in=citas, estado=ReservaRepuesto.Estado.RESERVADO
+        ).values_list("agendamiento_id", flat=True)
+    )
+    citas = [cita for cita in citas if cita.pk not in con_reserva]
+    if not citas:
+        return []
+
+    kit = kit or kit_vigente()
+    if kit is None or not kit.items.all():
+        raise StockInsuficiente("No hay un kit de mantenimiento activo configurado.")
+    faltantes = faltantes_kit(kit, veces=len(citas), bloquear=True)
+    if faltantes:
+        detalle = ", ".join(
+            f"'{f['nombre']}' (SKU: {f['sku']}, quedan {f['stock_actual']})"
+            for f in faltantes
+        )
+        raise StockInsuficiente(f"Stock agotado para {detalle}.", faltantes)
+
+    return ReservaRepuesto.objects.bulk_create(
+        ReservaRepuesto(
+            agendamiento=cita, producto_id=item.producto_id, cantidad=item.cantidad
+        )
+        for cita in citas
+        for item in kit.items.all()
+    )
+
+
+def reservar_kit(agendamiento, kit=None):
+    return reservar_kits([agendamiento], kit=kit)
+
+
+def liberar_reservas(agendamiento):
+    """Devuelve al stock disponible lo reservado para la cita."""
+    return ReservaRepuesto.objects.filter(
+        agendamiento=agendamiento, estado=ReservaRepuesto.Estado.RESERVADO
+    ).update(estado=ReservaRepuesto.Estado.LIBERADO, actualizado_en=timezone.now())
+
+
+def consumir_reservas(agendamiento, orden, usuario):
+    """
+    Convierte las reservas de la cita en OrdenItem aprobados y descuenta el
+    stock (cada descuento es un UPDATE condicional, sin bloqueo previo).
+    Las citas confirmadas sin reserva (p. ej. antes de configurar el kit)
+    reservan en este momento. Debe llamarse dentro de una transacción.
+    """
+    reservar_kit(agendamiento)
+    reservas = list(
+        ReservaRepuesto.objects.filter(
+            agendamiento=agendamiento, estado=ReservaRepuesto.Estado.RESERVADO
+        )
+        .select_related("producto")
+        .order_by("producto_id")
+    )
+    ahora = timezone.now()
+    for reserva in reservas:
+        descontado = Producto.objects.filter(
+            pk=reserva.producto_id, stock__gte=reserva.cantidad
+        ).update(stock=F("stock") - reserva.cantidad)
+        if not descontado:
+            raise StockInsuficiente(
+                f"Stock insuficiente para '{reserva.producto.nombre}'.",
+                [{"sku": reserva.producto_id, "necesario": reserva.cantidad}],
+            )
+        reserva.orden_item = OrdenItem.objects.create(
+            orden=orden,
+            producto=reserva.producto,
+            cantidad=reserva.cantidad,
+            precio_unitario=reserva.producto.precio_venta,
+            solicitado_por=agendamiento.mecanico_asignado,
+            gestionado_por=usuario,
+            fecha_gestion=ahora,
+            estado_repuesto=OrdenItem.EstadoRepuesto.APROBADO,
+        )
+        reserva.estado = ReservaRepuesto.Estado.CONSUMIDO
+        reserva.save(update_fields=["estado", "orden_item", "actualizado_en"])
+    return reservas
+
+
+ESTADOS_CIERRAN = (Agendamiento.Estado.CANCELADO, Agendamiento.Estado.FINALIZADO)
+ESTADO_ATTR = "_estado_previo"
+
+
+def recordar_estado(agendamiento):
+    """Recuerda el estado cargado de la cita (en post_init / post_save)."""
+    if "estado" in agendamiento.get_deferred_fields():
+        setattr(agendamiento, ESTADO_ATTR, None)
+    else:
+        setattr(agendamiento, ESTADO_ATTR, agendamiento.estado)
+
+
+def completar_estado(agendamiento):
+    """En pre_save: lee el estado previo si se cargó diferido."""
+    if agendamiento._state.adding or getattr(agendamiento, ESTADO_ATTR, None):
+        return
+    setattr(
+        agendamiento,
+        ESTADO_ATTR,
+        Agendamiento.objects.filter(pk=agendamiento.pk)
+        .values_list("estado", flat=True)
+        .first(),
+    )
+
+
+def liberar_si_cierra(agendamiento, created):
+    """
+    Libera las reservas solo cuando la cita pasa a Cancelado o Finalizado;
+    guardar de nuevo una cita ya cerrada no vuelve a consultar las reservas.
+    """
+    anterior = getattr(agendamiento, ESTADO_ATTR, None)
+    if (
+        not created
+        and agendamiento.estado in ESTADOS_CIERRAN
+        and agendamiento.estado != anterior
+    ):
+        liberar_reservas(agendamiento)
+    recordar_estado(agendamiento)
@@ -0,0 +1,225 @@
+"""
+Almacén de indicadores (KPIs) del dashboard del Jefetaller.
+
+Cada Orden y cada Agendamiento "aporta" una serie de contadores (por estado,
+por día, etc.). Cuando una instancia se guarda o se elimina, las señales
+calculan la diferencia entre su aporte anterior y el nuevo y la aplican a
+la tabla IndicadorTaller, dentro de la misma transacción que el cambio.
+Así el dashboard lee un puñado de filas por clave en vez de agregar sobre
+las tablas completas.
+
+"Vehículos en taller" cuenta vehículos distintos, no órdenes: cada vehículo
+lleva su número de órdenes activas (ordenes_activas_vehiculo:<id>) y el
+total (vehiculos_en_taller) cambia solo cuando ese número pasa de 0 a más
+o vuelve a 0.
+
+Las escrituras que no pasan por save()/delete() (QuerySet.update,
+bulk_create, bulk_update, SQL directo) no disparan señales y desvían los
+contadores. Por eso 'python manage.py recalcular_indicadores' debe
+programarse periódicamente (p. ej. cada noche, ver PASOS.txt) para
+reconstruirlos desde las tablas.
+"""
+
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Agendamiento, IndicadorTaller, Orden
+
+ORDEN_CAMPOS_KPI = ("estado", "vehiculo", "fecha_ingreso", "fecha_entrega_real")
+AGENDAMIENTO_CAMPOS_KPI = ("estado", "fecha_hora_programada")
+
+SNAPSHOT_ATTR = "_kpi_aporte"
+ACTIVAS_VEHICULO = "ordenes_activas_vehiculo:"
+VEHICULOS_EN_TALLER = "vehiculos_en_taller"
+
+
+def _dia(valor):
+    return timezone.localdate(valor).isoformat()
+
+
+def aporte_orden(orden):
+    """Contadores a los que suma una orden en su estado actual."""
+    aporte = Counter()
+    aporte[f"ordenes_estado:{orden.estado}"] += 1
+    if orden.estado != Orden.Estado.FINALIZADO:
+        aporte[f"{ACTIVAS_VEHICULO}{orden.vehiculo_id}"] += 1
+    if orden.fecha_ingreso:
+        aporte[f"ordenes_creadas:{_dia(orden.fecha_ingreso)}"] += 1
+    if orden.estado == Orden.Estado.FINALIZADO and orden.fecha_entrega_real:
+        aporte[f"ordenes_finalizadas:{_dia(orden.fecha_entrega_real)}"] += 1
+        if orden.fecha_ingreso:
+            duracion = orden.fecha_entrega_real - orden.fecha_ingreso
+            aporte["ordenes_duracion_total_seg"] += int(duracion.total_seconds())
+            aporte["ordenes_duracion_cantidad"] += 1
+    return aporte
+
+
+def aporte_agendamiento(agendamiento):
+    """Contadores a los que suma un agendamiento en su estado actual."""
+    aporte = Counter()
+    if agendamiento.estado == Agendamiento.Estado.PROGRAMADO:
+        aporte["agendamientos_programados"] += 1
+    if (
+        agendamiento.estado == Agendamiento.Estado.CONFIRMADO
+        and agendamiento.fecha_hora_programada
+    ):
+        dia = _dia(agendamiento.fecha_hora_programada)
+        aporte[f"agendamientos_confirmados:{dia}"] += 1
+    return aporte
+
+
+APORTES = {
+    Orden: (aporte_orden, ORDEN_CAMPOS_KPI),
+    Agendamiento: (aporte_agendamiento, AGENDAMIENTO_CAMPOS_KPI),
+}
+
+
+def _sumar(clave, delta):
+    """Suma 'delta' al contador (creándolo si falta) y devuelve su nuevo valor."""
+    filas = IndicadorTaller.objects.filter(clave=clave)
+    if not filas.update(valor=F("valor") + delta):
+        IndicadorTaller.objects.get_or_create(clave=clave)
+        filas.update(valor=F("valor") + delta)
+    return filas.values_list("valor", flat=True).get()
+
+
+@transaction.atomic
+def aplicar_deltas(deltas):
+    """Suma (o resta) los deltas a los contadores, creando los que falten."""
+    vehiculos = 0
+    for clave, delta in deltas.items():
+        if not delta:
+            continue
+        nuevo = _sumar(clave, delta)
+        if clave.startswith(ACTIVAS_VEHICULO):
+            # El UPDATE bloquea la fila del vehículo hasta el fin de la
+            # transacción, así que el valor leído no cambia por debajo.
+            vehiculos += (nuevo > 0) - (nuevo - delta > 0)
+    if vehiculos:
+        _sumar(VEHICULOS_EN_TALLER, vehiculos)
+
+
+def guardar_aporte(instance):
+    """Recuerda el aporte actual de la instancia (en post_init / post_save)."""
+    aporte, campos = APORTES[type(instance)]
+    if instance.pk is None or set(campos) & instance.get_deferred_fields():
+        setattr(instance, SNAPSHOT_ATTR, None)
+    else:
+        setattr(instance, SNAPSHOT_ATTR, aporte(instance))
+
+
+def completar_aporte(instance):
+    """
+    En pre_save: si la instancia se cargó con campos diferidos no tiene
+    aporte guardado, así que se lee el estado previo antes del UPDATE.
+    """
+    if instance._state.adding or getattr(instance, SNAPSHOT_ATTR, None) is not None:
+        return
+    aporte, campos = APORTES[type(instance)]
+    previa = type(instance).objects.only(*campos).filter(pk=instance.pk).first()
+    setattr(instance, SNAPSHOT_ATTR, aporte(previa) if previa else Counter())
+
+
+def registrar_cambio(instance, created):
+    aporte, _ = APORTES[type(instance)]
+    anterior = None if created else getattr(instance, SNAPSHOT_ATTR, None)
+    nuevo = aporte(instance)
+    deltas = Counter(nuevo)
+    deltas.subtract(anterior or Counter())
+    aplicar_deltas(deltas)
+    setattr(instance, SNAPSHOT_ATTR, nuevo)
+
+
+def registrar_eliminacion(instance):
+    aporte, _ = APORTES[type(instance)]
+    deltas = Counter()
+    deltas.subtract(aporte(instance))
+    aplicar_deltas(deltas)
+
+
+@transaction.atomic
+def recalcular_indicadores():
+    """Reconstruye todos los contadores desde cero a partir de las tablas."""
+    totales = Counter()
+    for orden in Orden.objects.only(*ORDEN_CAMPOS_KPI).iterator():
+        totales.update(aporte_orden(orden))
+    for agendamiento in Agendamiento.objects.only(*AGENDAMIENTO_CAMPOS_KPI).iterator():
+        totales.update(aporte_agendamiento(agendamiento))
+    totales[VEHICULOS_EN_TALLER] = sum(
+        1 for clave in totales if clave.startswith(ACTIVAS_VEHICULO)
+    )
+
+    IndicadorTaller.objects.all().delete()
+    IndicadorTaller.objects.bulk_create(
+        IndicadorTaller(clave=clave, valor=valor)
+        for clave, valor in totales.items()
+        if valor
+    )
+    return len(totales)
+
+
+def obtener_kpis_dashboard(nombres_dias):
+    """
+    Arma los KPIs del dashboard del Jefetaller leyendo solo las claves
+    necesarias (una consulta), sin importar el tamaño de las tablas.
+    'nombres_dias' traduce weekday() al nombre corto que muestra el gráfico.
+    """
+    today = timezone.localdate()
+    start_of_week = today - timedelta(days=today.weekday())
+    dias_semana = [start_of_week + timedelta(days=i) for i in range(7)]
+    dias_mes = [today.replace(day=1) + timedelta(days=i) for i in range(today.day)]
+    claves = {
+        VEHICULOS_EN_TALLER,
+        "agendamientos_programados",
+        "ordenes_duracion_total_seg",
+        "ordenes_duracion_cantidad",
+        f"agendamientos_confirmados:{today.isoformat()}",
+    }
+    claves.update(f"ordenes_estado:{estado}" for estado in Orden.Estado.values)
+    claves.update(f"ordenes_creadas:{dia.isoformat()}" for dia in dias_semana)
+    claves.update(f"ordenes_finalizadas:{dia.isoformat()}" for dia in dias_mes)
+
+    valores = dict(
+        IndicadorTaller.objects.filter(clave__in=claves).values_list("clave", "valor")
+    )
+
+    tiempo_promedio_str = "N/A"
+    cantidad = valores.get("ordenes_duracion_cantidad", 0)
+    if cantidad:
+        total_dias = valores.get("ordenes_duracion_total_seg", 0) / cantidad / 86400
+        tiempo_promedio_str = f"{total_dias:.1f} días"
+
+    ordenes_por_estado = [
+        {"estado": estado, "cantidad": valores[f"ordenes_estado:{estado}"]}
+        for estado in sorted(Orden.Estado.values)
+        if valores.get(f"ordenes_estado:{estado}", 0) > 0
+    ]
+
+    return {
+        "kpis": {
+            "vehiculosEnTaller": valores.get(VEHICULOS_EN_TALLER, 0),
+            "agendamientosHoy": valores.get(
+                f"agendamientos_confirmados:{today.isoformat()}", 0
+            ),
+            "ordenesFinalizadasMes": sum(
+                valores.get(f"ordenes_finalizadas:{dia.isoformat()}", 0)
+                for dia in dias_mes
+            ),
+            "tiempoPromedioRep": tiempo_promedio_str,
+        },
+        "alertas": {
+            "pendientesAprobacion": valores.get("agendamientos_programados", 0),
+        },
+        "ordenesPorEstado": ordenes_por_estado,
+        "ordenesUltimaSemana": [
+            {
+                "dia": nombres_dias[dia.weekday()],
+                "creadas": valores.get(f"ordenes_creadas:{dia.isoformat()}", 0),
+            }
+            for dia in dias_semana
+        ],
+    }
@@ -0,0 +1,70 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import Notificacion, NotificacionArchivada
+
+
+class Command(BaseCommand):
+    help = (
+        "Elimina (o archiva con --archivar) las notificaciones leídas más "
+        "antiguas que el período de retención, en lotes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dias",
+            type=int,
+            default=getattr(settings, "NOTIFICACIONES_RETENCION_DIAS", 90),
+            help="Antigüedad mínima (en días) de las notificaciones leídas a depurar.",
+        )
+        parser.add_argument(
+            "--lote", type=int, default=1000, help="Notificaciones por lote."
+        )
+        parser.add_argument(
+            "--archivar",
+            action="store_true",
+            help="Copia las notificaciones a NotificacionArchivada antes de borrarlas.",
+        )
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - timedelta(days=options["dias"])
+        candidatas = Notificacion.objects.filter(leida=True, fecha__lt=limite)
+        total = 0
+
+        # Lotes cortos, cada uno en su propia transacción, para no bloquear
+        # la tabla mientras la aplicación sigue creando notificaciones.
+        while True:
+            with transaction.atomic():
+                lote = list(
+                    candidatas.order_by("id").values(
+                        "id", "usuario_id", "mensaje", "link", "fecha"
+                    )[: options["lote"]]
+                )
+                if not lote:
+                    break
+                if options["archivar"]:
+                    NotificacionArchivada.objects.bulk_create(
+                        NotificacionArchivada(
+                            usuario_id=fila["usuario_id"],
+                            mensaje=fila["mensaje"],
+                            link=fila["link"],
+                            fecha=fila["fecha"],
+                        )
+                        for fila in lote
+                    )
+                Notificacion.objects.filter(
+                    pk__in=[fila["id"] for fila in lote]
+                ).delete()
+            total += len(lote)
+
+        accion = "archivadas" if options["archivar"] else "eliminadas"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{total} notificaciones leídas anteriores al "
+                f"{timezone.localdate(limite):%d-%m-%Y} {accion}."
+            )
+        )
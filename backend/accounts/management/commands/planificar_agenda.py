@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from accounts.agenda import planificar_agenda, resumen_plan
+from accounts.models import Usuario
+
+
+def _fecha(valor):
+    return datetime.strptime(valor, "%Y-%m-%d").date()
+
+
+class Command(BaseCommand):
+    help = (
+        "Asigna mecánico y horario a todas las citas pendientes (Programado) "
+        "del período en una sola pasada y las confirma en una transacción."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--desde", type=_fecha, default=None, help="YYYY-MM-DD (por defecto, hoy)."
+        )
+        parser.add_argument(
+            "--dias", type=int, default=7, help="Días del período a planificar."
+        )
+        parser.add_argument(
+            "--usuario",
+            required=True,
+            help="Username de quien queda registrado en el historial de las citas.",
+        )
+        parser.add_argument(
+            "--simular",
+            action="store_true",
+            help="Muestra el plan sin guardar nada.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            usuario = Usuario.objects.get(username=options["usuario"])
+        except Usuario.DoesNotExist:
+            raise CommandError(f"No existe el usuario '{options['usuario']}'.")
+        if options["dias"] < 1:
+            raise CommandError("--dias debe ser al menos 1.")
+
+        desde = options["desde"] or timezone.localdate()
+        hasta = desde + timedelta(days=options["dias"] - 1)
+        asignaciones, sin_asignar = planificar_agenda(
+            desde, hasta, usuario, simular=options["simular"]
+        )
+        plan = resumen_plan(asignaciones, sin_asignar)
+
+        for fila in plan["asignadas"]:
+            self.stdout.write(
+                f"#{fila['agendamiento']} {fila['patente']}: {fila['mecanico_nombre']} "
+                f"el {fila['inicio']:%d-%m-%Y %H:%M}"
+            )
+        for fila in plan["sin_asignar"]:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"#{fila['agendamiento']} {fila['patente']}: {fila['motivo']}"
+                )
+            )
+        accion = "planificadas (simulación)" if options["simular"] else "confirmadas"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{len(plan['asignadas'])} citas {accion}, "
+                f"{len(plan['sin_asignar'])} sin asignar."
+            )
+        )
@@ -10,6 +10,8 @@ from accounts.models import (
     Agendamiento,
     Orden,
     Producto,
+    KitMantenimiento,
+    KitMantenimientoItem,
     Servicio,
     OrdenItem,
     LlaveVehiculo,
@@ -60,6 +62,7 @@ class Command(BaseCommand):
 
         Taller.objects.all().delete()
 
+        KitMantenimiento.objects.all().delete()
         Producto.objects.all().delete()
         Servicio.objects.all().delete()
 
@@ -284,6 +287,11 @@ class Command(BaseCommand):
             sku="FRE-LIQ-01",
             defaults={"nombre": "Líquido de Frenos", "precio_venta": 6500, "stock": 40},
         )
+        kit, _ = KitMantenimiento.objects.get_or_create(nombre="Mantenimiento general")
+        for sku in ("ACE-10W40", "FIL-AIRE-01", "FRE-LIQ-01"):
+            KitMantenimientoItem.objects.get_or_create(
+                kit=kit, producto_id=sku, defaults={"cantidad": 1}
+            )
 
         Servicio.objects.get_or_create(
             nombre="Cambio de Aceite", defaults={"precio_base": 25000}
@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.correos import cerrar_conexiones, procesar_lote
+
+
+class Command(BaseCommand):
+    help = (
+        "Envía los correos de la bandeja de salida (CorreoPendiente) en lotes, "
+        "reintentando con espera exponencial los que fallen."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--una-vez",
+            action="store_true",
+            help="Vacía la bandeja una vez y termina, en vez de quedar escuchando.",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=5,
+            help="Segundos de espera cuando no hay correos pendientes.",
+        )
+        parser.add_argument("--lote", type=int, default=None, help="Correos por lote.")
+
+    def handle(self, *args, **options):
+        total_enviados = total_fallidos = 0
+        try:
+            while True:
+                enviados, fallidos = procesar_lote(options["lote"])
+                total_enviados += enviados
+                total_fallidos += fallidos
+                if enviados or fallidos:
+                    self.stdout.write(
+                        f"Lote procesado: {enviados} enviados, {fallidos} con error."
+                    )
+                    continue
+
+                # Bandeja vacía: se liberan las sesiones SMTP mientras se espera.
+                cerrar_conexiones()
+                if options["una_vez"]:
+                    break
+                time.sleep(options["intervalo"])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            cerrar_conexiones()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Correos enviados: {total_enviados}. Con error: {total_fallidos}."
+            )
+        )
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from accounts.kpis import recalcular_indicadores
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye desde cero los indicadores (KPIs) del dashboard del "
+        "Jefetaller. Programarlo periódicamente corrige lo que desvían las "
+        "escrituras masivas que no disparan señales (update, bulk_update)."
+    )
+
+    def handle(self, *args, **options):
+        total = recalcular_indicadores()
+        self.stdout.write(
+            self.style.SUCCESS(f"Indicadores recalculados ({total} claves).")
+        )
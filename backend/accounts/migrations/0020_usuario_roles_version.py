@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 10:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0019_chatroom_oculto_para'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='roles_version',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Se incrementa cada vez que cambian los grupos del usuario. Invalida los roles embebidos en los tokens.'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2 on 2026-10-17 10:05
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0020_usuario_roles_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='llavehistorialestado',
+            name='fecha',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='notificacion',
+            name='fecha',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='orden',
+            name='fecha_ingreso',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='prestamollave',
+            name='fecha_hora_retiro',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
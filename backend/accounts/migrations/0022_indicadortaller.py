@@ -0,0 +1,60 @@
+# Generated by Django 4.2 on 2026-10-17 10:08
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def poblar_indicadores(apps, schema_editor):
+    """Carga inicial de los contadores (misma lógica que accounts/kpis.py)."""
+    Orden = apps.get_model('accounts', 'Orden')
+    Agendamiento = apps.get_model('accounts', 'Agendamiento')
+    IndicadorTaller = apps.get_model('accounts', 'IndicadorTaller')
+
+    def dia(valor):
+        return timezone.localdate(valor).isoformat()
+
+    totales = Counter()
+    for orden in Orden.objects.iterator():
+        totales[f'ordenes_estado:{orden.estado}'] += 1
+        if orden.fecha_ingreso:
+            totales[f'ordenes_creadas:{dia(orden.fecha_ingreso)}'] += 1
+        if orden.estado == 'Finalizado' and orden.fecha_entrega_real:
+            totales[f'ordenes_finalizadas:{dia(orden.fecha_entrega_real)}'] += 1
+            if orden.fecha_ingreso:
+                duracion = orden.fecha_entrega_real - orden.fecha_ingreso
+                totales['ordenes_duracion_total_seg'] += int(duracion.total_seconds())
+                totales['ordenes_duracion_cantidad'] += 1
+    for agendamiento in Agendamiento.objects.iterator():
+        if agendamiento.estado == 'Programado':
+            totales['agendamientos_programados'] += 1
+        if agendamiento.estado == 'Confirmado' and agendamiento.fecha_hora_programada:
+            totales[f'agendamientos_confirmados:{dia(agendamiento.fecha_hora_programada)}'] += 1
+
+    IndicadorTaller.objects.bulk_create(
+        IndicadorTaller(clave=clave, valor=valor) for clave, valor in totales.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0021_indices_paginacion_cursor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndicadorTaller',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=100, unique=True)),
+                ('valor', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Indicador del Taller',
+                'verbose_name_plural': 'Indicadores del Taller',
+            },
+        ),
+        migrations.RunPython(poblar_indicadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2 on 2026-10-17 10:12
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0022_indicadortaller'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CorreoPendiente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('destinatario', models.EmailField(max_length=254)),
+                ('asunto', models.CharField(max_length=255)),
+                ('cuerpo_texto', models.TextField()),
+                ('cuerpo_html', models.TextField(blank=True)),
+                ('estado', models.CharField(choices=[('Pendiente', 'Pendiente'), ('Enviado', 'Enviado'), ('Fallido', 'Fallido')], default='Pendiente', max_length=20)),
+                ('intentos', models.PositiveIntegerField(default=0)),
+                ('proximo_intento', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ultimo_error', models.TextField(blank=True)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('enviado_en', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Correo Pendiente',
+                'verbose_name_plural': 'Correos Pendientes',
+                'ordering': ['proximo_intento', 'id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='correopendiente',
+            index=models.Index(fields=['estado', 'proximo_intento'], name='correo_estado_proximo_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2 on 2026-10-17 10:14
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def poblar_contadores(apps, schema_editor):
+    """Carga inicial de las notificaciones no leídas de cada usuario."""
+    Notificacion = apps.get_model('accounts', 'Notificacion')
+    ContadorNotificaciones = apps.get_model('accounts', 'ContadorNotificaciones')
+
+    conteos = (
+        Notificacion.objects.filter(leida=False)
+        .values('usuario_id')
+        .annotate(total=Count('id'))
+    )
+    ContadorNotificaciones.objects.bulk_create(
+        ContadorNotificaciones(usuario_id=fila['usuario_id'], no_leidas=fila['total'])
+        for fila in conteos
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0023_correopendiente'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorNotificaciones',
+            fields=[
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='contador_notificaciones', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('no_leidas', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Contador de Notificaciones',
+                'verbose_name_plural': 'Contadores de Notificaciones',
+            },
+        ),
+        migrations.RunPython(poblar_contadores, migrations.RunPython.noop),
+    ]
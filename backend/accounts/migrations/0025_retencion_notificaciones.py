@@ -0,0 +1,43 @@
+# Generated by Django 4.2 on 2026-10-17 10:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0024_contadornotificaciones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificacionArchivada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mensaje', models.CharField(max_length=255)),
+                ('link', models.CharField(blank=True, max_length=255, null=True)),
+                ('fecha', models.DateTimeField()),
+                ('archivada_en', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Notificación Archivada',
+                'verbose_name_plural': 'Notificaciones Archivadas',
+                'ordering': ['-fecha'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['usuario', 'leida', '-fecha'], name='notif_usuario_leida_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['usuario', '-fecha'], name='notif_usuario_fecha_idx'),
+        ),
+        migrations.AddField(
+            model_name='notificacionarchivada',
+            name='usuario',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notificaciones_archivadas', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 4.2 on 2026-10-17 10:18
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+import django.db.models.deletion
+
+
+def poblar_lecturas(apps, schema_editor):
+    """
+    Convierte 'leido_por' en una marca de agua por sala y participante:
+    el mayor id de mensaje que el usuario leyó o escribió en la sala.
+    """
+    ChatRoom = apps.get_model('accounts', 'ChatRoom')
+    ChatMessage = apps.get_model('accounts', 'ChatMessage')
+    ChatLectura = apps.get_model('accounts', 'ChatLectura')
+
+    marcas = {}
+    leidos = (
+        ChatMessage.leido_por.through.objects.values('chatmessage__room_id', 'usuario_id')
+        .annotate(ultimo=Max('chatmessage_id'))
+    )
+    for fila in leidos:
+        marcas[(fila['chatmessage__room_id'], fila['usuario_id'])] = fila['ultimo']
+    escritos = (
+        ChatMessage.objects.filter(autor__isnull=False)
+        .values('room_id', 'autor_id')
+        .annotate(ultimo=Max('id'))
+    )
+    for fila in escritos:
+        clave = (fila['room_id'], fila['autor_id'])
+        marcas[clave] = max(marcas.get(clave, 0), fila['ultimo'])
+
+    participantes = ChatRoom.participantes.through.objects.values_list(
+        'chatroom_id', 'usuario_id'
+    )
+    ChatLectura.objects.bulk_create(
+        (
+            ChatLectura(
+                room_id=room_id,
+                usuario_id=usuario_id,
+                ultimo_mensaje_leido=marcas.get((room_id, usuario_id), 0),
+            )
+            for room_id, usuario_id in participantes.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0025_retencion_notificaciones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatLectura',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ultimo_mensaje_leido', models.PositiveBigIntegerField(default=0)),
+                ('leido_en', models.DateTimeField(blank=True, null=True)),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lecturas', to='accounts.chatroom', verbose_name='Sala')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lecturas_chat', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Lectura de Chat',
+                'verbose_name_plural': 'Lecturas de Chat',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='chatlectura',
+            constraint=models.UniqueConstraint(fields=('room', 'usuario'), name='chat_lectura_unica_room_usuario'),
+        ),
+        migrations.RunPython(poblar_lecturas, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='chatmessage',
+            name='leido_por',
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-17 10:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0026_chatlectura'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['room', 'id'], name='chat_msg_room_id_idx'),
+        ),
+    ]
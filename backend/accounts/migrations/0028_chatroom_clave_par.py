@@ -0,0 +1,47 @@
+# Generated by Django 4.2 on 2026-10-17 10:21
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def poblar_clave_par(apps, schema_editor):
+    """
+    Asigna la clave a las salas con exactamente dos participantes. Si hay
+    salas repetidas para el mismo par, la clave queda en la más reciente,
+    que es la que devolvía la búsqueda anterior.
+    """
+    ChatRoom = apps.get_model('accounts', 'ChatRoom')
+    Participante = ChatRoom.participantes.through
+
+    participantes = defaultdict(list)
+    for room_id, usuario_id in Participante.objects.values_list('chatroom_id', 'usuario_id'):
+        participantes[room_id].append(usuario_id)
+
+    asignadas = set()
+    for room in ChatRoom.objects.order_by('-actualizado_en', '-id').only('id'):
+        usuarios = participantes.get(room.id, [])
+        if len(usuarios) != 2:
+            continue
+        menor, mayor = sorted(usuarios)
+        clave = f'{menor}:{mayor}'
+        if clave in asignadas:
+            continue
+        asignadas.add(clave)
+        ChatRoom.objects.filter(pk=room.id).update(clave_par=clave)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0027_chatmessage_chat_msg_room_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatroom',
+            name='clave_par',
+            field=models.CharField(blank=True, editable=False, help_text="Para chats 1-a-1: ids de ambos usuarios ordenados ('3:7').", max_length=50, null=True, unique=True),
+        ),
+        migrations.RunPython(poblar_clave_par, migrations.RunPython.noop),
+    ]
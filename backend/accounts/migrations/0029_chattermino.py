@@ -0,0 +1,66 @@
+# Generated by Django 4.2 on 2026-10-17 10:24
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+LOTE = 2000
+
+
+def _terminos(texto):
+    # Misma normalización que accounts.chat.terminos_busqueda.
+    texto = unicodedata.normalize('NFKD', (texto or '').lower())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return {p[:40] for p in re.findall(r'\w+', texto) if len(p) >= 2}
+
+
+def indexar_mensajes(apps, schema_editor):
+    """Construye el índice de búsqueda para los mensajes existentes, por lotes."""
+    ChatMessage = apps.get_model('accounts', 'ChatMessage')
+    ChatTermino = apps.get_model('accounts', 'ChatTermino')
+
+    ultimo_id = 0
+    while True:
+        lote = list(
+            ChatMessage.objects.filter(id__gt=ultimo_id)
+            .order_by('id')
+            .values_list('id', 'room_id', 'contenido')[:LOTE]
+        )
+        if not lote:
+            break
+        ChatTermino.objects.bulk_create(
+            ChatTermino(termino=termino, room_id=room_id, mensaje_id=mensaje_id)
+            for mensaje_id, room_id, contenido in lote
+            for termino in _terminos(contenido)
+        )
+        ultimo_id = lote[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0028_chatroom_clave_par'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatTermino',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('termino', models.CharField(max_length=40)),
+                ('mensaje', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terminos', to='accounts.chatmessage')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='accounts.chatroom', verbose_name='Sala')),
+            ],
+            options={
+                'verbose_name': 'Término de Chat',
+                'verbose_name_plural': 'Términos de Chat',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='chattermino',
+            index=models.Index(fields=['termino', 'room', 'mensaje'], name='chat_termino_busqueda_idx'),
+        ),
+        migrations.RunPython(indexar_mensajes, migrations.RunPython.noop),
+    ]
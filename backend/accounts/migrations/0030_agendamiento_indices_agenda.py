@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-17 10:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0029_chattermino'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='agendamiento',
+            index=models.Index(fields=['mecanico_asignado', 'estado', 'fecha_hora_programada'], name='agenda_mecanico_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='agendamiento',
+            index=models.Index(fields=['vehiculo', 'estado', 'fecha_hora_programada'], name='agenda_vehiculo_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='agendamiento',
+            index=models.Index(fields=['estado', 'fecha_hora_programada'], name='agenda_estado_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,123 @@
+# Generated by Django 4.2 on 2026-10-17 10:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Repuestos que antes estaban fijos en el código (REPUESTOS_MANTENIMIENTO).
+KIT_INICIAL = {
+    'ACE-10W40': 1,
+    'FIL-AIRE-01': 1,
+    'FRE-LIQ-01': 1,
+}
+
+
+def crear_kit_y_reservas(apps, schema_editor):
+    """
+    Crea el kit inicial con los repuestos que existan y reserva un kit para
+    cada cita de mantenimiento ya confirmada que todavía no ingresa, por
+    orden de fecha y mientras alcance el stock (como kits.reservar_kits,
+    aquí nada está reservado aún). Las que no alcanzan quedan sin reserva
+    y se informan; al ingresar volverán a intentar reservar.
+    """
+    Producto = apps.get_model('accounts', 'Producto')
+    Agendamiento = apps.get_model('accounts', 'Agendamiento')
+    KitMantenimiento = apps.get_model('accounts', 'KitMantenimiento')
+    KitMantenimientoItem = apps.get_model('accounts', 'KitMantenimientoItem')
+    ReservaRepuesto = apps.get_model('accounts', 'ReservaRepuesto')
+
+    disponible = dict(Producto.objects.filter(sku__in=KIT_INICIAL).values_list('sku', 'stock'))
+    if not disponible:
+        return
+    kit = KitMantenimiento.objects.create(nombre='Mantenimiento general')
+    KitMantenimientoItem.objects.bulk_create(
+        KitMantenimientoItem(kit=kit, producto_id=sku, cantidad=KIT_INICIAL[sku])
+        for sku in sorted(disponible)
+    )
+    citas = Agendamiento.objects.filter(
+        es_mantenimiento=True, estado='Confirmado'
+    ).order_by('fecha_hora_programada', 'id').values_list('id', flat=True)
+
+    reservas, sin_stock = [], []
+    for cita_id in citas.iterator():
+        if any(disponible[sku] < KIT_INICIAL[sku] for sku in disponible):
+            sin_stock.append(cita_id)
+            continue
+        for sku in sorted(disponible):
+            disponible[sku] -= KIT_INICIAL[sku]
+            reservas.append(
+                ReservaRepuesto(agendamiento_id=cita_id, producto_id=sku, cantidad=KIT_INICIAL[sku])
+            )
+    ReservaRepuesto.objects.bulk_create(reservas, batch_size=1000)
+    if sin_stock:
+        print(
+            f'\n  Sin stock para reservar el kit de {len(sin_stock)} citas confirmadas '
+            f'(ids: {", ".join(map(str, sin_stock))}).'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0030_agendamiento_indices_agenda'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KitMantenimiento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('nombre', models.CharField(max_length=100, unique=True)),
+                ('activo', models.BooleanField(default=True, help_text='El kit activo es el que se reserva al confirmar una cita de mantenimiento.')),
+            ],
+            options={
+                'verbose_name': 'Kit de Mantenimiento',
+                'verbose_name_plural': 'Kits de Mantenimiento',
+            },
+        ),
+        migrations.CreateModel(
+            name='ReservaRepuesto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('cantidad', models.PositiveIntegerField()),
+                ('estado', models.CharField(choices=[('Reservado', 'Reservado'), ('Consumido', 'Consumido'), ('Liberado', 'Liberado')], default='Reservado', max_length=20)),
+                ('agendamiento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas_repuestos', to='accounts.agendamiento')),
+                ('orden_item', models.ForeignKey(blank=True, help_text='Ítem de la orden en que se consumió la reserva.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='accounts.ordenitem')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='reservas', to='accounts.producto')),
+            ],
+            options={
+                'verbose_name': 'Reserva de Repuesto',
+                'verbose_name_plural': 'Reservas de Repuestos',
+            },
+        ),
+        migrations.CreateModel(
+            name='KitMantenimientoItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.PositiveIntegerField(default=1)),
+                ('kit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='accounts.kitmantenimiento')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='accounts.producto')),
+            ],
+            options={
+                'verbose_name': 'Repuesto del Kit',
+                'verbose_name_plural': 'Repuestos del Kit',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='reservarepuesto',
+            index=models.Index(fields=['producto', 'estado'], name='reserva_producto_estado_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='kitmantenimientoitem',
+            constraint=models.UniqueConstraint(fields=('kit', 'producto'), name='kit_producto_unico'),
+        ),
+        migrations.AddConstraint(
+            model_name='kitmantenimiento',
+            constraint=models.UniqueConstraint(condition=models.Q(('activo', True)), fields=('activo',), name='kit_unico_activo', violation_error_message='Ya hay otro kit activo; desactívelo primero.'),
+        ),
+        migrations.RunPython(crear_kit_y_reservas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 11:24
+
+from django.db import migrations, models
+import django.db.models.functions.comparison
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0031_kits_mantenimiento_reservas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='agendamiento',
+            index=models.Index(django.db.models.functions.comparison.Coalesce('fecha_hora_programada', 'creado_en'), models.F('id'), name='agenda_fecha_orden_idx'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
-from django.db.models import Q, Sum
+from django.db.models import F, Q, Sum
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import AbstractUser, Group, Permission, UserManager
 from django.core.exceptions import ValidationError
 from django.utils import timezone
@@ -17,16 +18,44 @@ class SoftDeleteManager(models.Manager):
         return super().get_queryset().filter(is_active=True)
 
 
-class OrdenManager(models.Manager):
+class OrdenQuerySet(models.QuerySet):
+    def activas(self):
+        """Devuelve órdenes que no están finalizadas."""
+        return self.exclude(estado=Orden.Estado.FINALIZADO)
+
+    def con_detalle(self):
+        """
+        Precarga todo lo que recorre el OrdenSerializer completo (historial,
+        documentos e items con sus usuarios y productos), de modo que el
+        detalle cuesta un número fijo de consultas sin importar cuántos
+        items, documentos o cambios de estado tenga la orden.
+        """
+        return self.select_related(
+            "vehiculo", "usuario_asignado", "agendamiento_origen"
+        ).prefetch_related(
+            models.Prefetch(
+                "historial_estados",
+                queryset=OrdenHistorialEstado.objects.select_related("usuario"),
+            ),
+            models.Prefetch(
+                "documentos",
+                queryset=OrdenDocumento.objects.select_related("subido_por"),
+            ),
+            models.Prefetch(
+                "items",
+                queryset=OrdenItem.objects.select_related(
+                    "producto", "servicio", "solicitado_por", "gestionado_por"
+                ),
+            ),
+        )
+
+
+class OrdenManager(models.Manager.from_queryset(OrdenQuerySet)):
     """Manager para consultas comunes sobre Órdenes de Servicio."""
 
     def get_queryset(self):
         return super().get_queryset()
 
-    def activas(self):
-        """Devuelve órdenes que no están finalizadas."""
-        return self.get_queryset().exclude(estado=Orden.Estado.FINALIZADO)
-
 
 # --------------------------------------------------------------------------
 # MODELOS ABSTRACTOS
@@ -52,6 +81,11 @@ class Usuario(AbstractUser):
     rut = models.CharField("RUT", max_length=12, unique=True, db_index=True)
     telefono = models.CharField(max_length=50, blank=True, null=True)
     is_active = models.BooleanField(default=True)  # Para borrado lógico
+    roles_version = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Se incrementa cada vez que cambian los grupos del usuario. Invalida los roles embebidos en los tokens.",
+    )
 
     # Managers
     objects = UserManager()
@@ -141,6 +175,12 @@ class Vehiculo(TimeStampedModel):
         verbose_name_plural = "Vehículos"
 
 
+# Orden cronológico de la agenda sin nulos: la hora programada o, en las
+# solicitudes sin hora, su creación. Es la clave de la paginación por
+# cursor de las citas (ver pagination.py) y tiene su propio índice.
+AGENDA_FECHA_ORDEN = Coalesce("fecha_hora_programada", "creado_en")
+
+
 class Agendamiento(TimeStampedModel):
     class Estado(models.TextChoices):
         PROGRAMADO = "Programado", "Programado"
@@ -231,12 +271,12 @@ class Agendamiento(TimeStampedModel):
 
             # Busca si este vehículo ya tiene OTRA cita que esté "activa"
             citas_activas_existentes = Agendamiento.objects.filter(
-                vehiculo=self.vehiculo
-            ).exclude(
+                vehiculo=self.vehiculo,
                 estado__in=[
-                    Agendamiento.Estado.FINALIZADO,
-                    Agendamiento.Estado.CANCELADO,
-                ]
+                    Agendamiento.Estado.PROGRAMADO,
+                    Agendamiento.Estado.CONFIRMADO,
+                    Agendamiento.Estado.EN_TALLER,
+                ],
             )
 
             # Si ya existe una cita activa, lanza un error
@@ -261,6 +301,25 @@ class Agendamiento(TimeStampedModel):
                 name="agendamiento_activo_unico_por_vehiculo_y_fecha",
             )
         ]
+        indexes = [
+            # Agenda y carga de cada mecánico: mecánico + estados + rango horario.
+            models.Index(
+                fields=["mecanico_asignado", "estado", "fecha_hora_programada"],
+                name="agenda_mecanico_estado_idx",
+            ),
+            # Cita activa del vehículo y choques de horario del vehículo.
+            models.Index(
+                fields=["vehiculo", "estado", "fecha_hora_programada"],
+                name="agenda_vehiculo_estado_idx",
+            ),
+            # Agenda del día de Seguridad: estado + rango horario.
+            models.Index(
+                fields=["estado", "fecha_hora_programada"],
+                name="agenda_estado_fecha_idx",
+            ),
+            # Listado paginado de citas (AgendamientoCursorPagination).
+            models.Index(AGENDA_FECHA_ORDEN, F("id"), name="agenda_fecha_orden_idx"),
+        ]
 
 
 class AgendamientoHistorial(models.Model):
@@ -323,7 +382,7 @@ class Orden(TimeStampedModel):
         blank=True,
         related_name="orden_generada",
     )
-    fecha_ingreso = models.DateTimeField(default=timezone.now)
+    fecha_ingreso = models.DateTimeField(default=timezone.now, db_index=True)
     fecha_entrega_estimada = models.DateField(blank=True, null=True)
     fecha_entrega_real = models.DateTimeField(blank=True, null=True)
     estado = models.CharField(
@@ -548,6 +607,104 @@ class OrdenItem(models.Model):
         verbose_name_plural = "Ítems de Orden"
 
 
+# --------------------------------------------------------------------------
+# KITS DE MANTENIMIENTO Y RESERVAS DE REPUESTOS
+# --------------------------------------------------------------------------
+
+
+class KitMantenimiento(TimeStampedModel):
+    """Repuestos que consume una cita de mantenimiento (ver kits.py)."""
+
+    nombre = models.CharField(max_length=100, unique=True)
+    activo = models.BooleanField(
+        default=True,
+        help_text="El kit activo es el que se reserva al confirmar una cita de mantenimiento.",
+    )
+
+    def __str__(self):
+        return self.nombre
+
+    class Meta:
+        verbose_name = "Kit de Mantenimiento"
+        verbose_name_plural = "Kits de Mantenimiento"
+        constraints = [
+            # Un solo kit activo. MySQL no crea restricciones con condición,
+            # pero full_clean (admin) la valida igual con una consulta.
+            models.UniqueConstraint(
+                fields=["activo"],
+                condition=models.Q(activo=True),
+                name="kit_unico_activo",
+                violation_error_message="Ya hay otro kit activo; desactívelo primero.",
+            )
+        ]
+
+
+class KitMantenimientoItem(models.Model):
+    kit = models.ForeignKey(
+        KitMantenimiento, on_delete=models.CASCADE, related_name="items"
+    )
+    producto = models.ForeignKey(Producto, on_delete=models.PROTECT)
+    cantidad = models.PositiveIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.producto_id} (x{self.cantidad})"
+
+    class Meta:
+        verbose_name = "Repuesto del Kit"
+        verbose_name_plural = "Repuestos del Kit"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["kit", "producto"], name="kit_producto_unico"
+            )
+        ]
+
+
+class ReservaRepuesto(TimeStampedModel):
+    """
+    Repuestos apartados para una cita confirmada. El stock disponible de un
+    producto es su stock menos lo que tiene en estado RESERVADO; al
+    registrar el ingreso la reserva se convierte en OrdenItem (CONSUMIDO) y
+    al cancelarse la cita se libera.
+    """
+
+    class Estado(models.TextChoices):
+        RESERVADO = "Reservado", "Reservado"
+        CONSUMIDO = "Consumido", "Consumido"
+        LIBERADO = "Liberado", "Liberado"
+
+    agendamiento = models.ForeignKey(
+        Agendamiento, on_delete=models.CASCADE, related_name="reservas_repuestos"
+    )
+    producto = models.ForeignKey(
+        Producto, on_delete=models.PROTECT, related_name="reservas"
+    )
+    cantidad = models.PositiveIntegerField()
+    estado = models.CharField(
+        max_length=20, choices=Estado.choices, default=Estado.RESERVADO
+    )
+    orden_item = models.ForeignKey(
+        OrdenItem,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        help_text="Ítem de la orden en que se consumió la reserva.",
+    )
+
+    def __str__(self):
+        return f"{self.producto_id} (x{self.cantidad}) para cita #{self.agendamiento_id}: {self.estado}"
+
+    class Meta:
+        verbose_name = "Reserva de Repuesto"
+        verbose_name_plural = "Reservas de Repuestos"
+        indexes = [
+            # Stock disponible: suma de lo RESERVADO por producto.
+            models.Index(
+                fields=["producto", "estado"], name="reserva_producto_estado_idx"
+            ),
+        ]
+
+
 # --------------------------------------------------------------------------
 # NOTIFICACIONES
 # --------------------------------------------------------------------------
@@ -562,7 +719,7 @@ class Notificacion(models.Model):
         max_length=255, blank=True, null=True
     )  # Link para redirigir al usuario
     leida = models.BooleanField(default=False, db_index=True)
-    fecha = models.DateTimeField(auto_now_add=True)
+    fecha = models.DateTimeField(auto_now_add=True, db_index=True)
 
     def __str__(self):
         return f"Notificación a {self.usuario.username}: {self.mensaje[:30]}..."
@@ -571,6 +728,128 @@ class Notificacion(models.Model):
         verbose_name = "Notificación"
         verbose_name_plural = "Notificaciones"
         ordering = ["-fecha"]
+        indexes = [
+            # Campana y 'marcar como leídas': no leídas de un usuario.
+            models.Index(
+                fields=["usuario", "leida", "-fecha"],
+                name="notif_usuario_leida_fecha_idx",
+            ),
+            # Historial del usuario, ordenado del más reciente al más antiguo.
+            models.Index(fields=["usuario", "-fecha"], name="notif_usuario_fecha_idx"),
+        ]
+
+
+class NotificacionArchivada(models.Model):
+    """
+    Notificaciones leídas que salieron de la tabla principal por antigüedad
+    (comando 'depurar_notificaciones --archivar'). Solo se consultan para
+    auditoría; la aplicación trabaja siempre sobre Notificacion.
+    """
+
+    usuario = models.ForeignKey(
+        Usuario, on_delete=models.CASCADE, related_name="notificaciones_archivadas"
+    )
+    mensaje = models.CharField(max_length=255)
+    link = models.CharField(max_length=255, blank=True, null=True)
+    fecha = models.DateTimeField()
+    archivada_en = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return (
+            f"Notificación archivada de {self.usuario.username}: {self.mensaje[:30]}..."
+        )
+
+    class Meta:
+        verbose_name = "Notificación Archivada"
+        verbose_name_plural = "Notificaciones Archivadas"
+        ordering = ["-fecha"]
+
+
+class ContadorNotificaciones(models.Model):
+    """
+    Cantidad de notificaciones no leídas de cada usuario, para que el
+    indicador de la campana se lea por clave primaria en vez de contar
+    sobre Notificacion. Se mantiene desde accounts/notificaciones.py.
+    """
+
+    usuario = models.OneToOneField(
+        Usuario,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="contador_notificaciones",
+    )
+    no_leidas = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.usuario.username}: {self.no_leidas} sin leer"
+
+    class Meta:
+        verbose_name = "Contador de Notificaciones"
+        verbose_name_plural = "Contadores de Notificaciones"
+
+
+class CorreoPendiente(models.Model):
+    """
+    Bandeja de salida de correos (outbox). Se escribe en la misma
+    transacción que el cambio que lo origina y lo envía el comando
+    'procesar_correos', que reintenta con espera exponencial.
+    """
+
+    class Estado(models.TextChoices):
+        PENDIENTE = "Pendiente", "Pendiente"
+        ENVIADO = "Enviado", "Enviado"
+        FALLIDO = "Fallido", "Fallido"
+
+    destinatario = models.EmailField()
+    asunto = models.CharField(max_length=255)
+    cuerpo_texto = models.TextField()
+    cuerpo_html = models.TextField(blank=True)
+    estado = models.CharField(
+        max_length=20, choices=Estado.choices, default=Estado.PENDIENTE
+    )
+    intentos = models.PositiveIntegerField(default=0)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    ultimo_error = models.TextField(blank=True)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    enviado_en = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Correo a {self.destinatario}: {self.asunto} ({self.estado})"
+
+    class Meta:
+        verbose_name = "Correo Pendiente"
+        verbose_name_plural = "Correos Pendientes"
+        ordering = ["proximo_intento", "id"]
+        indexes = [
+            models.Index(
+                fields=["estado", "proximo_intento"],
+                name="correo_estado_proximo_idx",
+            )
+        ]
+
+
+# --------------------------------------------------------------------------
+# INDICADORES (KPIs DEL DASHBOARD)
+# --------------------------------------------------------------------------
+
+
+class IndicadorTaller(models.Model):
+    """
+    Contador materializado para el dashboard del Jefetaller.
+    La clave identifica el indicador y, si aplica, el día
+    (ej: "ordenes_estado:En Proceso", "ordenes_creadas:2025-11-17").
+    Se mantiene desde accounts/kpis.py mediante señales.
+    """
+
+    clave = models.CharField(max_length=100, unique=True)
+    valor = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.clave} = {self.valor}"
+
+    class Meta:
+        verbose_name = "Indicador del Taller"
+        verbose_name_plural = "Indicadores del Taller"
 
 
 # --------------------------------------------------------------------------
@@ -646,7 +925,7 @@ class PrestamoLlave(TimeStampedModel):
         Usuario, on_delete=models.PROTECT, related_name="prestamos_realizados"
     )
 
-    fecha_hora_retiro = models.DateTimeField(default=timezone.now)
+    fecha_hora_retiro = models.DateTimeField(default=timezone.now, db_index=True)
     fecha_hora_devolucion = models.DateTimeField(blank=True, null=True, db_index=True)
 
     observaciones_retiro = models.TextField(blank=True, null=True)
@@ -678,7 +957,7 @@ class LlaveHistorialEstado(TimeStampedModel):
     estado_anterior = models.CharField(max_length=50, blank=True, null=True)
     estado_nuevo = models.CharField(max_length=50)
     motivo = models.TextField(blank=True, null=True)
-    fecha = models.DateTimeField(default=timezone.now)
+    fecha = models.DateTimeField(default=timezone.now, db_index=True)
 
     def __str__(self):
         return f"{self.llave.codigo_interno}: {self.estado_anterior} -> {self.estado_nuevo}"
@@ -720,6 +999,14 @@ class ChatRoom(TimeStampedModel):
         null=True,
         help_text="Nombre opcional para chats grupales.",
     )
+    clave_par = models.CharField(
+        max_length=50,
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Para chats 1-a-1: ids de ambos usuarios ordenados ('3:7').",
+    )
 
     def __str__(self):
         if self.nombre:
@@ -753,9 +1040,6 @@ class ChatMessage(TimeStampedModel):
     )
     contenido = models.TextField("Contenido del Mensaje")
 
-    leido_por = models.ManyToManyField(
-        Usuario, related_name="mensajes_leidos", verbose_name="Leído por", blank=True
-    )
     archivo = models.FileField(
         "Archivo Adjunto", upload_to="chat_archivos/%Y/%m/", blank=True, null=True
     )
@@ -768,3 +1052,66 @@ class ChatMessage(TimeStampedModel):
         verbose_name = "Mensaje de Chat"
         verbose_name_plural = "Mensajes de Chat"
         ordering = ["creado_en"]  # Mostrar los más antiguos primero (orden cronológico)
+        indexes = [
+            # Historial paginado por id dentro de una sala (before / after).
+            models.Index(fields=["room", "id"], name="chat_msg_room_id_idx")
+        ]
+
+
+class ChatLectura(models.Model):
+    """
+    Hasta qué mensaje leyó cada participante en cada sala (marca de agua).
+    Todo mensaje de la sala con id mayor a 'ultimo_mensaje_leido' (y que no
+    sea del propio usuario) cuenta como no leído. Marcar como leído es un
+    solo UPDATE, sin importar cuántos mensajes haya.
+    """
+
+    room = models.ForeignKey(
+        ChatRoom, on_delete=models.CASCADE, related_name="lecturas", verbose_name="Sala"
+    )
+    usuario = models.ForeignKey(
+        Usuario, on_delete=models.CASCADE, related_name="lecturas_chat"
+    )
+    ultimo_mensaje_leido = models.PositiveBigIntegerField(default=0)
+    leido_en = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.usuario.username} leyó {self.room_id} hasta {self.ultimo_mensaje_leido}"
+
+    class Meta:
+        verbose_name = "Lectura de Chat"
+        verbose_name_plural = "Lecturas de Chat"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["room", "usuario"], name="chat_lectura_unica_room_usuario"
+            )
+        ]
+
+
+class ChatTermino(models.Model):
+    """
+    Índice invertido para la búsqueda en el chat: una fila por cada palabra
+    distinta (normalizada: minúsculas y sin tildes) de cada mensaje. Se
+    mantiene al guardar el mensaje (ver signals.py). La sala va repetida
+    para filtrar por las salas del usuario sin pasar por el mensaje.
+    """
+
+    termino = models.CharField(max_length=40)
+    room = models.ForeignKey(
+        ChatRoom, on_delete=models.CASCADE, related_name="+", verbose_name="Sala"
+    )
+    mensaje = models.ForeignKey(
+        ChatMessage, on_delete=models.CASCADE, related_name="terminos"
+    )
+
+    def __str__(self):
+        return f"{self.termino} ({self.mensaje_id})"
+
+    class Meta:
+        verbose_name = "Término de Chat"
+        verbose_name_plural = "Términos de Chat"
+        indexes = [
+            models.Index(
+                fields=["termino", "room", "mensaje"], name="chat_termino_busqueda_idx"
+            )
+        ]
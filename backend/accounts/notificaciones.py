@@ -0,0 +1,149 @@
+"""
+Envío de notificaciones (en la aplicación y por correo) a varios usuarios.
+
+Los destinatarios se resuelven una sola vez y las notificaciones se
+insertan con bulk_create, de modo que avisar a un rol completo cuesta
+un número fijo de consultas sin importar cuántos usuarios tenga.
+
+También mantiene ContadorNotificaciones (no leídas por usuario), que es
+lo que consulta el indicador de la campana.
+"""
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .correos import enviar_correos_notificacion
+from .eventos import publicar_eventos, usuarios_conectados
+from .models import ContadorNotificaciones, Notificacion
+
+User = get_user_model()
+
+
+def usuarios_con_rol(*roles):
+    """Usuarios activos que pertenecen a alguno de los roles (sin repetir)."""
+    return User.objects.filter(groups__name__in=roles, is_active=True).distinct()
+
+
+def notificar_usuarios(usuarios, mensaje, link=None, asunto=None, cuerpo_correo=None):
+    """
+    Crea una Notificacion para cada usuario y, si se indica un asunto,
+    deja también un correo en la bandeja de salida (con 'cuerpo_correo'
+    o, si no se indica, el mismo mensaje).
+    Devuelve la lista de usuarios notificados.
+    """
+    usuarios = list({u.pk: u for u in usuarios if u is not None}.values())
+    if not usuarios:
+        return []
+
+    with transaction.atomic():
+        Notificacion.objects.bulk_create(
+            Notificacion(usuario=usuario, mensaje=mensaje, link=link)
+            for usuario in usuarios
+        )
+        _incrementar_no_leidas([usuario.pk for usuario in usuarios])
+        _publicar_notificacion(usuarios, mensaje, link)
+    if asunto:
+        enviar_correos_notificacion(usuarios, asunto, cuerpo_correo or mensaje)
+    return usuarios
+
+
+def notificar_roles(
+    roles, mensaje, link=None, asunto=None, cuerpo_correo=None, excluir=None
+):
+    """Notifica a todos los usuarios activos de los roles indicados."""
+    usuarios = usuarios_con_rol(*roles)
+    if excluir is not None:
+        usuarios = usuarios.exclude(pk=excluir.pk)
+    return notificar_usuarios(usuarios, mensaje, link, asunto, cuerpo_correo)
+
+
+def _incrementar_no_leidas(usuario_ids):
+    # Crea los contadores que falten y luego suma 1 a todos en un UPDATE.
+    ContadorNotificaciones.objects.bulk_create(
+        [ContadorNotificaciones(usuario_id=pk) for pk in usuario_ids],
+        ignore_conflicts=True,
+    )
+    ContadorNotificaciones.objects.filter(usuario_id__in=usuario_ids).update(
+        no_leidas=F("no_leidas") + 1
+    )
+
+
+def contar_no_leidas(usuario):
+    """Notificaciones no leídas del usuario (lectura por clave primaria)."""
+    return (
+        ContadorNotificaciones.objects.filter(pk=usuario.pk)
+        .values_list("no_leidas", flat=True)
+        .first()
+        or 0
+    )
+
+
+@transaction.atomic
+def marcar_como_leidas(usuario):
+    """Marca como leídas todas las notificaciones del usuario."""
+    marcadas = Notificacion.objects.filter(usuario=usuario, leida=False).update(
+        leida=True
+    )
+    if marcadas:
+        # Se resta lo marcado (y no se pone en 0) para no perder las
+        # notificaciones que otra petición haya creado mientras tanto.
+        ContadorNotificaciones.objects.filter(pk=usuario.pk).update(
+            no_leidas=Greatest(F("no_leidas") - marcadas, 0)
+        )
+        _publicar_no_leidas([usuario.pk])
+    return marcadas
+
+
+def recalcular_no_leidas(usuario_id):
+    """
+    Vuelve a contar las no leídas de un usuario. Se usa cuando una
+    notificación se crea, edita o elimina de a una (admin, carga de datos).
+    """
+    total = Notificacion.objects.filter(usuario_id=usuario_id, leida=False).count()
+    ContadorNotificaciones.objects.update_or_create(
+        usuario_id=usuario_id, defaults={"no_leidas": total}
+    )
+    _publicar_no_leidas([usuario_id])
+
+
+def _no_leidas_de(usuario_ids):
+    return dict(
+        ContadorNotificaciones.objects.filter(pk__in=usuario_ids).values_list(
+            "pk", "no_leidas"
+        )
+    )
+
+
+def _publicar_notificacion(usuarios, mensaje, link):
+    # Solo se consulta el contador de quienes tienen el stream abierto.
+    conectados = usuarios_conectados(usuario.pk for usuario in usuarios)
+    if not conectados:
+        return
+    no_leidas = _no_leidas_de(conectados)
+    fecha = timezone.now()
+    publicar_eventos(
+        (
+            pk,
+            "notificacion",
+            {
+                "mensaje": mensaje,
+                "link": link,
+                "fecha": fecha,
+                "no_leidas": no_leidas.get(pk, 0),
+            },
+        )
+        for pk in conectados
+    )
+
+
+def _publicar_no_leidas(usuario_ids):
+    conectados = usuarios_conectados(usuario_ids)
+    if not conectados:
+        return
+    no_leidas = _no_leidas_de(conectados)
+    publicar_eventos(
+        (pk, "no_leidas", {"no_leidas": no_leidas.get(pk, 0)}) for pk in conectados
+    )
@@ -0,0 +1,45 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CursorPaginacion(CursorPagination):
+    """
+    Paginación por cursor (keyset): cada página filtra por la posición del
+    cursor en vez de usar OFFSET, así que su costo no depende del tamaño de
+    la tabla. Las respuestas tienen la forma {next, previous, results}.
+
+    El cursor guarda solo el valor del primer campo de 'ordering'; los
+    siguientes hacen el orden determinista, y las filas con el mismo valor
+    DRF las salta con un desplazamiento. Por eso el primer campo debe ser
+    una columna indexada, no nula y casi única (un timestamp o el id).
+    """
+
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+
+
+class OrdenCursorPagination(CursorPaginacion):
+    ordering = ("-fecha_ingreso", "-id")
+
+
+class NotificacionCursorPagination(CursorPaginacion):
+    ordering = ("-fecha", "-id")
+
+
+class PrestamoLlaveCursorPagination(CursorPaginacion):
+    ordering = ("-fecha_hora_retiro", "-id")
+
+
+class LlaveHistorialEstadoCursorPagination(CursorPaginacion):
+    ordering = ("-fecha", "-id")
+
+
+class AgendamientoCursorPagination(CursorPaginacion):
+    """
+    Citas en orden cronológico. 'fecha_hora_programada' es nula en las
+    solicitudes sin hora asignada y un cursor sobre ella perdería esas
+    filas, así que se pagina por 'fecha_orden' (AGENDA_FECHA_ORDEN: la hora
+    programada o la creación), que la vista anota y que tiene índice.
+    """
+
+    ordering = ("fecha_orden", "id")
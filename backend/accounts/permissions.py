@@ -1,5 +1,7 @@
 from rest_framework.permissions import BasePermission
 
+from .roles import user_has_role
+
 
 class IsSupervisor(BasePermission):
     """
@@ -9,7 +11,6 @@ class IsSupervisor(BasePermission):
 
     def has_permission(self, request, view):
 
-        return (
-            request.user.is_authenticated
-            and request.user.groups.filter(name="Supervisor").exists()
+        return request.user.is_authenticated and user_has_role(
+            request.user, "Supervisor"
         )
@@ -0,0 +1,35 @@
+"""
+Resolución de roles (grupos) del usuario.
+
+Los nombres de grupo se cargan una sola vez por petición y se guardan en la
+instancia del usuario autenticado, de modo que los permisos, los viewsets y
+los serializers comparten la misma consulta.
+"""
+
+ROLES_CACHE_ATTR = "_roles_cache"
+
+
+def get_user_roles(user):
+    """
+    Devuelve un frozenset con los nombres de grupo del usuario.
+    La primera llamada consulta la BD; las siguientes usan la caché.
+    """
+    if not user or not user.is_authenticated:
+        return frozenset()
+
+    roles = getattr(user, ROLES_CACHE_ATTR, None)
+    if roles is None:
+        roles = frozenset(user.groups.values_list("name", flat=True))
+        setattr(user, ROLES_CACHE_ATTR, roles)
+    return roles
+
+
+def user_has_role(user, *roles):
+    """Indica si el usuario pertenece a alguno de los grupos indicados."""
+    return not get_user_roles(user).isdisjoint(roles)
+
+
+def clear_user_roles(user):
+    """Descarta los roles cacheados (usar tras modificar los grupos)."""
+    if user is not None and hasattr(user, ROLES_CACHE_ATTR):
+        delattr(user, ROLES_CACHE_ATTR)
@@ -27,9 +27,14 @@ from .models import (
     ChatRoom, ChatMessage
 )
 
+from .roles import user_has_role, clear_user_roles
+
 import os
 from django.core.exceptions import ValidationError as DjangoValidationError
 
+# Largo máximo del texto del último mensaje en la bandeja de chat.
+CHAT_VISTA_PREVIA_MAX = 120
+
 
 
 
@@ -328,6 +333,7 @@ class UserCreateUpdateSerializer(serializers.ModelSerializer):
                 instance.groups.add(group)
             except Group.DoesNotExist:
                 pass
+            clear_user_roles(instance)
 
         password = validated_data.pop("password", None)
         if password:
@@ -533,7 +539,7 @@ class AgendamientoSerializer(serializers.ModelSerializer):
         """Filtra los vehículos visibles según el rol del usuario."""
         super().__init__(*args, **kwargs)
         user = self.context.get("request").user if "request" in self.context else None
-        if user and user.groups.filter(name="Chofer").exists():
+        if user and user_has_role(user, "Chofer"):
             self.fields["vehiculo"].queryset = Vehiculo.activos.filter(chofer=user)
 
 
@@ -733,6 +739,65 @@ class OrdenSerializer(serializers.ModelSerializer):
         extra_kwargs = {"vehiculo": {"queryset": Vehiculo.activos.all()}}
 
 
+class OrdenListSerializer(serializers.ModelSerializer):
+    """
+    Serializador compacto para el LISTADO de órdenes.
+    Solo usa columnas de la orden y de sus relaciones directas
+    (vehículo, mecánico y agendamiento de origen), por lo que con
+    select_related el listado completo cuesta una sola consulta.
+    """
+
+    vehiculo_info = serializers.StringRelatedField(source="vehiculo", read_only=True)
+    asignado_a = serializers.CharField(
+        source="usuario_asignado.get_full_name", read_only=True, default="No asignado"
+    )
+    hora_agendada = serializers.DateTimeField(
+        source="agendamiento_origen.fecha_hora_programada",
+        read_only=True,
+        allow_null=True,
+    )
+
+    class Meta:
+        model = Orden
+        fields = [
+            "id",
+            "vehiculo",
+            "vehiculo_info",
+            "agendamiento_origen",
+            "fecha_ingreso",
+            "fecha_entrega_estimada",
+            "fecha_entrega_real",
+            "estado",
+            "descripcion_falla",
+            "diagnostico_tecnico",
+            "usuario_asignado",
+            "asignado_a",
+            "hora_agendada",
+        ]
+        read_only_fields = fields
+
+
+class OrdenTareaSerializer(serializers.ModelSerializer):
+    """
+    Proyección mínima de una orden para la lista de tareas del mecánico.
+    Solo incluye lo que muestra cada tarjeta del dashboard.
+    """
+
+    vehiculo_info = serializers.StringRelatedField(source="vehiculo", read_only=True)
+
+    class Meta:
+        model = Orden
+        fields = [
+            "id",
+            "vehiculo_info",
+            "estado",
+            "descripcion_falla",
+            "fecha_ingreso",
+            "fecha_entrega_estimada",
+        ]
+        read_only_fields = fields
+
+
 class OrdenSalidaListSerializer(serializers.ModelSerializer):
     """
     Serializer para listar las órdenes que están 'Finalizado' pero
@@ -989,6 +1054,37 @@ class ChatMessageSerializer(serializers.ModelSerializer):
             )
         return data
 
+
+class ChatAutorSerializer(serializers.ModelSerializer):
+    """
+    Datos mínimos del autor de mensajes de chat. Se envían una vez por
+    página (los grupos deben venir con prefetch_related("groups")).
+    """
+
+    rol = serializers.SerializerMethodField(read_only=True)
+
+    class Meta:
+        model = User
+        fields = ["id", "username", "first_name", "last_name", "rol"]
+
+    def get_rol(self, obj):
+        # Mismo criterio que UserSerializer (primer grupo), sin otra consulta.
+        grupos = sorted(obj.groups.all(), key=lambda grupo: grupo.pk)
+        return grupos[0].name if grupos else None
+
+
+class ChatMensajeSerializer(serializers.ModelSerializer):
+    """
+    Mensaje de chat para el historial paginado: el autor va solo como id
+    y sus datos se envían aparte, una vez por página.
+    """
+
+    class Meta:
+        model = ChatMessage
+        fields = ["id", "room", "autor", "contenido", "archivo", "creado_en"]
+        read_only_fields = fields
+
+
 class ChatRoomSerializer(serializers.ModelSerializer):
     """
     Serializa una sala de chat, incluyendo sus participantes.
@@ -1003,6 +1099,41 @@ class ChatRoomSerializer(serializers.ModelSerializer):
         
         
         
+class ChatBandejaSerializer(serializers.ModelSerializer):
+    """
+    Sala de chat para la bandeja de entrada: participantes, vista previa
+    del último mensaje y cantidad de no leídos. Espera el queryset de
+    chat.bandeja_salas (anotaciones 'ultimo_*' y 'no_leidos').
+    """
+
+    participantes = ChatAutorSerializer(many=True, read_only=True)
+    ultimo_mensaje = serializers.SerializerMethodField()
+    no_leidos = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = ChatRoom
+        fields = [
+            "id",
+            "nombre",
+            "participantes",
+            "actualizado_en",
+            "ultimo_mensaje",
+            "no_leidos",
+        ]
+        read_only_fields = fields
+
+    def get_ultimo_mensaje(self, obj):
+        if obj.ultimo_id is None:
+            return None
+        return {
+            "id": obj.ultimo_id,
+            "autor": obj.ultimo_autor_id,
+            "contenido": obj.ultimo_contenido[:CHAT_VISTA_PREVIA_MAX],
+            "tiene_archivo": bool(obj.ultimo_archivo),
+            "creado_en": obj.ultimo_creado_en,
+        }
+
+
 class ChatRoomCreateSerializer(serializers.Serializer):
     """
     Serializer para crear una nueva sala de chat.
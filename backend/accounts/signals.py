@@ -0,0 +1,163 @@
+from django.contrib.auth.models import Group
+from django.db.models import F
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_init,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from . import kits, kpis
+from .chat import asegurar_lecturas, indexar_mensaje
+from .eventos import avisar_cambio_participantes
+from .models import (
+    Agendamiento,
+    ChatLectura,
+    ChatMessage,
+    ChatRoom,
+    Notificacion,
+    Orden,
+    Usuario,
+)
+from .notificaciones import recalcular_no_leidas
+from .roles import clear_user_roles
+
+
+def _incrementar_roles_version(usuario_ids):
+    Usuario.objects.filter(pk__in=usuario_ids).update(
+        roles_version=F("roles_version") + 1
+    )
+
+
+@receiver(m2m_changed, sender=Usuario.groups.through)
+def invalidar_roles_usuario(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Incrementa 'roles_version' cuando cambian los grupos de un usuario,
+    invalidando los roles embebidos en sus tokens JWT.
+    """
+    if not reverse:
+        # usuario.groups.add/remove/clear/set
+        if action in ("post_add", "post_remove", "post_clear"):
+            _incrementar_roles_version([instance.pk])
+            # Evita que un save() posterior de esta instancia pise el contador.
+            instance.refresh_from_db(fields=["roles_version"])
+            clear_user_roles(instance)
+        return
+
+    # grupo.usuario_set.add/remove/clear
+    if action == "pre_clear":
+        instance._usuarios_afectados = list(
+            instance.usuario_set.values_list("pk", flat=True)
+        )
+    elif action == "post_clear":
+        _incrementar_roles_version(getattr(instance, "_usuarios_afectados", []))
+    elif action in ("post_add", "post_remove") and pk_set:
+        _incrementar_roles_version(pk_set)
+
+
+@receiver(pre_delete, sender=Group)
+def invalidar_roles_al_eliminar_grupo(sender, instance, **kwargs):
+    # Borrar un grupo elimina sus filas intermedias sin enviar m2m_changed.
+    _incrementar_roles_version(instance.usuario_set.values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=Group)
+def invalidar_roles_al_renombrar_grupo(sender, instance, created, **kwargs):
+    # Los tokens llevan el nombre del grupo: renombrarlo los deja obsoletos.
+    if not created:
+        _incrementar_roles_version(instance.usuario_set.values_list("pk", flat=True))
+
+
+@receiver(post_init, sender=Orden)
+@receiver(post_init, sender=Agendamiento)
+def recordar_aporte_kpi(sender, instance, **kwargs):
+    kpis.guardar_aporte(instance)
+
+
+@receiver(pre_save, sender=Orden)
+@receiver(pre_save, sender=Agendamiento)
+def completar_aporte_kpi(sender, instance, **kwargs):
+    kpis.completar_aporte(instance)
+
+
+@receiver(post_save, sender=Orden)
+@receiver(post_save, sender=Agendamiento)
+def actualizar_kpis_al_guardar(sender, instance, created, **kwargs):
+    kpis.registrar_cambio(instance, created)
+
+
+@receiver(post_init, sender=Agendamiento)
+def recordar_estado_cita(sender, instance, **kwargs):
+    kits.recordar_estado(instance)
+
+
+@receiver(pre_save, sender=Agendamiento)
+def completar_estado_cita(sender, instance, **kwargs):
+    kits.completar_estado(instance)
+
+
+@receiver(post_save, sender=Agendamiento)
+def liberar_repuestos_al_cerrar(sender, instance, created, **kwargs):
+    # Cancelada desde la API, el admin o la acción 'cancelar': los repuestos
+    # reservados vuelven a estar disponibles. (Al ingresar ya se consumieron.)
+    kits.liberar_si_cierra(instance, created)
+
+
+@receiver(post_delete, sender=Orden)
+@receiver(post_delete, sender=Agendamiento)
+def actualizar_kpis_al_eliminar(sender, instance, **kwargs):
+    kpis.registrar_eliminacion(instance)
+
+
+@receiver(post_save, sender=Notificacion)
+def actualizar_contador_notificaciones(sender, instance, **kwargs):
+    # Solo llegan aquí los cambios de a una fila; los masivos
+    # (notificar_usuarios, marcar_como_leidas) ajustan el contador ellos mismos.
+    recalcular_no_leidas(instance.usuario_id)
+
+
+@receiver(post_delete, sender=Notificacion)
+def actualizar_contador_al_eliminar(sender, instance, **kwargs):
+    # Borrar una notificación ya leída (p. ej. la depuración por antigüedad)
+    # no cambia el contador.
+    if not instance.leida:
+        recalcular_no_leidas(instance.usuario_id)
+
+
+@receiver(m2m_changed, sender=ChatRoom.participantes.through)
+def sincronizar_lecturas_chat(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Mantiene una marca de lectura (ChatLectura) por participante de cada
+    sala, y avisa a los WebSocket abiertos cuando alguien sale de una sala.
+    """
+    if action == "post_add":
+        if reverse:
+            # usuario.chat_rooms.add(...)
+            for room_id in pk_set:
+                asegurar_lecturas(room_id, [instance.pk])
+        else:
+            asegurar_lecturas(instance.pk, pk_set)
+    elif action == "post_remove":
+        if reverse:
+            ChatLectura.objects.filter(usuario=instance, room_id__in=pk_set).delete()
+            avisar_cambio_participantes(pk_set)
+        else:
+            ChatLectura.objects.filter(room=instance, usuario_id__in=pk_set).delete()
+            avisar_cambio_participantes([instance.pk])
+    elif action == "pre_clear" and reverse:
+        instance._salas_previas = list(instance.chat_rooms.values_list("pk", flat=True))
+    elif action == "post_clear":
+        if reverse:
+            ChatLectura.objects.filter(usuario=instance).delete()
+            avisar_cambio_participantes(getattr(instance, "_salas_previas", []))
+        else:
+            ChatLectura.objects.filter(room=instance).delete()
+            avisar_cambio_participantes([instance.pk])
+
+
+@receiver(post_save, sender=ChatMessage)
+def indexar_mensaje_chat(sender, instance, created, **kwargs):
+    indexar_mensaje(instance, creado=created)
@@ -1,3 +1,1451 @@
+import re
+from datetime import datetime, time, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import Group
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.management import call_command
+from django.db import connection, transaction
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from . import correos, eventos
+from .agenda import (
+    ESTADOS_OCUPAN_MECANICO,
+    ESTADOS_OCUPAN_VEHICULO,
+    citas_que_ocupan,
+    horarios_disponibles,
+    matriz_disponibilidad,
+    planificar_agenda,
+)
+from .authentication import RolJWTAuthentication, usuario_desde_ticket
+from .chat import (
+    buscar_mensajes,
+    clave_par,
+    contar_no_leidos,
+    marcar_leido,
+    obtener_o_crear_sala_directa,
+    pagina_mensajes,
+)
+from .kits import (
+    StockInsuficiente,
+    consumir_reservas,
+    disponibilidad,
+    reservar_kit,
+    reservar_kits,
+)
+from .kpis import obtener_kpis_dashboard, recalcular_indicadores
+from .models import (
+    Agendamiento,
+    AgendamientoHistorial,
+    ChatLectura,
+    ChatMessage,
+    ChatRoom,
+    IndicadorTaller,
+    KitMantenimiento,
+    KitMantenimientoItem,
+    Notificacion,
+    Orden,
+    OrdenDocumento,
+    OrdenHistorialEstado,
+    OrdenItem,
+    Producto,
+    ReservaRepuesto,
+    Usuario,
+    Vehiculo,
+)
+from .notificaciones import contar_no_leidas, marcar_como_leidas, notificar_usuarios
+from .roles import get_user_roles
+from .tokens import RolRefreshToken, RolTokenRefreshSerializer
+from .views import MecanicoAgendaView, MisProximasCitasView, SeguridadAgendaView
+
+
+class PlanesConsultasAgendaTests(TestCase):
+    """
+    Revisa con EXPLAIN que las consultas calientes de la agenda usen los
+    índices compuestos de Agendamiento y no vuelvan a recorrer la tabla
+    completa. Los datos se generan en volumen suficiente para que el
+    planificador prefiera un índice cuando existe uno adecuado.
+    """
+
+    MECANICOS = 30
+    VEHICULOS = 600
+    CITAS_POR_VEHICULO = 8
+
+    @classmethod
+    def setUpTestData(cls):
+        grupo = Group.objects.create(name="Mecanico")
+        creador = Usuario.objects.create(username="jefe-plan", rut="plan-0")
+        mecanicos = Usuario.objects.bulk_create(
+            Usuario(username=f"mec-plan-{i}", rut=f"plan-m{i}", password="!")
+            for i in range(cls.MECANICOS)
+        )
+        grupo.usuario_set.add(*mecanicos)
+        vehiculos = Vehiculo.objects.bulk_create(
+            Vehiculo(patente=f"PL{i:04d}", marca="Marca", modelo="Modelo", anio=2020)
+            for i in range(cls.VEHICULOS)
+        )
+
+        # Historial de varios meses: la mayoría finalizadas o canceladas,
+        # como en producción, y unas pocas activas.
+        estados = [
+            Agendamiento.Estado.FINALIZADO,
+            Agendamiento.Estado.FINALIZADO,
+            Agendamiento.Estado.FINALIZADO,
+            Agendamiento.Estado.CANCELADO,
+            Agendamiento.Estado.FINALIZADO,
+            Agendamiento.Estado.FINALIZADO,
+            Agendamiento.Estado.PROGRAMADO,
+            Agendamiento.Estado.CONFIRMADO,
+        ]
+        inicio = timezone.now() - timedelta(days=180)
+        citas = []
+        for v, vehiculo in enumerate(vehiculos):
+            for n in range(cls.CITAS_POR_VEHICULO):
+                programada = inicio + timedelta(days=n * 25, hours=v % 10)
+                citas.append(
+                    Agendamiento(
+                        vehiculo=vehiculo,
+                        mecanico_asignado=mecanicos[(v + n) % cls.MECANICOS],
+                        creado_por=creador,
+                        fecha_hora_programada=programada,
+                        fecha_hora_fin=programada + timedelta(minutes=60),
+                        estado=estados[n],
+                    )
+                )
+        Agendamiento.objects.bulk_create(citas, batch_size=1000)
+
+        with connection.cursor() as cursor:
+            tabla = connection.ops.quote_name(Agendamiento._meta.db_table)
+            if connection.vendor == "mysql":
+                cursor.execute(f"ANALYZE TABLE {tabla}")
+            else:
+                cursor.execute(f"ANALYZE {tabla}")
+
+        cls.mecanico = mecanicos[0]
+        cls.vehiculo = vehiculos[0]
+
+    def assertUsaIndice(self, queryset, indice):
+        """El plan no recorre la tabla completa y busca en 'indice'."""
+        tabla = Agendamiento._meta.db_table
+        if connection.vendor == "mysql":
+            plan = queryset.explain(format="json")
+            tipos = re.findall(r'"access_type":\s*"(\w+)"', plan)
+            completo = "ALL" in tipos or "index" in tipos
+        elif connection.vendor == "postgresql":
+            plan = queryset.explain()
+            completo = f"Seq Scan on {tabla}" in plan
+        else:
+            plan = queryset.explain()
+            completo = re.search(rf"\bSCAN {tabla}\b", plan) is not None
+        self.assertFalse(completo, f"Recorrido completo de {tabla}:\n{plan}")
+        self.assertIn(indice, plan, f"No se usa {indice}:\n{plan}")
+
+    def _vista(self, clase, usuario, **kwargs):
+        request = Request(APIRequestFactory().get("/", kwargs.pop("params", {})))
+        request.user = usuario
+        vista = clase()
+        vista.request = request
+        vista.kwargs = kwargs
+        return vista
+
+    def test_agenda_del_mecanico(self):
+        vista = self._vista(
+            MecanicoAgendaView,
+            self.mecanico,
+            mecanico_id=self.mecanico.pk,
+            params={"fecha": timezone.localdate().isoformat()},
+        )
+        self.assertUsaIndice(vista.get_queryset(), "agenda_mecanico_estado_idx")
+
+    def test_proximas_citas_del_mecanico(self):
+        vista = self._vista(MisProximasCitasView, self.mecanico)
+        self.assertUsaIndice(vista.get_queryset(), "agenda_mecanico_estado_idx")
+
+    def test_agenda_del_dia_de_seguridad(self):
+        vista = self._vista(SeguridadAgendaView, self.mecanico)
+        self.assertUsaIndice(vista.get_queryset(), "agenda_estado_fecha_idx")
+
+    def test_cita_activa_del_vehiculo(self):
+        # Misma consulta que Agendamiento.clean al crear una cita.
+        queryset = Agendamiento.objects.filter(
+            vehiculo=self.vehiculo, estado__in=ESTADOS_OCUPAN_VEHICULO
+        )
+        self.assertUsaIndice(queryset, "agenda_vehiculo_estado_idx")
+
+    def test_ocupacion_de_mecanicos_y_vehiculo(self):
+        desde = timezone.make_aware(
+            datetime.combine(timezone.localdate(), datetime.min.time())
+        )
+        queryset = citas_que_ocupan(
+            [self.mecanico.pk],
+            desde,
+            desde + timedelta(days=7),
+            vehiculo_ids=[self.vehiculo.pk],
+        )
+        self.assertUsaIndice(queryset, "agenda_mecanico_estado_idx")
+        self.assertUsaIndice(queryset, "agenda_vehiculo_estado_idx")
+        self.assertTrue(
+            all(
+                cita.estado in ESTADOS_OCUPAN_MECANICO
+                or cita.vehiculo_id == self.vehiculo.pk
+                for cita in queryset
+            )
+        )
+
+
+class TicketEventosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create(username="ticket", rut="ticket-1")
+
+    def test_ticket_identifica_al_usuario(self):
+        cliente = APIClient()
+        cliente.force_authenticate(self.usuario)
+        respuesta = cliente.post(reverse("eventos-ticket"))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(usuario_desde_ticket(respuesta.data["ticket"]), self.usuario)
+
+    def test_access_token_no_sirve_como_ticket(self):
+        access = str(RolRefreshToken.for_user(self.usuario).access_token)
+        with self.assertRaises(InvalidToken):
+            usuario_desde_ticket(access)
+        with self.assertRaises(InvalidToken):
+            usuario_desde_ticket("")
+
+    def test_stream_bajo_wsgi_responde_503(self):
+        respuesta = self.client.get(reverse("eventos-stream"))
+        self.assertEqual(respuesta.status_code, 503)
+
+    def test_broker_en_memoria_con_varios_procesos_no_arranca(self):
+        with mock.patch.object(eventos, "_broker", None), mock.patch.object(
+            eventos, "EVENTOS_PROCESOS", 2
+        ):
+            with self.assertRaises(ImproperlyConfigured):
+                eventos.obtener_broker()
+            self.assertIsNone(eventos._broker)
+
+
+class IndicadoresTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vehiculo = Vehiculo.objects.create(
+            patente="KPI001", marca="Marca", modelo="Modelo", anio=2020
+        )
+
+    def valores(self):
+        return dict(
+            IndicadorTaller.objects.exclude(valor=0).values_list("clave", "valor")
+        )
+
+    def test_cambio_con_campos_diferidos(self):
+        orden = Orden.objects.create(vehiculo=self.vehiculo, descripcion_falla="x")
+        diferida = Orden.objects.only("pk", "vehiculo").get(pk=orden.pk)
+        diferida.estado = Orden.Estado.FINALIZADO
+        diferida.fecha_entrega_real = timezone.now()
+        diferida.save()
+
+        valores = self.valores()
+        self.assertNotIn(f"ordenes_estado:{Orden.Estado.INGRESADO}", valores)
+        self.assertEqual(valores[f"ordenes_estado:{Orden.Estado.FINALIZADO}"], 1)
+        recalcular_indicadores()
+        self.assertEqual(self.valores(), valores)
+
+    def en_taller(self):
+        kpis = obtener_kpis_dashboard(["L", "M", "X", "J", "V", "S", "D"])["kpis"]
+        return kpis["vehiculosEnTaller"]
+
+    def test_vehiculos_en_taller_cuenta_vehiculos_distintos(self):
+        otro = Vehiculo.objects.create(
+            patente="KPI002", marca="Marca", modelo="Modelo", anio=2020
+        )
+        primera = Orden.objects.create(vehiculo=self.vehiculo, descripcion_falla="a")
+        segunda = Orden.objects.create(vehiculo=self.vehiculo, descripcion_falla="b")
+        Orden.objects.create(vehiculo=otro, descripcion_falla="c")
+        self.assertEqual(self.en_taller(), 2)
+
+        primera.estado = Orden.Estado.FINALIZADO
+        primera.save()
+        self.assertEqual(self.en_taller(), 2)
+        segunda.estado = Orden.Estado.FINALIZADO
+        segunda.save()
+        self.assertEqual(self.en_taller(), 1)
+        segunda.delete()
+        primera.delete()
+        self.assertEqual(self.en_taller(), 1)
+
+        valores = self.valores()
+        recalcular_indicadores()
+        self.assertEqual(self.valores(), valores)
+
+
+class PaginacionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.jefe = Usuario.objects.create(username="jefe-pag", rut="pag-1")
+        cls.jefe.groups.add(Group.objects.create(name="Jefetaller"))
+        vehiculo = Vehiculo.objects.create(
+            patente="PAG001", marca="Marca", modelo="Modelo", anio=2020
+        )
+        inicio = timezone.now() - timedelta(days=10)
+        for i in range(5):
+            Orden.objects.create(
+                vehiculo=vehiculo,
+                descripcion_falla=f"falla {i}",
+                fecha_ingreso=inicio + timedelta(days=i),
+                estado=Orden.Estado.FINALIZADO if i % 2 else Orden.Estado.INGRESADO,
+            )
+
+    def test_recorre_las_ordenes_por_cursor(self):
+        cliente = APIClient()
+        cliente.force_authenticate(self.jefe)
+        ids = []
+        url = reverse("orden-list") + "?page_size=2"
+        while url:
+            respuesta = cliente.get(url)
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertLessEqual(len(respuesta.data["results"]), 2)
+            ids += [orden["id"] for orden in respuesta.data["results"]]
+            url = respuesta.data["next"]
+        esperados = list(
+            Orden.objects.order_by("-fecha_ingreso").values_list("id", flat=True)
+        )
+        self.assertEqual(ids, esperados)
+
+    def test_citas_en_orden_cronologico(self):
+        vehiculo = Vehiculo.objects.get(patente="PAG001")
+        ahora = timezone.now()
+        for dias in (5, None, 1, 3, None):
+            Agendamiento.objects.create(
+                vehiculo=vehiculo,
+                creado_por=self.jefe,
+                fecha_hora_programada=ahora + timedelta(days=dias) if dias else None,
+            )
+        cliente = APIClient()
+        cliente.force_authenticate(self.jefe)
+        citas = []
+        url = reverse("agendamiento-list") + "?page_size=2"
+        while url:
+            respuesta = cliente.get(url)
+            self.assertEqual(respuesta.status_code, 200)
+            citas += respuesta.data["results"]
+            url = respuesta.data["next"]
+
+        # Las solicitudes sin hora (creadas ahora) van antes que las citas de
+        # los próximos días, y estas por fecha.
+        self.assertEqual(len(citas), 5)
+        self.assertEqual(
+            [c["fecha_hora_programada"] is None for c in citas[:2]], [True, True]
+        )
+        fechas = [c["fecha_hora_programada"] for c in citas[2:]]
+        self.assertEqual(fechas, sorted(fechas))
+
+    def test_filtra_por_estado(self):
+        cliente = APIClient()
+        cliente.force_authenticate(self.jefe)
+        respuesta = cliente.get(
+            reverse("orden-list"), {"estado__ne": Orden.Estado.FINALIZADO}
+        )
+        self.assertEqual(
+            {orden["estado"] for orden in respuesta.data["results"]},
+            {Orden.Estado.INGRESADO},
+        )
+        self.assertEqual(len(respuesta.data["results"]), 3)
+
+
+class ReservasRepuestosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.jefe = Usuario.objects.create(username="jefe-kit", rut="kit-0")
+        cls.mecanico = Usuario.objects.create(username="mec-kit", rut="kit-1")
+        cls.aceite = Producto.objects.create(sku="ACE-1", nombre="Aceite", stock=5)
+        cls.filtro = Producto.objects.create(sku="FIL-1", nombre="Filtro", stock=2)
+        cls.kit = KitMantenimiento.objects.create(nombre="Kit básico")
+        KitMantenimientoItem.objects.create(
+            kit=cls.kit, producto=cls.aceite, cantidad=2
+        )
+        KitMantenimientoItem.objects.create(
+            kit=cls.kit, producto=cls.filtro, cantidad=1
+        )
+
+    def cita(self, n):
+        vehiculo = Vehiculo.objects.create(
+            patente=f"KIT{n:03d}", marca="Marca", modelo="Modelo", anio=2020
+        )
+        programada = timezone.now() + timedelta(days=n)
+        return Agendamiento.objects.create(
+            vehiculo=vehiculo,
+            mecanico_asignado=self.mecanico,
+            creado_por=self.jefe,
+            fecha_hora_programada=programada,
+            fecha_hora_fin=programada + timedelta(minutes=60),
+            estado=Agendamiento.Estado.CONFIRMADO,
+            es_mantenimiento=True,
+        )
+
+    def disponibles(self):
+        return {
+            sku: libre for sku, (_, libre) in disponibilidad(["ACE-1", "FIL-1"]).items()
+        }
+
+    def test_reserva_descuenta_lo_disponible(self):
+        cita = self.cita(1)
+        reservar_kit(cita)
+        self.assertEqual(self.disponibles(), {"ACE-1": 3, "FIL-1": 1})
+        # Reservar de nuevo la misma cita no duplica.
+        self.assertEqual(reservar_kit(cita), [])
+        self.assertEqual(cita.reservas_repuestos.count(), 2)
+
+    def test_consumo_crea_items_y_descuenta_stock(self):
+        cita = self.cita(1)
+        reservar_kit(cita)
+        orden = Orden.objects.create(vehiculo=cita.vehiculo, descripcion_falla="mant.")
+        consumir_reservas(cita, orden, self.jefe)
+
+        self.aceite.refresh_from_db()
+        self.filtro.refresh_from_db()
+        self.assertEqual((self.aceite.stock, self.filtro.stock), (3, 1))
+        self.assertEqual(
+            set(orden.items.values_list("producto_id", "cantidad")),
+            {("ACE-1", 2), ("FIL-1", 1)},
+        )
+        self.assertFalse(
+            cita.reservas_repuestos.exclude(
+                estado=ReservaRepuesto.Estado.CONSUMIDO
+            ).exists()
+        )
+        self.assertEqual(self.disponibles(), {"ACE-1": 3, "FIL-1": 1})
+
+    def test_cancelar_libera_una_sola_vez(self):
+        cita = self.cita(1)
+        reservar_kit(cita)
+        cita.estado = Agendamiento.Estado.CANCELADO
+        cita.save()
+        self.assertEqual(self.disponibles(), {"ACE-1": 5, "FIL-1": 2})
+
+        # Guardar otra vez una cita ya cancelada (aunque se cargue con el
+        # estado diferido) no vuelve a tocar las reservas.
+        cita.reservas_repuestos.update(estado=ReservaRepuesto.Estado.RESERVADO)
+        diferida = Agendamiento.objects.only("pk", "vehiculo").get(pk=cita.pk)
+        diferida.motivo_ingreso = "sin cambios de estado"
+        diferida.save()
+        cita.motivo_ingreso = "otra vez"
+        cita.save()
+        self.assertEqual(self.disponibles(), {"ACE-1": 3, "FIL-1": 1})
+
+    def test_sin_stock_no_reserva_nada(self):
+        citas = [self.cita(1), self.cita(2), self.cita(3)]
+        with self.assertRaises(StockInsuficiente) as error:
+            with transaction.atomic():
+                reservar_kits(citas)
+        self.assertEqual(
+            [f["sku"] for f in error.exception.faltantes], ["ACE-1", "FIL-1"]
+        )
+        self.assertFalse(ReservaRepuesto.objects.exists())
+
+    def test_consumo_sin_stock_revierte(self):
+        cita = self.cita(1)
+        reservar_kit(cita)
+        Producto.objects.filter(pk="FIL-1").update(stock=0)
+        orden = Orden.objects.create(vehiculo=cita.vehiculo, descripcion_falla="mant.")
+        with self.assertRaises(StockInsuficiente):
+            with transaction.atomic():
+                consumir_reservas(cita, orden, self.jefe)
+
+        self.aceite.refresh_from_db()
+        self.assertEqual(self.aceite.stock, 5)
+        self.assertFalse(OrdenItem.objects.filter(orden=orden).exists())
+        self.assertEqual(
+            cita.reservas_repuestos.filter(
+                estado=ReservaRepuesto.Estado.RESERVADO
+            ).count(),
+            2,
+        )
+
+    def test_un_solo_kit_activo(self):
+        otro = KitMantenimiento(nombre="Kit completo", activo=True)
+        with self.assertRaises(ValidationError):
+            otro.full_clean()
+        otro.activo = False
+        otro.full_clean()
+
+
+class HorariosDisponiblesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.jefe = Usuario.objects.create(username="jefe-horas", rut="horas-0")
+        cls.mec1 = Usuario.objects.create(username="mec-horas-1", rut="horas-1")
+        cls.mec2 = Usuario.objects.create(username="mec-horas-2", rut="horas-2")
+        cls.dia = timezone.localdate() + timedelta(days=7)
+
+    def a_las(self, hora, minuto=0, dias=0):
+        return datetime.combine(
+            self.dia + timedelta(days=dias),
+            time(hora, minuto),
+            tzinfo=timezone.get_current_timezone(),
+        )
+
+    def cita(self, patente, inicio, duracion=60, **campos):
+        vehiculo, _ = Vehiculo.objects.get_or_create(
+            patente=patente, defaults={"marca": "M", "modelo": "M", "anio": 2020}
+        )
+        campos.setdefault("estado", Agendamiento.Estado.CONFIRMADO)
+        return Agendamiento.objects.create(
+            vehiculo=vehiculo,
+            creado_por=self.jefe,
+            fecha_hora_programada=inicio,
+            duracion_estimada_minutos=duracion,
+            **campos,
+        )
+
+    def horarios(self, duracion, dias=0, **kwargs):
+        return horarios_disponibles(
+            [self.mec1.pk, self.mec2.pk],
+            self.dia,
+            self.dia + timedelta(days=dias),
+            duracion,
+            **kwargs,
+        )
+
+    def test_evita_las_citas_confirmadas(self):
+        self.cita("HOR001", self.a_las(10), mecanico_asignado=self.mec1)
+        # Ni una cita solo programada ni una cancelada ocupan al mecánico.
+        self.cita(
+            "HOR002", self.a_las(12), mecanico_asignado=self.mec1, estado="Programado"
+        )
+        self.cita(
+            "HOR003", self.a_las(14), mecanico_asignado=self.mec1, estado="Cancelado"
+        )
+        resultado = self.horarios(60)
+
+        self.assertEqual(
+            resultado[self.mec1.pk]["huecos"],
+            [(self.a_las(9), self.a_las(10)), (self.a_las(11), self.a_las(19))],
+        )
+        inicios = resultado[self.mec1.pk]["inicios"]
+        self.assertEqual(
+            inicios[:3], [self.a_las(9), self.a_las(11), self.a_las(11, 30)]
+        )
+        self.assertNotIn(self.a_las(9, 30), inicios)
+        self.assertNotIn(self.a_las(10), inicios)
+        self.assertEqual(inicios[-1], self.a_las(18))
+        self.assertEqual(
+            resultado[self.mec2.pk]["huecos"], [(self.a_las(9), self.a_las(19))]
+        )
+
+    def test_bordes_de_la_jornada(self):
+        # La jornada completa (9 a 19) cabe justo una vez.
+        resultado = self.horarios(600)
+        self.assertEqual(resultado[self.mec1.pk]["inicios"], [self.a_las(9)])
+        resultado = self.horarios(601)
+        self.assertEqual(resultado[self.mec1.pk], {"huecos": [], "inicios": []})
+
+        # Un hueco más corto que la cita no se ofrece.
+        self.cita("BOR001", self.a_las(9, 30), 540, mecanico_asignado=self.mec1)
+        resultado = self.horarios(60)
+        self.assertEqual(resultado[self.mec1.pk], {"huecos": [], "inicios": []})
+
+    def test_inicios_alineados_al_paso(self):
+        # Termina a las 9:50: el hueco empieza ahí, pero el primer inicio
+        # ofrecido es el siguiente múltiplo de 30 minutos desde las 9.
+        self.cita("ALI001", self.a_las(9), 50, mecanico_asignado=self.mec1)
+        resultado = self.horarios(60)
+        self.assertEqual(resultado[self.mec1.pk]["huecos"][0][0], self.a_las(9, 50))
+        self.assertEqual(resultado[self.mec1.pk]["inicios"][0], self.a_las(10))
+        resultado = self.horarios(60, paso_minutos=20)
+        self.assertEqual(
+            resultado[self.mec1.pk]["inicios"][:2], [self.a_las(10), self.a_las(10, 20)]
+        )
+
+    def test_varios_dias(self):
+        # Cada día se recorre por separado, y lo que sale de la jornada
+        # (una cita que termina después de las 19) no cuenta.
+        self.cita("DIA001", self.a_las(18, 30), 120, mecanico_asignado=self.mec1)
+        self.cita("DIA002", self.a_las(9, dias=1), mecanico_asignado=self.mec1)
+        resultado = self.horarios(60, dias=2)
+        self.assertEqual(
+            resultado[self.mec1.pk]["huecos"],
+            [
+                (self.a_las(9), self.a_las(18, 30)),
+                (self.a_las(10, dias=1), self.a_las(19, dias=1)),
+                (self.a_las(9, dias=2), self.a_las(19, dias=2)),
+            ],
+        )
+        self.assertEqual(resultado[self.mec1.pk]["inicios"][18], self.a_las(10, dias=1))
+        self.assertEqual(len(resultado[self.mec2.pk]["inicios"]), 3 * 19)
+
+        # Un rango invertido no tiene jornadas.
+        resultado = horarios_disponibles(
+            [self.mec1.pk], self.dia, self.dia - timedelta(days=1), 60
+        )
+        self.assertEqual(resultado, {self.mec1.pk: {"huecos": [], "inicios": []}})
+
+    def test_evita_las_otras_citas_del_vehiculo(self):
+        otra = self.cita("VEH101", self.a_las(9), 120, mecanico_asignado=self.mec2)
+        propia = self.cita("VEH101", self.a_las(13), estado="Programado")
+        with self.assertNumQueries(1):
+            resultado = self.horarios(60, vehiculo=otra.vehiculo, excluir=propia)
+        self.assertEqual(resultado[self.mec1.pk]["inicios"][0], self.a_las(11))
+        self.assertIn(self.a_las(13), resultado[self.mec1.pk]["inicios"])
+
+
+class MatrizDisponibilidadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.jefe = Usuario.objects.create(username="jefe-matriz", rut="matriz-0")
+        cls.jefe.groups.add(Group.objects.create(name="Jefetaller"))
+        grupo = Group.objects.create(name="Mecanico")
+        cls.mec1 = Usuario.objects.create(username="mec-matriz-1", rut="matriz-1")
+        cls.mec2 = Usuario.objects.create(username="mec-matriz-2", rut="matriz-2")
+        grupo.usuario_set.add(cls.mec1, cls.mec2)
+        cls.dia = timezone.localdate() + timedelta(days=7)
+
+    def a_las(self, hora, minuto=0, dias=0):
+        return datetime.combine(
+            self.dia + timedelta(days=dias),
+            time(hora, minuto),
+            tzinfo=timezone.get_current_timezone(),
+        )
+
+    def cita(self, patente, inicio, duracion, mecanico, estado="Confirmado"):
+        vehiculo = Vehiculo.objects.create(
+            patente=patente, marca="M", modelo="M", anio=2020
+        )
+        return Agendamiento.objects.create(
+            vehiculo=vehiculo,
+            creado_por=self.jefe,
+            fecha_hora_programada=inicio,
+            duracion_estimada_minutos=duracion,
+            mecanico_asignado=mecanico,
+            estado=estado,
+        )
+
+    def bloques(self, *ocupados):
+        # Un carácter por bloque de 30 minutos, de 9:00 a 19:00.
+        return "".join("1" if i in ocupados else "0" for i in range(20))
+
+    def test_cita_que_cruza_bloques(self):
+        # 10:15 a 11:15 toca, en parte, los bloques de 10:00, 10:30 y 11:00.
+        self.cita("MAT001", self.a_las(10, 15), 60, self.mec1)
+        # 9:00 a 10:00 termina justo al empezar el bloque de 10:00.
+        self.cita("MAT002", self.a_las(9), 60, self.mec2, estado="En Taller")
+        # Las citas programadas o canceladas no ocupan al mecánico.
+        self.cita("MAT003", self.a_las(15), 60, self.mec2, estado="Programado")
+        self.cita("MAT004", self.a_las(16), 60, self.mec2, estado="Cancelado")
+        # Termina después de la jornada: solo cuenta hasta las 19:00.
+        self.cita("MAT005", self.a_las(18, 45), 60, self.mec2)
+        dia = self.dia.isoformat()
+
+        matriz = matriz_disponibilidad([self.mec1.pk, self.mec2.pk], self.dia, self.dia)
+        self.assertEqual(matriz[self.mec1.pk], {dia: self.bloques(2, 3, 4)})
+        self.assertEqual(matriz[self.mec2.pk], {dia: self.bloques(0, 1, 19)})
+
+        # Con bloques de una hora, la misma cita marca dos bloques.
+        matriz = matriz_disponibilidad([self.mec1.pk], self.dia, self.dia, 60)
+        self.assertEqual(matriz[self.mec1.pk][dia], "0110000000")
+
+    def test_varios_dias_en_una_consulta(self):
+        self.cita("MAT101", self.a_las(9), 30, self.mec1)
+        self.cita("MAT102", self.a_las(18, 30), 30, self.mec2, estado="En Taller")
+        self.cita("MAT103", self.a_las(12, dias=2), 90, self.mec1)
+        dias = [(self.dia + timedelta(days=i)).isoformat() for i in range(3)]
+
+        with self.assertNumQueries(1):
+            matriz = matriz_disponibilidad(
+                [self.mec1.pk, self.mec2.pk], self.dia, self.dia + timedelta(days=2)
+            )
+        self.assertEqual(
+            matriz[self.mec1.pk],
+            {
+                dias[0]: self.bloques(0),
+                dias[1]: self.bloques(),
+                dias[2]: self.bloques(6, 7, 8),
+            },
+        )
+        self.assertEqual(
+            matriz[self.mec2.pk],
+            {
+                dias[0]: self.bloques(19),
+                dias[1]: self.bloques(),
+                dias[2]: self.bloques(),
+            },
+        )
+        self.assertEqual(
+            matriz_disponibilidad(
+                [self.mec1.pk], self.dia, self.dia - timedelta(days=1)
+            ),
+            {self.mec1.pk: {}},
+        )
+
+    def test_endpoint(self):
+        self.cita("MAT201", self.a_las(10, 15), 60, self.mec1)
+        respuesta = cliente_con_token(self.jefe).get(
+            reverse("agenda-disponibilidad"),
+            {"desde": self.dia.isoformat(), "hasta": self.dia.isoformat()},
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        dias = {m["id"]: m["dias"] for m in respuesta.data["mecanicos"]}
+        self.assertEqual(
+            dias[self.mec1.pk], {self.dia.isoformat(): self.bloques(2, 3, 4)}
+        )
+        self.assertEqual(dias[self.mec2.pk], {self.dia.isoformat(): self.bloques()})
+
+
+class PlanificacionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.jefe = Usuario.objects.create(username="jefe-planif", rut="planif-0")
+        grupo = Group.objects.create(name="Mecanico")
+        cls.mec1 = Usuario.objects.create(username="mec-planif-1", rut="planif-1")
+        cls.mec2 = Usuario.objects.create(username="mec-planif-2", rut="planif-2")
+        grupo.usuario_set.add(cls.mec1, cls.mec2)
+        cls.dia = timezone.localdate() + timedelta(days=7)
+
+    def a_las(self, hora, minuto=0):
+        return datetime.combine(
+            self.dia, time(hora, minuto), tzinfo=timezone.get_current_timezone()
+        )
+
+    def cita(self, patente, hora, minuto=0, **campos):
+        vehiculo, _ = Vehiculo.objects.get_or_create(
+            patente=patente, defaults={"marca": "M", "modelo": "M", "anio": 2020}
+        )
+        campos.setdefault("estado", Agendamiento.Estado.PROGRAMADO)
+        return Agendamiento.objects.create(
+            vehiculo=vehiculo,
+            creado_por=self.jefe,
+            fecha_hora_programada=self.a_las(hora, minuto),
+            **campos,
+        )
+
+    def planificar(self, simular=False):
+        asignaciones, sin_asignar = planificar_agenda(
+            self.dia, self.dia, self.jefe, simular=simular
+        )
+        return (
+            {cita.pk: (mecanico, inicio) for cita, mecanico, inicio in asignaciones},
+            {cita.pk: motivo for cita, motivo in sin_asignar},
+        )
+
+    def test_respeta_citas_confirmadas_del_mecanico(self):
+        self.cita("OCU001", 9, mecanico_asignado=self.mec1, estado="Confirmado")
+        self.cita("OCU002", 9, mecanico_asignado=self.mec2, estado="Confirmado")
+        pendiente = self.cita("PEN001", 9)
+        asignadas, _ = self.planificar()
+        self.assertEqual(asignadas[pendiente.pk], (self.mec1, self.a_las(10)))
+
+    def test_un_vehiculo_no_se_atiende_dos_veces_a_la_vez(self):
+        primera = self.cita("VEH001", 9)
+        segunda = self.cita("VEH001", 9, 30)
+        asignadas, _ = self.planificar()
+        self.assertEqual(asignadas[primera.pk], (self.mec1, self.a_las(9)))
+        # mec2 está libre a las 9:30, pero el vehículo no.
+        self.assertEqual(asignadas[segunda.pk][1], self.a_las(10))
+
+    def test_empate_va_al_mecanico_con_menos_carga(self):
+        self.cita("CAR001", 9)
+        tarde = self.cita("CAR002", 11)
+        asignadas, _ = self.planificar()
+        # Ambos están libres a las 11; mec1 ya tiene una hora asignada.
+        self.assertEqual(asignadas[tarde.pk], (self.mec2, self.a_las(11)))
+
+    def test_mantenimientos_hasta_agotar_el_kit(self):
+        filtro = Producto.objects.create(sku="FIL-P", nombre="Filtro", stock=1)
+        kit = KitMantenimiento.objects.create(nombre="Kit planificación")
+        KitMantenimientoItem.objects.create(kit=kit, producto=filtro, cantidad=1)
+        primera = self.cita("KIT101", 9, es_mantenimiento=True)
+        segunda = self.cita("KIT102", 9, es_mantenimiento=True)
+        asignadas, sin_asignar = self.planificar()
+        self.assertIn(primera.pk, asignadas)
+        self.assertEqual(
+            sin_asignar, {segunda.pk: "Sin stock para el kit de mantenimiento."}
+        )
+        self.assertEqual(
+            list(ReservaRepuesto.objects.values_list("agendamiento_id", flat=True)),
+            [primera.pk],
+        )
+
+    def test_simular_no_modifica_la_base(self):
+        filtro = Producto.objects.create(sku="FIL-S", nombre="Filtro", stock=5)
+        kit = KitMantenimiento.objects.create(nombre="Kit simulación")
+        KitMantenimientoItem.objects.create(kit=kit, producto=filtro, cantidad=1)
+        citas = [self.cita("SIM001", 9, es_mantenimiento=True), self.cita("SIM002", 10)]
+        antes = list(
+            Agendamiento.objects.order_by("pk").values_list(
+                "estado", "mecanico_asignado", "fecha_hora_programada"
+            )
+        )
+        asignadas, _ = self.planificar(simular=True)
+        self.assertEqual(set(asignadas), {cita.pk for cita in citas})
+        self.assertEqual(
+            list(
+                Agendamiento.objects.order_by("pk").values_list(
+                    "estado", "mecanico_asignado", "fecha_hora_programada"
+                )
+            ),
+            antes,
+        )
+        self.assertFalse(ReservaRepuesto.objects.exists())
+        self.assertFalse(AgendamientoHistorial.objects.exists())
+        self.assertFalse(Notificacion.objects.exists())
+
+
+class LecturaChatTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ana = Usuario.objects.create(username="ana-lee", rut="lee-1")
+        cls.beto = Usuario.objects.create(username="beto-lee", rut="lee-2")
+        cls.sala = ChatRoom.objects.create()
+        cls.sala.participantes.add(cls.ana, cls.beto)
+        cls.otra = ChatRoom.objects.create()
+        cls.otra.participantes.add(cls.ana, cls.beto)
+        # Mensajes intercalados: los ids de una sala tienen huecos.
+        cls.mensajes = []
+        cls.ajenos = []
+        for i in range(3):
+            cls.mensajes.append(
+                ChatMessage.objects.create(
+                    room=cls.sala, autor=cls.beto, contenido=f"m{i}"
+                )
+            )
+            cls.ajenos.append(
+                ChatMessage.objects.create(
+                    room=cls.otra, autor=cls.beto, contenido=f"o{i}"
+                )
+            )
+
+    def marca(self, sala=None):
+        return ChatLectura.objects.get(
+            room=sala or self.sala, usuario=self.ana
+        ).ultimo_mensaje_leido
+
+    def test_la_marca_nunca_retrocede(self):
+        self.assertEqual(self.marca(), 0)
+        self.assertEqual(contar_no_leidos(self.ana), 6)
+
+        self.assertTrue(marcar_leido(self.sala.pk, self.ana.pk, self.mensajes[1].pk))
+        self.assertEqual(self.marca(), self.mensajes[1].pk)
+        self.assertEqual(contar_no_leidos(self.ana), 4)
+
+        # Un ack atrasado (p. ej. de otra pestaña) no retrocede la marca.
+        self.assertFalse(marcar_leido(self.sala.pk, self.ana.pk, self.mensajes[0].pk))
+        self.assertEqual(self.marca(), self.mensajes[1].pk)
+
+        # Sin 'hasta' se marca la sala completa, y repetirlo no cambia nada.
+        self.assertTrue(marcar_leido(self.sala.pk, self.ana.pk))
+        self.assertEqual(self.marca(), self.mensajes[2].pk)
+        self.assertFalse(marcar_leido(self.sala.pk, self.ana.pk))
+        self.assertEqual(contar_no_leidos(self.ana), 3)
+
+    def test_ignora_ids_de_otras_salas(self):
+        # El id pertenece a la otra sala: la marca queda en el último
+        # mensaje propio de la sala que no lo supera.
+        marcar_leido(self.sala.pk, self.ana.pk, self.ajenos[1].pk)
+        self.assertEqual(self.marca(), self.mensajes[1].pk)
+        self.assertEqual(self.marca(self.otra), 0)
+
+        # Un id que aún no existe tampoco adelanta la marca más allá del
+        # último mensaje de la sala.
+        marcar_leido(self.sala.pk, self.ana.pk, self.ajenos[2].pk + 100)
+        self.assertEqual(self.marca(), self.mensajes[2].pk)
+        self.assertEqual(self.marca(self.otra), 0)
+        self.assertEqual(contar_no_leidos(self.ana), 3)
+
+    def test_leer_mensajes_no_los_marca(self):
+        cliente = cliente_con_token(self.ana)
+        respuesta = cliente.get(reverse("chat-messages-list", args=[self.sala.pk]))
+        self.assertEqual(len(respuesta.data["mensajes"]), 3)
+        self.assertEqual(self.marca(), 0)
+
+        # La lectura se confirma aparte, hasta el último mensaje visto.
+        url = reverse("chat-room-leido", args=[self.sala.pk])
+        respuesta = cliente.post(url, {"hasta": self.mensajes[1].pk}, format="json")
+        self.assertEqual(respuesta.status_code, 204)
+        self.assertEqual(self.marca(), self.mensajes[1].pk)
+        respuesta = cliente.get(reverse("chat-unread-count"))
+        self.assertEqual(respuesta.data["unread_count"], 4)
+
+        respuesta = cliente.post(url, {"hasta": "x"}, format="json")
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(cliente.post(url).status_code, 204)
+        self.assertEqual(self.marca(), self.mensajes[2].pk)
+
+    def test_sin_participar_no_hay_marca(self):
+        ajeno = Usuario.objects.create(username="ajeno-lee", rut="lee-3")
+        self.assertFalse(marcar_leido(self.sala.pk, ajeno.pk))
+        self.assertFalse(ChatLectura.objects.filter(usuario=ajeno).exists())
+
+
+class PaginaMensajesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ana = Usuario.objects.create(username="ana-pag", rut="pag-1")
+        cls.sala = ChatRoom.objects.create()
+        cls.sala.participantes.add(cls.ana)
+        otra = ChatRoom.objects.create()
+        ids = []
+        for i in range(5):
+            ids.append(
+                ChatMessage.objects.create(
+                    room=cls.sala, autor=cls.ana, contenido=f"m{i}"
+                ).pk
+            )
+            # Mensajes de otra sala en medio, para que los ids tengan huecos.
+            ChatMessage.objects.create(room=otra, autor=cls.ana, contenido="x")
+        cls.ids = ids
+
+    def pagina(self, **kwargs):
+        mensajes = ChatMessage.objects.filter(room=self.sala)
+        pagina, hay_mas = pagina_mensajes(mensajes, **kwargs)
+        return [m.pk for m in pagina], hay_mas
+
+    def test_ultimos_mensajes(self):
+        self.assertEqual(self.pagina(limite=2), (self.ids[3:], True))
+        # Justo todos los que hay: no quedan más.
+        self.assertEqual(self.pagina(limite=5), (self.ids, False))
+        self.assertEqual(self.pagina(limite=6), (self.ids, False))
+
+    def test_antes(self):
+        self.assertEqual(
+            self.pagina(antes=self.ids[3], limite=2), (self.ids[1:3], True)
+        )
+        self.assertEqual(
+            self.pagina(antes=self.ids[2], limite=2), (self.ids[:2], False)
+        )
+        self.assertEqual(self.pagina(antes=self.ids[0], limite=2), ([], False))
+
+    def test_despues(self):
+        self.assertEqual(
+            self.pagina(despues=self.ids[0], limite=2), (self.ids[1:3], True)
+        )
+        self.assertEqual(
+            self.pagina(despues=self.ids[2], limite=2), (self.ids[3:], False)
+        )
+        self.assertEqual(self.pagina(despues=self.ids[4], limite=2), ([], False))
+        # 'despues' manda sobre 'antes'.
+        self.assertEqual(
+            self.pagina(antes=self.ids[1], despues=self.ids[3], limite=2),
+            ([self.ids[4]], False),
+        )
+
+    def test_endpoint(self):
+        cliente = cliente_con_token(self.ana)
+        url = reverse("chat-messages-list", args=[self.sala.pk])
+        respuesta = cliente.get(url, {"before": self.ids[3], "page_size": 2})
+        self.assertEqual([m["id"] for m in respuesta.data["mensajes"]], self.ids[1:3])
+        self.assertTrue(respuesta.data["hay_mas"])
+        self.assertEqual([a["id"] for a in respuesta.data["autores"]], [self.ana.pk])
+
+        respuesta = cliente.get(url, {"after": self.ids[3], "page_size": 2})
+        self.assertEqual([m["id"] for m in respuesta.data["mensajes"]], [self.ids[4]])
+        self.assertFalse(respuesta.data["hay_mas"])
+
+        respuesta = cliente.get(url, {"before": "x"})
+        self.assertEqual(respuesta.status_code, 400)
+
+
+class SalaDirectaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ana = Usuario.objects.create(username="ana-par", rut="par-1")
+        cls.beto = Usuario.objects.create(username="beto-par", rut="par-2")
+        cls.carla = Usuario.objects.create(username="carla-par", rut="par-3")
+
+    def test_clave_no_depende_del_orden(self):
+        self.assertEqual(
+            clave_par(self.ana.pk, self.beto.pk), clave_par(self.beto.pk, self.ana.pk)
+        )
+        self.assertNotEqual(
+            clave_par(self.ana.pk, self.beto.pk), clave_par(self.ana.pk, self.carla.pk)
+        )
+
+    def test_misma_sala_desde_ambos_lados(self):
+        sala, creada = obtener_o_crear_sala_directa(self.ana, self.beto)
+        self.assertTrue(creada)
+        self.assertEqual(
+            set(sala.participantes.values_list("pk", flat=True)),
+            {self.ana.pk, self.beto.pk},
+        )
+        self.assertEqual(
+            obtener_o_crear_sala_directa(self.beto, self.ana), (sala, False)
+        )
+        self.assertEqual(obtener_o_crear_sala_directa(self.ana, self.beto)[0], sala)
+        otra, creada = obtener_o_crear_sala_directa(self.carla, self.ana)
+        self.assertTrue(creada)
+        self.assertNotEqual(otra, sala)
+        self.assertEqual(ChatRoom.objects.count(), 2)
+
+    def test_endpoint(self):
+        url = reverse("chat-rooms-list")
+        respuesta = cliente_con_token(self.ana).post(
+            url, {"user_id": self.beto.pk}, format="json"
+        )
+        self.assertEqual(respuesta.status_code, 201)
+        sala = ChatRoom.objects.get(pk=respuesta.data["id"])
+
+        # Beto la había ocultado; abrirla desde su lado la vuelve a mostrar.
+        sala.oculto_para.add(self.beto)
+        respuesta = cliente_con_token(self.beto).post(
+            url, {"user_id": self.ana.pk}, format="json"
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data["id"], sala.pk)
+        self.assertFalse(sala.oculto_para.exists())
+        self.assertEqual(ChatRoom.objects.count(), 1)
+
+
+class BandejaChatTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ana = Usuario.objects.create(username="ana-bandeja", rut="bandeja-1")
+        cls.ana.groups.add(Group.objects.create(name="Mecanico"))
+
+    def crear_sala(self, i, otros=1):
+        sala = ChatRoom.objects.create(nombre=f"sala {i}")
+        sala.participantes.add(self.ana)
+        for j in range(otros):
+            otro = Usuario.objects.create(
+                username=f"bandeja-{i}-{j}", rut=f"bandeja-{i}-{j}"
+            )
+            otro.groups.add(Group.objects.get_or_create(name="Chofer")[0])
+            sala.participantes.add(otro)
+        return sala, otro
+
+    def bandeja(self):
+        cliente = cliente_con_token(self.ana)
+        # El usuario del token, las salas (con sus anotaciones), los
+        # participantes y sus grupos.
+        with self.assertNumQueries(4):
+            respuesta = cliente.get(reverse("chat-inbox"))
+        self.assertEqual(respuesta.status_code, 200)
+        return {sala["id"]: sala for sala in respuesta.data}
+
+    def test_no_leidos_y_ultimo_mensaje(self):
+        sala, beto = self.crear_sala(0)
+        vacia, _ = self.crear_sala(1)
+        oculta, carlos = self.crear_sala(2)
+        recibidos = [
+            ChatMessage.objects.create(room=sala, autor=beto, contenido=f"hola {i}")
+            for i in range(3)
+        ]
+        marcar_leido(sala.pk, self.ana.pk, recibidos[0].pk)
+        # Lo que escribe la propia usuaria no cuenta como no leído.
+        propio = ChatMessage.objects.create(room=sala, autor=self.ana, contenido="ok")
+        ChatMessage.objects.create(room=oculta, autor=carlos, contenido="x")
+        oculta.oculto_para.add(self.ana)
+
+        salas = self.bandeja()
+        self.assertEqual(set(salas), {sala.pk, vacia.pk})
+        self.assertEqual(salas[sala.pk]["no_leidos"], 2)
+        self.assertEqual(salas[sala.pk]["ultimo_mensaje"]["id"], propio.pk)
+        self.assertEqual(salas[sala.pk]["ultimo_mensaje"]["autor"], self.ana.pk)
+        self.assertEqual(salas[sala.pk]["ultimo_mensaje"]["contenido"], "ok")
+        self.assertEqual(salas[vacia.pk]["no_leidos"], 0)
+        self.assertIsNone(salas[vacia.pk]["ultimo_mensaje"])
+
+    def test_consultas_no_dependen_de_las_salas(self):
+        sala, beto = self.crear_sala(0)
+        ChatMessage.objects.create(room=sala, autor=beto, contenido="hola")
+        self.assertEqual(len(self.bandeja()), 1)
+
+        for i in range(1, 8):
+            sala, otro = self.crear_sala(i, otros=2)
+            ChatMessage.objects.create(room=sala, autor=otro, contenido="hola")
+        salas = self.bandeja()
+        self.assertEqual(len(salas), 8)
+        self.assertTrue(all(s["no_leidos"] == 1 for s in salas.values()))
+
+
+class BusquedaChatTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ana = Usuario.objects.create(username="ana-chat", rut="chat-1")
+        cls.beto = Usuario.objects.create(username="beto-chat", rut="chat-2")
+        cls.ajeno = Usuario.objects.create(username="ajeno-chat", rut="chat-3")
+        cls.salas = []
+        for otro in (cls.beto, cls.ajeno):
+            sala = ChatRoom.objects.create()
+            sala.participantes.add(cls.ana, otro)
+            cls.salas.append(sala)
+        privada = ChatRoom.objects.create()
+        privada.participantes.add(cls.beto, cls.ajeno)
+
+        # Mensajes intercalados entre las salas, para que la mezcla importe.
+        textos = [
+            "Frenos revisados en el camión",
+            "Frenos del camión listos mañana",
+            "Aceite del camión",
+            "Sin novedades",
+            "Cambio de frenos en el camión azul",
+        ]
+        cls.mensajes = [
+            ChatMessage.objects.create(
+                room=cls.salas[i % 2], autor=cls.ana, contenido=texto
+            )
+            for i, texto in enumerate(textos)
+        ]
+        ChatMessage.objects.create(
+            room=privada, autor=cls.beto, contenido="Frenos del camión privado"
+        )
+
+    def ids(self, *args, **kwargs):
+        mensajes, hay_mas = buscar_mensajes(self.ana, *args, **kwargs)
+        return [m.id for m in mensajes], hay_mas
+
+    def esperados(self, *indices):
+        return [self.mensajes[i].id for i in indices]
+
+    def test_todas_las_palabras_en_todas_las_salas(self):
+        self.assertEqual(self.ids("camion FRENOS"), (self.esperados(4, 1, 0), False))
+        self.assertEqual(self.ids("privado"), ([], False))
+
+    def test_ultima_palabra_como_prefijo(self):
+        self.assertEqual(self.ids("cami"), (self.esperados(4, 2, 1, 0), False))
+        self.assertEqual(self.ids("aceite cami"), (self.esperados(2), False))
+
+    def test_pagina_con_antes(self):
+        ids, hay_mas = self.ids("camion", limite=2)
+        self.assertEqual(ids, self.esperados(4, 2))
+        self.assertTrue(hay_mas)
+        self.assertEqual(
+            self.ids("camion", antes=ids[-1], limite=2),
+            (self.esperados(1, 0), False),
+        )
+
+    def test_excluye_salas_ocultas(self):
+        self.salas[1].oculto_para.add(self.ana)
+        self.assertEqual(self.ids("frenos"), (self.esperados(4, 0), False))
+
+    def test_consultas_no_dependen_de_las_salas(self):
+        with self.assertNumQueries(2):
+            self.ids("camion frenos")
+        for i in range(20):
+            sala = ChatRoom.objects.create()
+            sala.participantes.add(self.ana, self.beto)
+            ChatMessage.objects.create(
+                room=sala, autor=self.beto, contenido=f"Frenos del camión {i}"
+            )
+        with self.assertNumQueries(2):
+            ids, hay_mas = self.ids("camion frenos", limite=10)
+        self.assertEqual(len(ids), 10)
+        self.assertTrue(hay_mas)
+
+    def test_una_sala(self):
+        self.assertEqual(
+            self.ids("frenos", room_id=self.salas[1].pk), (self.esperados(1), False)
+        )
+
+
+class ContadorNotificacionesTests(TestCase):
+    """
+    El contador de no leídas debe coincidir siempre con las filas sin leer,
+    pase lo que pase con las notificaciones.
+    """
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create(username="campana", rut="campana-1")
+        self.otro = Usuario.objects.create(username="campana-2", rut="campana-2")
+        self.cliente = cliente_con_token(self.usuario)
+
+    def assertContadorCoincide(self, esperado):
+        for usuario in (self.usuario, self.otro):
+            self.assertEqual(
+                contar_no_leidas(usuario),
+                Notificacion.objects.filter(usuario=usuario, leida=False).count(),
+            )
+        self.assertEqual(contar_no_leidas(self.usuario), esperado)
+        respuesta = self.cliente.get(reverse("notificacion-no-leidas"))
+        self.assertEqual(respuesta.data["no_leidas"], esperado)
+
+    def test_contador_sigue_a_las_notificaciones(self):
+        self.assertContadorCoincide(0)
+        for i in range(3):
+            notificar_usuarios([self.usuario, self.otro], f"aviso {i}")
+        self.assertContadorCoincide(3)
+
+        # Marcar una sola (PATCH sobre la notificación).
+        primera = Notificacion.objects.filter(usuario=self.usuario).earliest("pk")
+        respuesta = self.cliente.patch(
+            reverse("notificacion-detail", args=[primera.pk]),
+            {"leida": True},
+            format="json",
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContadorCoincide(2)
+
+        # Marcar todas.
+        respuesta = self.cliente.post(reverse("notificacion-marcar-como-leidas"))
+        self.assertEqual(respuesta.status_code, 204)
+        self.assertContadorCoincide(0)
+        self.assertEqual(contar_no_leidas(self.otro), 3)
+
+        # Una nueva sin leer y la depuración de las leídas antiguas.
+        notificar_usuarios([self.usuario], "nueva")
+        Notificacion.objects.update(fecha=timezone.now() - timedelta(days=200))
+        call_command("depurar_notificaciones", stdout=StringIO())
+        self.assertEqual(Notificacion.objects.filter(usuario=self.usuario).count(), 1)
+        self.assertContadorCoincide(1)
+
+        # Borrar una sin leer también descuenta.
+        Notificacion.objects.get(usuario=self.usuario).delete()
+        self.assertContadorCoincide(0)
+
+
+class DepuracionNotificacionesTests(TestCase):
+    def test_borra_solo_las_leidas_antiguas(self):
+        usuario = Usuario.objects.create(username="depura", rut="depura-1")
+        for i in range(4):
+            notificar_usuarios([usuario], f"leída {i}")
+        marcar_como_leidas(usuario)
+        for i in range(2):
+            notificar_usuarios([usuario], f"sin leer {i}")
+        leidas = list(
+            Notificacion.objects.filter(leida=True)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        sin_leer = list(
+            Notificacion.objects.filter(leida=False)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        # Antiguas: tres leídas y una sin leer; la cuarta leída es reciente.
+        Notificacion.objects.filter(pk__in=leidas[:3] + sin_leer[:1]).update(
+            fecha=timezone.now() - timedelta(days=200)
+        )
+
+        call_command("depurar_notificaciones", lote=2, stdout=StringIO())
+
+        self.assertEqual(
+            set(Notificacion.objects.values_list("pk", flat=True)),
+            {leidas[3], *sin_leer},
+        )
+        self.assertEqual(contar_no_leidas(usuario), 2)
+
+
+class CorreosTests(TestCase):
+    def test_destinatario_es_el_usuario(self):
+        usuario = Usuario.objects.create(
+            username="correo", rut="correo-1", email="usuario@ejemplo.cl"
+        )
+        sin_email = Usuario.objects.create(username="sin-correo", rut="correo-2")
+        correo = correos.enviar_correo_notificacion(usuario, "Asunto", "Cuerpo")
+        self.assertEqual(correo.destinatario, "usuario@ejemplo.cl")
+        self.assertIsNone(correos.enviar_correo_notificacion(sin_email, "A", "B"))
+
+        with mock.patch.object(
+            correos, "EMAIL_DESTINATARIO_PRUEBA", "pruebas@ejemplo.cl"
+        ):
+            correo = correos.enviar_correo_notificacion(usuario, "Asunto", "Cuerpo")
+        self.assertEqual(correo.destinatario, "pruebas@ejemplo.cl")
+
+
+class RolesTokenTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.jefes = Group.objects.create(name="Jefetaller")
+        cls.mecanicos = Group.objects.create(name="Mecanico")
+        cls.usuario = Usuario.objects.create(username="roles", rut="roles-1")
+        cls.usuario.groups.add(cls.jefes)
+
+    def autenticar(self, access):
+        auth = RolJWTAuthentication()
+        return auth.get_user(auth.get_validated_token(str(access)))
+
+    def version(self):
+        return Usuario.objects.values_list("roles_version", flat=True).get(
+            pk=self.usuario.pk
+        )
+
+    def test_roles_del_token_sin_consultar_grupos(self):
+        access = RolRefreshToken.for_user(self.usuario).access_token
+        self.assertEqual(access["roles"], ["Jefetaller"])
+        usuario = self.autenticar(access)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_roles(usuario), {"Jefetaller"})
+
+    def test_token_anterior_a_quitar_el_grupo_se_resuelve_en_bd(self):
+        access = RolRefreshToken.for_user(self.usuario).access_token
+        self.usuario.groups.remove(self.jefes)
+        usuario = self.autenticar(access)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_user_roles(usuario), frozenset())
+
+        refresh = RolRefreshToken.for_user(self.usuario)
+        self.usuario.groups.add(self.mecanicos)
+        serializer = RolTokenRefreshSerializer(data={"refresh": str(refresh)})
+        serializer.is_valid(raise_exception=True)
+        usuario = self.autenticar(serializer.validated_data["access"])
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_roles(usuario), {"Mecanico"})
+
+    def test_cambios_de_grupos_suben_la_version(self):
+        cambios = [
+            lambda: self.usuario.groups.set([self.mecanicos]),
+            lambda: self.usuario.groups.clear(),
+            lambda: self.mecanicos.usuario_set.add(self.usuario),
+            lambda: self.mecanicos.usuario_set.clear(),
+        ]
+        for cambio in cambios:
+            antes = self.version()
+            cambio()
+            self.assertGreater(self.version(), antes)
+
+    def test_eliminar_o_renombrar_el_grupo_sube_la_version(self):
+        antes = self.version()
+        self.jefes.name = "Jefe de Taller"
+        self.jefes.save()
+        self.assertGreater(self.version(), antes)
+
+        antes = self.version()
+        self.jefes.delete()
+        self.assertGreater(self.version(), antes)
+        access = RolRefreshToken.for_user(
+            Usuario.objects.get(pk=self.usuario.pk)
+        ).access_token
+        self.assertEqual(access["roles"], [])
+
+
+def cliente_con_token(usuario):
+    """Cliente autenticado como en producción: JWT con los roles en claims."""
+    cliente = APIClient()
+    access = RolRefreshToken.for_user(usuario).access_token
+    cliente.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+    return cliente
+
+
+class ConsultasListadoOrdenesTests(TestCase):
+    """
+    El listado de órdenes cuesta un número fijo de consultas sin importar
+    cuántas órdenes traiga la página: el usuario del token y la página.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.jefe = Usuario.objects.create(username="jefe-lista", rut="lista-0")
+        cls.jefe.groups.add(Group.objects.create(name="Jefetaller"))
+        cls.mecanico = Usuario.objects.create(username="mec-lista", rut="lista-1")
+
+    def crear_ordenes(self, cantidad):
+        for i in range(cantidad):
+            vehiculo = Vehiculo.objects.create(
+                patente=f"LIS{i:03d}", marca="Marca", modelo="Modelo", anio=2020
+            )
+            Orden.objects.create(
+                vehiculo=vehiculo,
+                descripcion_falla=f"falla {i}",
+                usuario_asignado=self.mecanico,
+            )
+
+    def test_una_orden(self):
+        self.crear_ordenes(1)
+        cliente = cliente_con_token(self.jefe)
+        with self.assertNumQueries(2):
+            respuesta = cliente.get(reverse("orden-list"))
+        self.assertEqual(len(respuesta.data["results"]), 1)
+
+    def test_varias_ordenes(self):
+        self.crear_ordenes(10)
+        cliente = cliente_con_token(self.jefe)
+        with self.assertNumQueries(2):
+            respuesta = cliente.get(reverse("orden-list"))
+        self.assertEqual(len(respuesta.data["results"]), 10)
+
+
+class ConsultasDetalleOrdenTests(TestCase):
+    """
+    El detalle de una orden cuesta un número fijo de consultas sin importar
+    cuántos repuestos, documentos o cambios de estado tenga.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.jefe = Usuario.objects.create(username="jefe-detalle", rut="detalle-0")
+        cls.jefe.groups.add(Group.objects.create(name="Jefetaller"))
+        cls.vehiculo = Vehiculo.objects.create(
+            patente="DET001", marca="Marca", modelo="Modelo", anio=2020
+        )
+
+    def crear_orden(self, cantidad):
+        orden = Orden.objects.create(vehiculo=self.vehiculo, descripcion_falla="x")
+        for i in range(cantidad):
+            # Un autor distinto por fila, para que nada salga de una caché.
+            autor = Usuario.objects.create(
+                username=f"autor-{orden.pk}-{i}", rut=f"det-{orden.pk}-{i}"
+            )
+            producto = Producto.objects.create(
+                sku=f"DET-{orden.pk}-{i}", nombre=f"Repuesto {i}", stock=5
+            )
+            OrdenItem.objects.create(
+                orden=orden,
+                producto=producto,
+                cantidad=1,
+                precio_unitario=1000,
+                solicitado_por=autor,
+                gestionado_por=self.jefe,
+            )
+            OrdenDocumento.objects.create(
+                orden=orden, archivo=f"doc-{i}.pdf", subido_por=autor
+            )
+            OrdenHistorialEstado.objects.create(
+                orden=orden, estado=Orden.Estado.EN_PROCESO, usuario=autor
+            )
+        return orden
+
+    def assertConsultasDetalle(self, orden, cantidad):
+        cliente = cliente_con_token(self.jefe)
+        with self.assertNumQueries(5):
+            respuesta = cliente.get(reverse("orden-detail", args=[orden.pk]))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.data["items"]), cantidad)
+        self.assertEqual(len(respuesta.data["documentos"]), cantidad)
+
+    def test_un_elemento(self):
+        self.assertConsultasDetalle(self.crear_orden(1), 1)
+
+    def test_varios_elementos(self):
+        self.assertConsultasDetalle(self.crear_orden(10), 10)
+
+
+class ConsultasDashboardMecanicoTests(TestCase):
+    """
+    El dashboard del mecánico cuesta un número fijo de consultas sin importar
+    cuántas tareas activas tenga asignadas.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.mecanico = Usuario.objects.create(username="mec-dash", rut="dash-0")
+        cls.mecanico.groups.add(Group.objects.create(name="Mecanico"))
+
+    def crear_ordenes(self, cantidad):
+        for i in range(cantidad):
+            vehiculo = Vehiculo.objects.create(
+                patente=f"DAS{i:03d}", marca="Marca", modelo="Modelo", anio=2020
+            )
+            Orden.objects.create(
+                vehiculo=vehiculo,
+                descripcion_falla=f"falla {i}",
+                usuario_asignado=self.mecanico,
+            )
+
+    def assertConsultasDashboard(self, cantidad):
+        cliente = cliente_con_token(self.mecanico)
+        with self.assertNumQueries(3):
+            respuesta = cliente.get(reverse("mecanico-dashboard-stats"))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data["kpis"]["ordenesActivas"], cantidad)
+        self.assertEqual(len(respuesta.data["tareas"]), cantidad)
+
+    def test_una_orden(self):
+        self.crear_ordenes(1)
+        self.assertConsultasDashboard(1)
 
-# Create your tests here.
+    def test_varias_ordenes(self):
+        self.crear_ordenes(10)
+        self.assertConsultasDashboard(10)
@@ -0,0 +1,80 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken, Token
+
+from .roles import get_user_roles
+
+ROLES_CLAIM = "roles"
+ROLES_VERSION_CLAIM = "roles_version"
+
+
+class RolRefreshToken(RefreshToken):
+    """
+    Refresh token que incluye los roles del usuario como claims firmados.
+    Los claims se copian al access token, de modo que los permisos pueden
+    resolverse sin consultar los grupos en la BD.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token.set_roles(user)
+        return token
+
+    def set_roles(self, user):
+        """Escribe (o actualiza) los claims de roles a partir del usuario."""
+        self[ROLES_CLAIM] = sorted(get_user_roles(user))
+        self[ROLES_VERSION_CLAIM] = user.roles_version
+
+
+class RolTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Igual que el refresh de SimpleJWT, pero vuelve a leer los roles del
+    usuario para que el nuevo access token no arrastre claims obsoletos.
+    """
+
+    token_class = RolRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM, None)
+        user = (
+            get_user_model()
+            .objects.filter(**{api_settings.USER_ID_FIELD: user_id})
+            .first()
+        )
+        if not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(
+                self.error_messages["no_active_account"],
+                "no_active_account",
+            )
+
+        refresh.set_roles(user)
+        data = {"access": str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data["refresh"] = str(refresh)
+
+        return data
+
+
+class TicketEventos(Token):
+    """
+    Credencial de pocos segundos para abrir el stream de eventos (SSE) o el
+    WebSocket del chat. EventSource y WebSocket no permiten cabeceras, así
+    que la credencial viaja en la URL y queda en los logs de acceso: por
+    eso no se usa el access token, sino este ticket, que no sirve para
+    llamar a la API (su tipo es "eventos") y vence enseguida.
+    """
+
+    token_type = "eventos"
+    lifetime = timedelta(seconds=getattr(settings, "EVENTOS_TICKET_SEG", 60))
@@ -23,7 +23,10 @@ from .views import (
     RegistrarSalidaView,
     OrdenesPendientesSalidaView,
     MecanicoAgendaView,
+    disponibilidad_mecanicos,
     NotificacionViewSet,
+    eventos_stream,
+    ticket_eventos,
     LlaveVehiculoViewSet,
     PrestamoLlaveViewSet,
     LlaveHistorialEstadoViewSet,
@@ -44,8 +47,11 @@ from .views import (
     exportar_frecuencia_fallas,
     exportar_hoja_vida_vehiculo_pdf,
     ChatRoomListView,
+    ChatBandejaView,
+    buscar_mensajes_chat,
     ChatMessageListView,
     unread_chat_count,
+    marcar_chat_leido,
     ChatRoomDetailView,
 )
 
@@ -93,6 +99,11 @@ urlpatterns = [
         MecanicoAgendaView.as_view(),
         name="mecanico-agenda",
     ),
+    path(
+        "agenda/disponibilidad/",
+        disponibilidad_mecanicos,
+        name="agenda-disponibilidad",
+    ),
     path(
         "agenda/seguridad/", SeguridadAgendaView.as_view(), name="seguridad-agenda-list"
     ),
@@ -187,12 +198,21 @@ urlpatterns = [
         name="export-hoja-vida-pdf",
     ),
     path("chat/rooms/", ChatRoomListView.as_view(), name="chat-rooms-list"),
+    path("chat/inbox/", ChatBandejaView.as_view(), name="chat-inbox"),
+    path("chat/search/", buscar_mensajes_chat, name="chat-search"),
     path(
         "chat/rooms/<int:room_id>/messages/",
         ChatMessageListView.as_view(),
         name="chat-messages-list",
     ),
+    path(
+        "chat/rooms/<int:room_id>/leido/",
+        marcar_chat_leido,
+        name="chat-room-leido",
+    ),
     path("chat/unread-count/", unread_chat_count, name="chat-unread-count"),
+    path("eventos/", eventos_stream, name="eventos-stream"),
+    path("eventos/ticket/", ticket_eventos, name="eventos-ticket"),
     path("chat/rooms/<int:pk>/", ChatRoomDetailView.as_view(), name="chat-room-detail"),
     path("", include(router.urls)),
 ]
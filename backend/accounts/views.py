@@ -1,5 +1,6 @@
+import asyncio
 import openpyxl
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from io import BytesIO
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
@@ -10,39 +11,89 @@ from datetime import datetime, timedelta, time
 from django.conf import settings
 from django.utils.encoding import force_bytes
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
-from django.utils.timezone import now, make_aware, timezone
+from django.utils.timezone import make_aware, timezone
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django.contrib.auth.tokens import default_token_generator
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
-from django.core.mail import send_mail
 from django.db import transaction
 from django.db.models import (
     Count,
-    Avg,
     F,
-    DateField,
-    Q,
     Sum,
     F,
     ExpressionWrapper,
     DurationField,
 )
-from django.db.models.functions import TruncDay
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
 from decouple import config
 from rest_framework import status, generics, permissions, viewsets, filters, serializers
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView
 import os
+from asgiref.sync import sync_to_async
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken
+from django.core.handlers.asgi import ASGIRequest
+from .authentication import RolJWTAuthentication, usuario_desde_ticket
 from .permissions import IsSupervisor
-import threading
+from .agenda import (
+    AGENDA_HORA_FIN,
+    AGENDA_HORA_INICIO,
+    AGENDA_PASO_MINUTOS,
+    cargar_ocupaciones,
+    horarios_disponibles,
+    matriz_disponibilidad,
+    planificar_agenda,
+    resumen_plan,
+)
+from .kits import (
+    StockInsuficiente,
+    consumir_reservas,
+    disponibilidad,
+    faltantes_kit,
+    kit_vigente,
+    requeridos,
+    reservar_kit,
+)
+from .chat import (
+    bandeja_salas,
+    buscar_mensajes,
+    contar_no_leidos,
+    marcar_leido,
+    obtener_o_crear_sala_directa,
+    pagina_mensajes,
+)
+from .correos import encolar_correo
+from .eventos import (
+    EVENTOS_DURACION_MAX_SEG,
+    EVENTOS_HEARTBEAT_SEG,
+    canal_usuario,
+    formato_sse,
+    obtener_broker,
+    publicar_a_usuarios,
+    publicar_en_sala,
+)
+from .notificaciones import (
+    contar_no_leidas,
+    marcar_como_leidas,
+    notificar_roles,
+    notificar_usuarios,
+    usuarios_con_rol,
+)
+from .roles import user_has_role
+from .kpis import obtener_kpis_dashboard
+from .tokens import RolRefreshToken, TicketEventos
+from .pagination import (
+    OrdenCursorPagination,
+    AgendamientoCursorPagination,
+    NotificacionCursorPagination,
+    PrestamoLlaveCursorPagination,
+    LlaveHistorialEstadoCursorPagination,
+)
 import os
 import mimetypes
 from django.http import FileResponse, Http404
@@ -51,6 +102,7 @@ from .models import (
     OrdenItem,
     Notificacion,
     Orden,
+    AGENDA_FECHA_ORDEN,
     Agendamiento,
     Vehiculo,
     OrdenHistorialEstado,
@@ -70,6 +122,8 @@ from .serializers import (
     OrdenItemSerializer,
     NotificacionSerializer,
     OrdenSerializer,
+    OrdenListSerializer,
+    OrdenTareaSerializer,
     AgendamientoSerializer,
     OrdenDocumentoSerializer,
     VehiculoSerializer,
@@ -85,47 +139,17 @@ from .serializers import (
     TallerSerializer,
     ChatRoomSerializer,
     ChatMessageSerializer,
+    ChatMensajeSerializer,
+    ChatAutorSerializer,
+    ChatBandejaSerializer,
     ChatRoomCreateSerializer,
 )
 
 User = get_user_model()
 
-
-def enviar_correo_notificacion(usuario, subject, message_body):
-    """
-    Envía un correo electrónico de notificación usando la plantilla HTML.
-    """
-    if not usuario.email:
-        print(f"Usuario {usuario.username} no tiene email, no se envía correo.")
-        return
-    recipient_email = "fer.araneda@duocuc.cl"
-    print(
-        f"Enviando correo de prueba a: {recipient_email} (Usuario real: {usuario.email})"
-    )
-    context = {
-        "subject": subject,
-        "message_body": message_body,
-        "nombre_usuario": usuario.first_name or usuario.username,
-    }
-
-    try:
-
-        html_message = render_to_string("emails/notificacion_base.html", context)
-
-        plain_message = strip_tags(html_message)
-
-        send_mail(
-            subject,
-            plain_message,
-            None,
-            [recipient_email],
-            html_message=html_message,
-            fail_silently=False,
-        )
-        print(f"Correo enviado exitosamente a {recipient_email}")
-
-    except Exception as e:
-        print(f"ERROR al enviar correo a {recipient_email}: {e}")
+AGENDA_MAX_DIAS = 31
+CHAT_PAGE_SIZE = 50
+CHAT_MAX_PAGE_SIZE = 200
 
 
 class IsJefetaller(permissions.BasePermission):
@@ -133,9 +157,7 @@ class IsJefetaller(permissions.BasePermission):
         return bool(
             request.user
             and request.user.is_authenticated
-            and request.user.groups.filter(
-                name__in=["Jefetaller", "Supervisor"]
-            ).exists()
+            and user_has_role(request.user, "Jefetaller", "Supervisor")
         )
 
 
@@ -144,9 +166,7 @@ class IsJefetallerOrMecanico(permissions.BasePermission):
         return bool(
             request.user
             and request.user.is_authenticated
-            and request.user.groups.filter(
-                name__in=["Jefetaller", "Mecanico", "Supervisor"]
-            ).exists()
+            and user_has_role(request.user, "Jefetaller", "Mecanico", "Supervisor")
         )
 
 
@@ -155,9 +175,7 @@ class IsJefetallerOrSeguridad(permissions.BasePermission):
         return bool(
             request.user
             and request.user.is_authenticated
-            and request.user.groups.filter(
-                name__in=["Jefetaller", "Seguridad", "Supervisor"]
-            ).exists()
+            and user_has_role(request.user, "Jefetaller", "Seguridad", "Supervisor")
         )
 
 
@@ -170,9 +188,7 @@ class IsSupervisor(permissions.BasePermission):
         return bool(
             request.user
             and request.user.is_authenticated
-            and request.user.groups.filter(
-                name__in=["Supervisor", "Jefetaller"]
-            ).exists()
+            and user_has_role(request.user, "Supervisor", "Jefetaller")
         )
 
 
@@ -185,9 +201,9 @@ class IsControlLlaves(permissions.BasePermission):
         return bool(
             request.user
             and request.user.is_authenticated
-            and request.user.groups.filter(
-                name__in=["Control Llaves", "Jefetaller", "Supervisor"]
-            ).exists()
+            and user_has_role(
+                request.user, "Control Llaves", "Jefetaller", "Supervisor"
+            )
         )
 
 
@@ -200,9 +216,9 @@ class IsJefetallerOrControlLlaves(permissions.BasePermission):
         return bool(
             request.user
             and request.user.is_authenticated
-            and request.user.groups.filter(
-                name__in=["Jefetaller", "Control Llaves", "Supervisor"]
-            ).exists()
+            and user_has_role(
+                request.user, "Jefetaller", "Control Llaves", "Supervisor"
+            )
         )
 
 
@@ -215,9 +231,7 @@ class IsRepuestos(permissions.BasePermission):
         return bool(
             request.user
             and request.user.is_authenticated
-            and request.user.groups.filter(
-                name__in=["Repuestos", "Jefetaller", "Supervisor"]
-            ).exists()
+            and user_has_role(request.user, "Repuestos", "Jefetaller", "Supervisor")
         )
 
 
@@ -230,7 +244,7 @@ class IsInvitado(permissions.BasePermission):
         return bool(
             request.user
             and request.user.is_authenticated
-            and request.user.groups.filter(name="Invitado").exists()
+            and user_has_role(request.user, "Invitado")
             and request.method in permissions.SAFE_METHODS
         )
 
@@ -243,7 +257,7 @@ class LoginView(generics.GenericAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data["user"]
-        refresh = RefreshToken.for_user(user)
+        refresh = RolRefreshToken.for_user(user)
         user_data = UserSerializer(user).data
         return Response(
             {
@@ -280,12 +294,10 @@ class PasswordResetRequestView(generics.GenericAPIView):
         frontend = config("FRONTEND_URL", default="http://localhost:5173")
         reset_link = f"{frontend.rstrip('/')}/set-new-password?uid={uid}&token={token}"
 
-        send_mail(
+        encolar_correo(
+            email,
             "Restablecer contraseña para Taller PepsiCo",
             f"Hola {user.first_name},\n\nUsa este enlace para restablecer tu contraseña: {reset_link}\n\nSi no solicitaste esto, ignora este mensaje.",
-            None,
-            [email],
-            fail_silently=False,
         )
         return Response(
             {
@@ -421,83 +433,12 @@ dias_semana = {0: "Lun", 1: "Mar", 2: "Mié", 3: "Jue", 4: "Vie", 5: "Sáb", 6:
 @api_view(["GET"])
 @permission_classes([IsJefetaller | IsInvitado])
 def Jefetaller_dashboard_stats(request):
-    today = now().date()
-    start_of_month_dt = timezone.make_aware(
-        datetime.combine(today.replace(day=1), datetime.min.time())
-    )
-    start_of_week = today - timedelta(days=today.weekday())
-    start_of_week_dt = timezone.make_aware(
-        datetime.combine(start_of_week, datetime.min.time())
-    )
-
-    pendientes_aprobacion = Agendamiento.objects.filter(
-        estado=Agendamiento.Estado.PROGRAMADO
-    ).count()
-    try:
-        vehiculos_en_taller = (
-            Orden.objects.activas().values("vehiculo").distinct().count()
-        )
-    except Exception:
-        vehiculos_en_taller = (
-            Orden.objects.exclude(estado=Orden.Estado.FINALIZADO)
-            .values("vehiculo")
-            .distinct()
-            .count()
-        )
-    start_today = timezone.make_aware(datetime.combine(today, datetime.min.time()))
-    end_today = start_today + timedelta(days=1)
-    agendamientos_hoy = Agendamiento.objects.filter(
-        estado=Agendamiento.Estado.CONFIRMADO,
-        fecha_hora_programada__gte=start_today,
-        fecha_hora_programada__lt=end_today,
-    ).count()
-    ordenes_finalizadas_mes = Orden.objects.filter(
-        estado=Orden.Estado.FINALIZADO,
-        fecha_entrega_real__gte=start_of_month_dt,
-    ).count()
-    ordenes_completadas = Orden.objects.filter(
-        estado=Orden.Estado.FINALIZADO,
-        fecha_entrega_real__isnull=False,
-        fecha_ingreso__isnull=False,
-    )
-    tiempo_promedio_str = "N/A"
-    if ordenes_completadas.exists():
-        avg_delta = ordenes_completadas.aggregate(
-            avg_duration=Avg(F("fecha_entrega_real") - F("fecha_ingreso"))
-        )["avg_duration"]
-        if avg_delta:
-            total_dias = avg_delta.total_seconds() / (60 * 60 * 24)
-            tiempo_promedio_str = f"{total_dias:.1f} días"
-    ordenes_por_estado = list(
-        Orden.objects.values("estado").annotate(cantidad=Count("id")).order_by("estado")
-    )
-    ordenes_semana_raw = (
-        Orden.objects.filter(fecha_ingreso__gte=start_of_week_dt)
-        .annotate(dia_semana=TruncDay("fecha_ingreso", output_field=DateField()))
-        .values("dia_semana")
-        .annotate(creadas=Count("id"))
-        .order_by("dia_semana")
-    )
-    ordenes_ultima_semana = []
-    dias_semana_map = {
-        0: "Lun",
-        1: "Mar",
-        2: "Mié",
-        3: "Jue",
-        4: "Vie",
-        5: "Sáb",
-        6: "Dom",
-    }
-    for i in range(7):
-        fecha_dia = start_of_week + timedelta(days=i)
-        dia_nombre = dias_semana_map.get(fecha_dia.weekday(), "")
-        cre = 0
-        for item in ordenes_semana_raw:
-            if item["dia_semana"] == fecha_dia:
-                cre = item["creadas"]
-                break
-        ordenes_ultima_semana.append({"dia": dia_nombre, "creadas": cre})
-
+    """
+    KPIs del dashboard del Jefetaller/Supervisor. Los contadores se leen del
+    almacén de indicadores (accounts/kpis.py), que se mantiene al día con
+    cada cambio de Orden/Agendamiento; solo las órdenes recientes se
+    consultan en vivo (últimas 10 por fecha de ingreso, indexada).
+    """
     ordenes_recientes = list(
         Orden.objects.select_related("vehiculo", "usuario_asignado")
         .order_by("-fecha_ingreso")[:10]
@@ -527,20 +468,8 @@ def Jefetaller_dashboard_stats(request):
             }
         )
 
-    response_data = {
-        "kpis": {
-            "vehiculosEnTaller": vehiculos_en_taller,
-            "agendamientosHoy": agendamientos_hoy,
-            "ordenesFinalizadasMes": ordenes_finalizadas_mes,
-            "tiempoPromedioRep": tiempo_promedio_str,
-        },
-        "alertas": {
-            "pendientesAprobacion": pendientes_aprobacion,
-        },
-        "ordenesPorEstado": ordenes_por_estado,
-        "ordenesUltimaSemana": ordenes_ultima_semana,
-        "ordenesRecientes": ordenes_recientes_data,
-    }
+    response_data = obtener_kpis_dashboard(dias_semana)
+    response_data["ordenesRecientes"] = ordenes_recientes_data
     return Response(response_data, status=status.HTTP_200_OK)
 
 
@@ -558,7 +487,7 @@ class VehiculoViewSet(viewsets.ModelViewSet):
         ]:
             return Vehiculo.objects.all()
         user = self.request.user
-        if user.groups.filter(name="Chofer").exists():
+        if user_has_role(user, "Chofer"):
             return Vehiculo.activos.filter(chofer=user)
         return Vehiculo.activos.all()
 
@@ -602,7 +531,7 @@ class VehiculoViewSet(viewsets.ModelViewSet):
     def inactivos(self, request):
         vehiculos_inactivos = Vehiculo.objects.filter(is_active=False)
         user = self.request.user
-        if user.groups.filter(name="Chofer").exists():
+        if user_has_role(user, "Chofer"):
             vehiculos_inactivos = vehiculos_inactivos.filter(chofer=user)
         serializer = self.get_serializer(vehiculos_inactivos, many=True)
         return Response(serializer.data)
@@ -620,33 +549,48 @@ class VehiculoViewSet(viewsets.ModelViewSet):
         return Response(self.get_serializer(vehiculo).data, status=status.HTTP_200_OK)
 
 
+def filtrar_por_estado(queryset, params):
+    """
+    Aplica ?estado= y ?estado__ne= (repetibles) en la consulta, para que el
+    frontend pida solo las filas que muestra en vez de filtrar la tabla
+    completa página por página.
+    """
+    incluir = params.getlist("estado")
+    excluir = params.getlist("estado__ne")
+    if incluir:
+        queryset = queryset.filter(estado__in=incluir)
+    if excluir:
+        queryset = queryset.exclude(estado__in=excluir)
+    return queryset
+
+
 class AgendamientoViewSet(viewsets.ModelViewSet):
     serializer_class = AgendamientoSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = AgendamientoCursorPagination
 
     def get_queryset(self):
         user = self.request.user
-        if user.groups.filter(
-            name__in=["Jefetaller", "Mecanico", "Seguridad", "Supervisor", "Invitado"]
-        ).exists():
-            return (
-                Agendamiento.objects.select_related("vehiculo", "mecanico_asignado")
-                .all()
-                .order_by("fecha_hora_programada")
-            )
-        elif user.groups.filter(name="Chofer").exists():
-            return Agendamiento.objects.filter(vehiculo__chofer=user).order_by(
-                "fecha_hora_programada"
-            )
-        return Agendamiento.objects.none()
+        if user_has_role(
+            user, "Jefetaller", "Mecanico", "Seguridad", "Supervisor", "Invitado"
+        ):
+            queryset = Agendamiento.objects.select_related(
+                "vehiculo", "mecanico_asignado"
+            ).all()
+        elif user_has_role(user, "Chofer"):
+            queryset = Agendamiento.objects.filter(vehiculo__chofer=user)
+        else:
+            return Agendamiento.objects.none()
+        if self.action == "list":
+            queryset = filtrar_por_estado(queryset, self.request.query_params)
+        return queryset.annotate(fecha_orden=AGENDA_FECHA_ORDEN).order_by(
+            "fecha_orden", "id"
+        )
 
     def perform_create(self, serializer):
         user = self.request.user
         agendamiento = serializer.save(creado_por=user, chofer_asociado=user)
         try:
-            Jefetalleres = User.objects.filter(
-                groups__name__in=["Jefetaller", "Supervisor"], is_active=True
-            )
             chofer = agendamiento.creado_por
             chofer_nombre = (
                 f"{chofer.first_name} {chofer.last_name}".strip() or chofer.username
@@ -655,16 +599,12 @@ class AgendamientoViewSet(viewsets.ModelViewSet):
 
             subject = f"Nueva Solicitud de Cita: {patente}"
             mensaje = f"El chofer {chofer_nombre} ha solicitado un ingreso para el vehículo {patente}. Motivo: {agendamiento.motivo_ingreso}"
-            link_Jefetaller = "/panel-Jefetaller"
-            for Jefetaller in Jefetalleres:
-                Notificacion.objects.create(
-                    usuario=Jefetaller, mensaje=mensaje, link=link_Jefetaller
-                )
-                thread = threading.Thread(
-                    target=enviar_correo_notificacion,
-                    args=(Jefetaller, subject, mensaje),
-                )
-                thread.start()
+            notificar_roles(
+                ["Jefetaller", "Supervisor"],
+                mensaje,
+                link="/panel-Jefetaller",
+                asunto=subject,
+            )
 
         except Exception as e:
 
@@ -684,49 +624,153 @@ class AgendamientoViewSet(viewsets.ModelViewSet):
                 {"error": "Esta no es una cita de mantenimiento."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        REPUESTOS_MANTENIMIENTO = {
-            "ACE-10W40": 1,
-            "FIL-AIRE-01": 1,
-            "FRE-LIQ-01": 1,
-        }
+        kit = kit_vigente()
+        if kit is None:
+            return Response(
+                {"error": "No hay un kit de mantenimiento activo configurado."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        # Lo ya reservado para otras citas confirmadas no está disponible.
+        faltantes = faltantes_kit(kit)
+        return Response(
+            {
+                "stock_completo": not faltantes,
+                "faltantes": faltantes,
+                "kit": kit.nombre,
+                "repuestos_revisados": requeridos(kit),
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="planificar",
+        permission_classes=[IsJefetaller],
+    )
+    def planificar(self, request):
+        """
+        Asigna de una vez mecánico y horario a todas las citas pendientes
+        (Programado) entre 'desde' y 'hasta' (YYYY-MM-DD; por defecto, hoy
+        y los próximos 6 días), respetando las citas ya confirmadas, que
+        un vehículo no tenga dos citas a la vez y el stock de los kits de
+        mantenimiento. Todo se confirma en una sola transacción.
+        Con "simular": true solo devuelve el plan, sin guardar nada.
+        """
+        try:
+            desde = (
+                datetime.strptime(request.data["desde"], "%Y-%m-%d").date()
+                if request.data.get("desde")
+                else timezone.localdate()
+            )
+            hasta = (
+                datetime.strptime(request.data["hasta"], "%Y-%m-%d").date()
+                if request.data.get("hasta")
+                else desde + timedelta(days=6)
+            )
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "Las fechas deben tener el formato YYYY-MM-DD."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if hasta < desde or (hasta - desde).days >= AGENDA_MAX_DIAS:
+            return Response(
+                {"error": f"El rango debe ser de 1 a {AGENDA_MAX_DIAS} días."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        simular = str(request.data.get("simular", "")).lower() in ("1", "true")
 
-        skus_requeridos = list(REPUESTOS_MANTENIMIENTO.keys())
-        productos = Producto.objects.filter(sku__in=skus_requeridos)
+        asignaciones, sin_asignar = planificar_agenda(
+            desde, hasta, request.user, simular=simular
+        )
+        return Response(
+            {"simulado": simular, **resumen_plan(asignaciones, sin_asignar)},
+            status=status.HTTP_200_OK,
+        )
 
-        faltantes = []
-        stock_completo = True
+    @action(
+        detail=True,
+        methods=["get"],
+        url_path="horarios-disponibles",
+        permission_classes=[IsJefetaller],
+    )
+    def horarios_disponibles(self, request, pk=None):
+        """
+        Sugiere horarios libres para asignar esta cita, para uno o más
+        mecánicos, en un rango de días:
+        ?desde=YYYY-MM-DD&hasta=YYYY-MM-DD (por defecto, hoy),
+        ?mecanicos=1,2 (por defecto, todos los activos),
+        ?duracion=<minutos> (por defecto, la de la cita).
+        Evita también las otras citas activas del vehículo, así que
+        cualquier horario devuelto pasa las validaciones de
+        confirmar-y-asignar.
+        """
+        agendamiento = self.get_object()
+        params = request.query_params
+        try:
+            desde = (
+                datetime.strptime(params["desde"], "%Y-%m-%d").date()
+                if params.get("desde")
+                else timezone.localdate()
+            )
+            hasta = (
+                datetime.strptime(params["hasta"], "%Y-%m-%d").date()
+                if params.get("hasta")
+                else desde
+            )
+            duracion = int(
+                params.get("duracion") or agendamiento.duracion_estimada_minutos
+            )
+            mecanico_ids = [
+                int(valor) for valor in params.get("mecanicos", "").split(",") if valor
+            ]
+        except ValueError:
+            return Response(
+                {
+                    "error": "Fechas en formato YYYY-MM-DD; 'duracion' y 'mecanicos' deben ser números."
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if hasta < desde or (hasta - desde).days >= AGENDA_MAX_DIAS:
+            return Response(
+                {"error": f"El rango debe ser de 1 a {AGENDA_MAX_DIAS} días."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if duracion <= 0:
+            return Response(
+                {"error": "La duración debe ser mayor a 0."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        for sku, cantidad_necesaria in REPUESTOS_MANTENIMIENTO.items():
-            try:
-                producto = productos.get(sku=sku)
-                if producto.stock < cantidad_necesaria:
-                    stock_completo = False
-                    faltantes.append(
-                        {
-                            "nombre": producto.nombre,
-                            "sku": sku,
-                            "stock_actual": producto.stock,
-                            "necesario": cantidad_necesaria,
-                        }
-                    )
-            except Producto.DoesNotExist:
-                stock_completo = False
-                faltantes.append(
-                    {
-                        "nombre": f"Producto (SKU: {sku}) no encontrado",
-                        "sku": sku,
-                        "stock_actual": 0,
-                        "necesario": cantidad_necesaria,
-                    }
-                )
+        mecanicos = User.activos.filter(groups__name="Mecanico").order_by("first_name")
+        if mecanico_ids:
+            mecanicos = mecanicos.filter(id__in=mecanico_ids)
+        mecanicos = list(mecanicos)
 
+        disponibles = horarios_disponibles(
+            [mecanico.id for mecanico in mecanicos],
+            desde,
+            hasta,
+            duracion,
+            vehiculo=agendamiento.vehiculo,
+            excluir=agendamiento,
+        )
         return Response(
             {
-                "stock_completo": stock_completo,
-                "faltantes": faltantes,
-                "repuestos_revisados": REPUESTOS_MANTENIMIENTO,
-            },
-            status=status.HTTP_200_OK,
+                "duracion_minutos": duracion,
+                "mecanicos": [
+                    {
+                        "id": mecanico.id,
+                        "nombre": mecanico.get_full_name() or mecanico.username,
+                        "huecos": [
+                            {"inicio": inicio, "fin": fin}
+                            for inicio, fin in disponibles[mecanico.id]["huecos"]
+                        ],
+                        "inicios": disponibles[mecanico.id]["inicios"],
+                    }
+                    for mecanico in mecanicos
+                ],
+            }
         )
 
     @action(
@@ -742,12 +786,6 @@ class AgendamientoViewSet(viewsets.ModelViewSet):
         fecha_hora_asignada_str = request.data.get("fecha_hora_asignada")
         motivo_cambio = request.data.get("motivo_reagendamiento", None)
 
-        if agendamiento.es_mantenimiento:
-            REPUESTOS_MANTENIMIENTO = {
-                "ACE-10W40": 1,
-                "FIL-AIRE-01": 1,
-                "FRE-LIQ-01": 1,
-            }
         try:
             mecanico_id = int(mecanico_id_raw)
             mecanico = User.objects.get(id=mecanico_id, groups__name="Mecanico")
@@ -768,6 +806,8 @@ class AgendamientoViewSet(viewsets.ModelViewSet):
 
         try:
             fecha_a_validar = datetime.fromisoformat(fecha_hora_asignada_str)
+            if timezone.is_naive(fecha_a_validar):
+                fecha_a_validar = timezone.make_aware(fecha_a_validar)
             if agendamiento.fecha_hora_programada != fecha_a_validar:
                 hubo_cambio_fecha = True
         except (ValueError, TypeError):
@@ -775,62 +815,41 @@ class AgendamientoViewSet(viewsets.ModelViewSet):
                 {"error": "Formato de fecha/hora asignada es inválido."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        if agendamiento.es_mantenimiento:
-            skus_requeridos = list(REPUESTOS_MANTENIMIENTO.keys())
-            productos = Producto.objects.select_for_update().filter(
-                sku__in=skus_requeridos
-            )
-            productos_encontrados = {p.sku: p for p in productos}
-            for sku, cantidad_necesaria in REPUESTOS_MANTENIMIENTO.items():
-                producto = productos_encontrados.get(sku)
-                if not producto:
-                    return Response(
-                        {
-                            "error": f"Producto con SKU '{sku}' no fue encontrado en la base de datos. Cita no confirmada."
-                        },
-                        status=status.HTTP_404_NOT_FOUND,
-                    )
-                if producto.stock < cantidad_necesaria:
-                    return Response(
-                        {
-                            "error": f"Stock agotado para '{producto.nombre}' (SKU: {sku}). Quedan {producto.stock}. Cita no confirmada."
-                        },
-                        status=status.HTTP_400_BAD_REQUEST,
-                    )
         fecha_fin = fecha_a_validar + timedelta(
             minutes=agendamiento.duracion_estimada_minutos
         )
-        overlapping_mecanico = Agendamiento.objects.filter(
-            Q(fecha_hora_programada__lt=fecha_fin)
-            & Q(fecha_hora_fin__gt=fecha_a_validar)
-            & Q(mecanico_asignado=mecanico)
-            & Q(
-                estado__in=[
-                    Agendamiento.Estado.CONFIRMADO,
-                    Agendamiento.Estado.EN_TALLER,
-                ]
-            )
-        ).exclude(pk=agendamiento.pk)
-        if overlapping_mecanico.exists():
+        por_mecanico, por_vehiculo = cargar_ocupaciones(
+            [mecanico.id],
+            fecha_a_validar,
+            fecha_fin,
+            vehiculo_ids=[agendamiento.vehiculo_id],
+            excluir_ids=[agendamiento.pk],
+        )
+        if not por_mecanico[mecanico.id].esta_libre(fecha_a_validar, fecha_fin):
             return Response(
                 {
                     "error": f"Conflicto de horario (Mecánico): El mecánico {mecanico.get_full_name()} ya tiene una cita en ese rango."
                 },
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        overlapping_vehiculo = Agendamiento.objects.filter(
-            Q(vehiculo=agendamiento.vehiculo)
-            & Q(fecha_hora_programada__lt=fecha_fin)
-            & Q(fecha_hora_fin__gt=fecha_a_validar)
-            & ~Q(estado__in=["Finalizado", "Cancelado"])
-        ).exclude(pk=agendamiento.pk)
-        if overlapping_vehiculo.exists():
+        if not por_vehiculo[agendamiento.vehiculo_id].esta_libre(
+            fecha_a_validar, fecha_fin
+        ):
             return Response(
                 {
                     "error": f"Conflicto de horario (Vehículo): El vehículo {agendamiento.vehiculo.patente} ya tiene OTRA cita activa en ese nuevo rango."
                 },
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        # Reserva los repuestos del kit (no hace nada si no es mantenimiento
+        # o si la cita ya los tenía reservados).
+        try:
+            reservar_kit(agendamiento)
+        except StockInsuficiente as e:
+            return Response(
+                {"error": f"{e} Cita no confirmada.", "faltantes": e.faltantes},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
         agendamiento.mecanico_asignado = mecanico
         agendamiento.estado = Agendamiento.Estado.CONFIRMADO
         agendamiento.fecha_hora_programada = fecha_a_validar
@@ -851,47 +870,32 @@ class AgendamientoViewSet(viewsets.ModelViewSet):
                         f"Cita Confirmada: Su cita para {agendamiento.vehiculo.patente} es el {fecha_str}. "
                         f"Dirección Taller: {taller_direccion}. Motivo: {motivo_str}"
                     )
-                    Notificacion.objects.create(
-                        usuario=agendamiento.chofer_asociado,
-                        mensaje=mensaje,
-                        link=f"/historial",
-                    )
                     subject_chofer = f"Cita Confirmada: {agendamiento.vehiculo.patente} el {fecha_str}"
-                    thread_chofer = threading.Thread(
-                        target=enviar_correo_notificacion,
-                        args=(agendamiento.chofer_asociado, subject_chofer, mensaje),
+                    notificar_usuarios(
+                        [agendamiento.chofer_asociado],
+                        mensaje,
+                        link=f"/historial",
+                        asunto=subject_chofer,
                     )
-                    thread_chofer.start()
             except Exception as e:
                 print(f"Error al crear notificación de reagendamiento: {e}")
         try:
-            usuarios_seguridad = User.objects.filter(
-                groups__name="Seguridad", is_active=True
-            )
             mensaje_seguridad = f"Vehículo {agendamiento.vehiculo.patente} (Chofer: {agendamiento.chofer_asociado.first_name}) tiene cita confirmada para el {fecha_a_validar.strftime('%d-%m a las %H:%M')}."
-            for user_seg in usuarios_seguridad:
-                Notificacion.objects.create(
-                    usuario=user_seg,
-                    mensaje=mensaje_seguridad,
-                    link="/panel-ingresos",
-                )
-                subject_seguridad = (
-                    f"Cita Confirmada: Vehículo {agendamiento.vehiculo.patente}"
-                )
-                thread_seg = threading.Thread(
-                    target=enviar_correo_notificacion,
-                    args=(user_seg, subject_seguridad, mensaje_seguridad),
-                )
-                thread_seg.start()
+            notificar_roles(
+                ["Seguridad"],
+                mensaje_seguridad,
+                link="/panel-ingresos",
+                asunto=f"Cita Confirmada: Vehículo {agendamiento.vehiculo.patente}",
+            )
         except Exception as e:
             print(f"Error al crear notificación para Seguridad: {e}")
         try:
             if agendamiento.mecanico_asignado:
                 fecha_str_mec = fecha_a_validar.strftime("%d-%m-%Y a las %H:%M")
                 mensaje_mecanico = f"Nueva Cita Asignada: Tienes una cita programada para el {fecha_str_mec} (Vehículo: {agendamiento.vehiculo.patente})."
-                Notificacion.objects.create(
-                    usuario=agendamiento.mecanico_asignado,
-                    mensaje=mensaje_mecanico,
+                notificar_usuarios(
+                    [agendamiento.mecanico_asignado],
+                    mensaje_mecanico,
                     link="/proximas-citas",
                 )
         except Exception as e:
@@ -932,60 +936,15 @@ class AgendamientoViewSet(viewsets.ModelViewSet):
             )
             mensaje_respuesta = "Ingreso registrado y orden creada."
             if agendamiento.es_mantenimiento:
-                REPUESTOS_MANTENIMIENTO = {
-                    "ACE-10W40": 1,
-                    "FIL-AIRE-01": 1,
-                    "FRE-LIQ-01": 1,
-                }
-                skus_requeridos = list(REPUESTOS_MANTENIMIENTO.keys())
-                productos = Producto.objects.select_for_update().filter(
-                    sku__in=skus_requeridos
-                )
-                productos_encontrados = {p.sku: p for p in productos}
-
-                for sku, cantidad_necesaria in REPUESTOS_MANTENIMIENTO.items():
-                    producto = productos_encontrados.get(sku)
-
-                    if not producto:
-                        return Response(
-                            {
-                                "error": f"Error de configuración: Producto SKU '{sku}' no encontrado."
-                            },
-                            status=status.HTTP_400_BAD_REQUEST,
-                        )
-
-                    if producto.stock < cantidad_necesaria:
-                        return Response(
-                            {
-                                "error": f"Stock insuficiente para '{producto.nombre}' (Quedan {producto.stock}). No se pudo registrar el ingreso."
-                            },
-                            status=status.HTTP_400_BAD_REQUEST,
-                        )
-                    producto.stock = F("stock") - cantidad_necesaria
-                    producto.save()
-                    OrdenItem.objects.create(
-                        orden=nueva_orden,
-                        producto=producto,
-                        cantidad=cantidad_necesaria,
-                        precio_unitario=producto.precio_venta,
-                        solicitado_por=agendamiento.mecanico_asignado,
-                        gestionado_por=request.user,
-                        fecha_gestion=timezone.now(),
-                        estado_repuesto=OrdenItem.EstadoRepuesto.APROBADO,
-                    )
+                consumir_reservas(agendamiento, nueva_orden, request.user)
             if agendamiento.mecanico_asignado:
                 mensaje = f"¡Vehículo Ingresado! Se te ha asignado la Orden #{nueva_orden.id} (Vehículo: {nueva_orden.vehiculo.patente})."
-                Notificacion.objects.create(
-                    usuario=agendamiento.mecanico_asignado,
-                    mensaje=mensaje,
+                notificar_usuarios(
+                    [agendamiento.mecanico_asignado],
+                    mensaje,
                     link=f"/ordenes/{nueva_orden.id}",
+                    asunto=f"Nueva Orden Asignada: #{nueva_orden.id}",
                 )
-                subject_mecanico = f"Nueva Orden Asignada: #{nueva_orden.id}"
-                thread = threading.Thread(
-                    target=enviar_correo_notificacion,
-                    args=(agendamiento.mecanico_asignado, subject_mecanico, mensaje),
-                )
-                thread.start()
             agendamiento.estado = Agendamiento.Estado.EN_TALLER
             agendamiento.save()
 
@@ -1003,6 +962,12 @@ class AgendamientoViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_201_CREATED,
             )
 
+        except StockInsuficiente as e:
+            transaction.set_rollback(True)
+            return Response(
+                {"error": f"{e} No se pudo registrar el ingreso."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
         except Exception as e:
             return Response(
                 {"error": f"Error al registrar ingreso: {str(e)}"},
@@ -1058,8 +1023,8 @@ class AgendamientoViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            usuarios_grua = User.objects.filter(groups__name="Grua", is_active=True)
-            if not usuarios_grua.exists():
+            usuarios_grua = list(usuarios_con_rol("Grua"))
+            if not usuarios_grua:
                 return Response(
                     {"error": "No hay usuarios en el rol 'Grua' para notificar."},
                     status=status.HTTP_404_NOT_FOUND,
@@ -1073,18 +1038,13 @@ class AgendamientoViewSet(viewsets.ModelViewSet):
                 f"Contacto Chofer: {chofer_nombre} (Tel: {chofer_telefono})"
             )
             subject = f"Solicitud de Grúa - Cita #{agendamiento.id} - Patente {agendamiento.vehiculo.patente}"
-            for user_grua in usuarios_grua:
-                Notificacion.objects.create(
-                    usuario=user_grua,
-                    mensaje=f"Nueva solicitud de grúa para {agendamiento.vehiculo.patente}. Dirección: {agendamiento.direccion_grua}",
-                    link="/panel-gruas",
-                )
-
-                thread = threading.Thread(
-                    target=enviar_correo_notificacion,
-                    args=(user_grua, subject, mensaje),
-                )
-                thread.start()
+            notificar_usuarios(
+                usuarios_grua,
+                f"Nueva solicitud de grúa para {agendamiento.vehiculo.patente}. Dirección: {agendamiento.direccion_grua}",
+                link="/panel-gruas",
+                asunto=subject,
+                cuerpo_correo=mensaje,
+            )
             agendamiento.grua_enviada = True
             agendamiento.save()
 
@@ -1103,28 +1063,36 @@ class OrdenViewSet(viewsets.ModelViewSet):
 
     serializer_class = OrdenSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = OrdenCursorPagination
 
     def get_queryset(self):
         user = self.request.user
-        if user.groups.filter(name__in=["Jefetaller", "Supervisor", "Invitado"]).exists():
-            return (
-                Orden.objects.select_related("vehiculo", "usuario_asignado")
-                .all()
-                .order_by("-fecha_ingreso")
-            )
-        elif user.groups.filter(name="Mecanico").exists():
-            return (
-                Orden.objects.filter(usuario_asignado=user)
-                .select_related("vehiculo")
-                .order_by("-fecha_ingreso")
-            )
-        elif user.groups.filter(name="Chofer").exists():
-            return (
-                Orden.objects.filter(vehiculo__chofer=user)
-                .select_related("vehiculo")
-                .order_by("-fecha_ingreso")
-            )
-        return Orden.objects.none()
+        if user_has_role(user, "Jefetaller", "Supervisor", "Invitado"):
+            queryset = Orden.objects.all()
+        elif user_has_role(user, "Mecanico"):
+            queryset = Orden.objects.filter(usuario_asignado=user)
+        elif user_has_role(user, "Chofer"):
+            queryset = Orden.objects.filter(vehiculo__chofer=user)
+        else:
+            return Orden.objects.none()
+        if self.action == "retrieve":
+            queryset = queryset.con_detalle()
+        else:
+            queryset = queryset.select_related(
+                "vehiculo", "usuario_asignado", "agendamiento_origen"
+            )
+        if self.action == "list":
+            queryset = filtrar_por_estado(queryset, self.request.query_params)
+        return queryset.order_by("-fecha_ingreso")
+
+    def get_serializer_class(self):
+        """
+        El listado usa una proyección plana (sin historial, documentos ni
+        items anidados); el detalle mantiene el OrdenSerializer completo.
+        """
+        if self.action == "list":
+            return OrdenListSerializer
+        return OrdenSerializer
 
     def get_permissions(self):
         if self.action in ["cambiar_estado"]:
@@ -1181,26 +1149,13 @@ class OrdenViewSet(viewsets.ModelViewSet):
 
                     mensaje_chofer = mensajes.get(nuevo_estado)
                     if mensaje_chofer:
-                        Notificacion.objects.create(
-                            usuario=chofer_a_notificar,
-                            mensaje=f"Actualización: Su vehículo {orden.vehiculo.patente} {mensaje_chofer}",
+                        notificar_usuarios(
+                            [chofer_a_notificar],
+                            f"Actualización: Su vehículo {orden.vehiculo.patente} {mensaje_chofer}",
                             link="/dashboard",
-                        )
-                        subject_chofer_estado = (
-                            f"Actualización Orden #{orden.id}: {orden.vehiculo.patente}"
+                            asunto=f"Actualización Orden #{orden.id}: {orden.vehiculo.patente}",
                         )
 
-                        mensaje_email = f"Actualización: Su vehículo {orden.vehiculo.patente} {mensaje_chofer}"
-                        thread = threading.Thread(
-                            target=enviar_correo_notificacion,
-                            args=(
-                                chofer_a_notificar,
-                                subject_chofer_estado,
-                                mensaje_email,
-                            ),
-                        )
-                        thread.start()
-
             except Exception as e:
 
                 print(f"Error al crear notificación de cambio de estado: {e}")
@@ -1308,7 +1263,7 @@ class MisProximasCitasView(generics.ListAPIView):
 
     def get_queryset(self):
         user = self.request.user
-        if user.groups.filter(name="Mecanico").exists():
+        if user_has_role(user, "Mecanico"):
             return Agendamiento.objects.filter(
                 mecanico_asignado=user,
                 estado=Agendamiento.Estado.CONFIRMADO,
@@ -1323,32 +1278,37 @@ def mecanico_dashboard_stats(request):
     Prepara y devuelve las estadísticas y tareas para el dashboard del mecánico.
     """
     user = request.user
-    if not user.groups.filter(name="Mecanico").exists():
+    if not user_has_role(user, "Mecanico"):
         return Response(
             {"error": "Acceso no autorizado"}, status=status.HTTP_403_FORBIDDEN
         )
-    ordenes_activas_count = (
-        Orden.objects.filter(usuario_asignado=user)
-        .exclude(estado=Orden.Estado.FINALIZADO)
-        .count()
+    # Una sola consulta (con el vehículo ya unido) trae las tareas activas;
+    # el KPI de órdenes activas se obtiene de esa misma lista.
+    tareas = list(
+        Orden.objects.activas()
+        .filter(usuario_asignado=user)
+        .select_related("vehiculo")
+        .only(
+            "id",
+            "estado",
+            "descripcion_falla",
+            "fecha_ingreso",
+            "fecha_entrega_estimada",
+            "vehiculo__patente",
+            "vehiculo__marca",
+            "vehiculo__modelo",
+        )
+        .order_by("fecha_ingreso")
     )
     proximas_asignaciones_count = Agendamiento.objects.filter(
         mecanico_asignado=user, estado=Agendamiento.Estado.CONFIRMADO
     ).count()
-    ordenes_activas = (
-        Orden.objects.filter(usuario_asignado=user)
-        .exclude(estado=Orden.Estado.FINALIZADO)
-        .order_by("fecha_ingreso")
-    )
-    ordenes_serializer = OrdenSerializer(
-        ordenes_activas, many=True, context={"request": request}
-    )
     data = {
         "kpis": {
-            "ordenesActivas": ordenes_activas_count,
+            "ordenesActivas": len(tareas),
             "proximasAsignaciones": proximas_asignaciones_count,
         },
-        "tareas": ordenes_serializer.data,
+        "tareas": OrdenTareaSerializer(tareas, many=True).data,
     }
     return Response(data, status=status.HTTP_200_OK)
 
@@ -1472,6 +1432,69 @@ class MecanicoAgendaView(generics.ListAPIView):
         return queryset.order_by("fecha_hora_programada")
 
 
+@api_view(["GET"])
+@permission_classes([IsJefetaller | IsInvitado])
+def disponibilidad_mecanicos(request):
+    """
+    Endpoint [GET] para el tablero de planificación: ocupación de todos los
+    mecánicos (o de ?mecanicos=1,2) entre ?desde y ?hasta (YYYY-MM-DD; por
+    defecto, la semana actual), en una sola respuesta compacta. Cada día es
+    un texto de bloques de 'paso_minutos' desde 'hora_inicio': "1" ocupado,
+    "0" libre.
+    """
+    params = request.query_params
+    hoy = timezone.localdate()
+    try:
+        desde = (
+            datetime.strptime(params["desde"], "%Y-%m-%d").date()
+            if params.get("desde")
+            else hoy - timedelta(days=hoy.weekday())
+        )
+        hasta = (
+            datetime.strptime(params["hasta"], "%Y-%m-%d").date()
+            if params.get("hasta")
+            else desde + timedelta(days=6)
+        )
+        mecanico_ids = [
+            int(valor) for valor in params.get("mecanicos", "").split(",") if valor
+        ]
+    except ValueError:
+        return Response(
+            {"error": "Fechas en formato YYYY-MM-DD; 'mecanicos' deben ser números."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if hasta < desde or (hasta - desde).days >= AGENDA_MAX_DIAS:
+        return Response(
+            {"error": f"El rango debe ser de 1 a {AGENDA_MAX_DIAS} días."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    mecanicos = User.activos.filter(groups__name="Mecanico").order_by("first_name")
+    if mecanico_ids:
+        mecanicos = mecanicos.filter(id__in=mecanico_ids)
+    mecanicos = list(mecanicos.values("id", "first_name", "last_name", "username"))
+
+    matriz = matriz_disponibilidad([m["id"] for m in mecanicos], desde, hasta)
+    return Response(
+        {
+            "desde": desde,
+            "hasta": hasta,
+            "hora_inicio": AGENDA_HORA_INICIO,
+            "hora_fin": AGENDA_HORA_FIN,
+            "paso_minutos": AGENDA_PASO_MINUTOS,
+            "mecanicos": [
+                {
+                    "id": m["id"],
+                    "nombre": f"{m['first_name']} {m['last_name']}".strip()
+                    or m["username"],
+                    "dias": matriz[m["id"]],
+                }
+                for m in mecanicos
+            ],
+        }
+    )
+
+
 class NotificacionViewSet(viewsets.ModelViewSet):
     """
     API para leer, crear y marcar notificaciones como leídas.
@@ -1479,6 +1502,7 @@ class NotificacionViewSet(viewsets.ModelViewSet):
 
     serializer_class = NotificacionSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NotificacionCursorPagination
 
     def get_queryset(self):
         """Filtra notificaciones solo para el usuario logueado."""
@@ -1487,11 +1511,89 @@ class NotificacionViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=["post"], url_path="marcar-como-leidas")
     def marcar_como_leidas(self, request):
         """Acción para marcar todas las notificaciones del usuario como leídas."""
-        Notificacion.objects.filter(usuario=request.user, leida=False).update(
-            leida=True
-        )
+        marcar_como_leidas(request.user)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(detail=False, methods=["get"], url_path="no-leidas")
+    def no_leidas(self, request):
+        """Cantidad de notificaciones no leídas, para el indicador de la campana."""
+        return Response({"no_leidas": contar_no_leidas(request.user)})
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def ticket_eventos(request):
+    """
+    Endpoint [POST] que entrega un ticket de pocos segundos para abrir
+    /eventos/?ticket= o el WebSocket del chat (que no admiten cabeceras),
+    en vez de poner el access token en la URL.
+    """
+    return Response(
+        {
+            "ticket": str(TicketEventos.for_user(request.user)),
+            "expira_en": int(TicketEventos.lifetime.total_seconds()),
+        }
+    )
+
+
+async def eventos_stream(request):
+    """
+    Endpoint [GET] de eventos en tiempo real (Server-Sent Events).
+    Mantiene la conexión abierta y envía al usuario sus nuevas
+    notificaciones y los cambios en sus contadores, en vez de que el
+    frontend los consulte periódicamente. Se abre con ?ticket= (ver
+    ticket_eventos) o con la cabecera Authorization.
+
+    Requiere un servidor ASGI: bajo WSGI (o runserver) Django acumularía
+    el stream infinito y dejaría tomado al worker, así que responde 503 y
+    el frontend sigue consultando periódicamente. La conexión se cierra a
+    los EVENTOS_DURACION_MAX_SEG y el cliente reconecta con otro ticket.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {"error": "El stream de eventos requiere un servidor ASGI."},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+    try:
+        if "ticket" in request.GET:
+            user = await sync_to_async(usuario_desde_ticket)(request.GET["ticket"])
+        else:
+            autenticacion = RolJWTAuthentication()
+            header = autenticacion.get_header(request)
+            raw_token = autenticacion.get_raw_token(header) if header else None
+            if not raw_token:
+                raise InvalidToken("No se entregó un ticket.")
+            validated_token = autenticacion.get_validated_token(raw_token)
+            user = await sync_to_async(autenticacion.get_user)(validated_token)
+    except (InvalidToken, AuthenticationFailed):
+        return JsonResponse(
+            {"error": "Ticket inválido o expirado."},
+            status=status.HTTP_401_UNAUTHORIZED,
+        )
+
+    async def stream():
+        suscripcion = await obtener_broker().suscribir(canal_usuario(user.pk))
+        loop = asyncio.get_running_loop()
+        termino = loop.time() + EVENTOS_DURACION_MAX_SEG
+        try:
+            # Estado inicial, leído después de suscribirse para no perder eventos.
+            no_leidas = await sync_to_async(contar_no_leidas)(user)
+            yield formato_sse({"tipo": "no_leidas", "datos": {"no_leidas": no_leidas}})
+            while loop.time() < termino:
+                evento = await suscripcion.recibir(timeout=EVENTOS_HEARTBEAT_SEG)
+                if evento is None:
+                    # Comentario SSE: mantiene viva la conexión en proxies.
+                    yield ": ping\n\n"
+                else:
+                    yield formato_sse(evento)
+        finally:
+            suscripcion.cancelar()
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
 
 class TallerViewSet(viewsets.ModelViewSet):
     """
@@ -1574,11 +1676,9 @@ class OrdenItemViewSet(viewsets.ModelViewSet):
         Filtra para que cada rol vea lo que le corresponde.
         """
         user = self.request.user
-        if user.groups.filter(
-            name__in=["Jefetaller", "Supervisor", "Repuestos", "Invitado"]
-        ).exists():
+        if user_has_role(user, "Jefetaller", "Supervisor", "Repuestos", "Invitado"):
             return OrdenItem.objects.all()
-        if user.groups.filter(name="Mecanico").exists():
+        if user_has_role(user, "Mecanico"):
             return OrdenItem.objects.filter(solicitado_por=user)
         return OrdenItem.objects.none()
 
@@ -1597,9 +1697,6 @@ class OrdenItemViewSet(viewsets.ModelViewSet):
         item = serializer.save(solicitado_por=self.request.user)
         if item.producto:
             try:
-                usuarios_repuestos = User.objects.filter(
-                    groups__name__in=["Repuestos", "Jefetaller"], is_active=True
-                )
                 mecanico_nombre = (
                     self.request.user.first_name or self.request.user.username
                 )
@@ -1609,15 +1706,12 @@ class OrdenItemViewSet(viewsets.ModelViewSet):
                 )
                 subject = f"Nueva Solicitud de Repuesto: Orden #{item.orden.id}"
 
-                for user_rep in usuarios_repuestos:
-                    Notificacion.objects.create(
-                        usuario=user_rep, mensaje=mensaje, link="/panel-repuestos"
-                    )
-                    thread = threading.Thread(
-                        target=enviar_correo_notificacion,
-                        args=(user_rep, subject, mensaje),
-                    )
-                    thread.start()
+                notificar_roles(
+                    ["Repuestos", "Jefetaller"],
+                    mensaje,
+                    link="/panel-repuestos",
+                    asunto=subject,
+                )
             except Exception as e:
                 print(f"ERROR al notificar a Repuestos: {e}")
 
@@ -1655,10 +1749,14 @@ class OrdenItemViewSet(viewsets.ModelViewSet):
 
         with transaction.atomic():
             if accion == "aprobar":
-                if item.producto.stock < item.cantidad:
+                # No se puede tomar lo reservado para citas de mantenimiento.
+                _, disponible = disponibilidad([item.producto_id], bloquear=True)[
+                    item.producto_id
+                ]
+                if disponible < item.cantidad:
                     return Response(
                         {
-                            "error": f"Stock insuficiente. Solo quedan {item.producto.stock}."
+                            "error": f"Stock insuficiente. Solo quedan {max(disponible, 0)} sin reservar."
                         },
                         status=status.HTTP_400_BAD_REQUEST,
                     )
@@ -1672,16 +1770,12 @@ class OrdenItemViewSet(viewsets.ModelViewSet):
                 item.refresh_from_db()
                 subject_mec = f"Repuesto Aprobado: Orden #{item.orden.id}"
                 mensaje_mec = f"Su solicitud de {item.cantidad}x {item.producto.nombre} fue APROBADA."
-                Notificacion.objects.create(
-                    usuario=item.solicitado_por,
-                    mensaje=mensaje_mec,
+                notificar_usuarios(
+                    [item.solicitado_por],
+                    mensaje_mec,
                     link=f"/ordenes/{item.orden.id}",
+                    asunto=subject_mec,
                 )
-                thread_ap = threading.Thread(
-                    target=enviar_correo_notificacion,
-                    args=(item.solicitado_por, subject_mec, mensaje_mec),
-                )
-                thread_ap.start()
 
             elif accion == "rechazar":
                 item.estado_repuesto = OrdenItem.EstadoRepuesto.RECHAZADO
@@ -1694,18 +1788,13 @@ class OrdenItemViewSet(viewsets.ModelViewSet):
                 item.refresh_from_db()
                 subject_mec = f"Repuesto Rechazado: Orden #{item.orden.id}"
                 mensaje_mec = f"Su solicitud de {item.cantidad}x {item.producto.nombre} fue RECHAZADA. Motivo: {item.motivo_gestion}"
-                Notificacion.objects.create(
-                    usuario=item.solicitado_por,
-                    mensaje=mensaje_mec,
+                notificar_usuarios(
+                    [item.solicitado_por],
+                    mensaje_mec,
                     link=f"/ordenes/{item.orden.id}",
+                    asunto=subject_mec,
                 )
 
-                thread_rec = threading.Thread(
-                    target=enviar_correo_notificacion,
-                    args=(item.solicitado_por, subject_mec, mensaje_mec),
-                )
-                thread_rec.start()
-
         return Response(self.get_serializer(item).data, status=status.HTTP_200_OK)
 
 
@@ -1890,6 +1979,7 @@ class PrestamoLlaveViewSet(viewsets.ReadOnlyModelViewSet):
     )
     serializer_class = PrestamoLlaveSerializer
     permission_classes = [IsControlLlaves | IsInvitado]
+    pagination_class = PrestamoLlaveCursorPagination
 
     filter_backends = [filters.SearchFilter]
     search_fields = [
@@ -1940,6 +2030,7 @@ class LlaveHistorialEstadoViewSet(viewsets.ReadOnlyModelViewSet):
     )
     serializer_class = LlaveHistorialEstadoSerializer
     permission_classes = [IsControlLlaves | IsInvitado]
+    pagination_class = LlaveHistorialEstadoCursorPagination
 
     filter_backends = [filters.SearchFilter]
 
@@ -1958,6 +2049,7 @@ class HistorialSeguridadViewSet(viewsets.ReadOnlyModelViewSet):
 
     serializer_class = HistorialSeguridadSerializer
     permission_classes = [IsJefetallerOrSeguridad | IsInvitado]
+    pagination_class = OrdenCursorPagination
 
     filter_backends = [filters.SearchFilter]
 
@@ -2978,28 +3070,15 @@ class ChatRoomListView(generics.ListCreateAPIView):
         except User.DoesNotExist:
             raise serializers.ValidationError("El usuario no existe.")
 
-        existing_room = (
-            ChatRoom.objects.annotate(num_p=Count("participantes"))
-            .filter(num_p=2, participantes=current_user)
-            .filter(participantes=other_user)
-            .first()
-        )
-
-        if existing_room:
-
-            if current_user in existing_room.oculto_para.all():
-                existing_room.oculto_para.remove(current_user)
-
-            room_serializer = ChatRoomSerializer(existing_room)
-            return Response(room_serializer.data, status=status.HTTP_200_OK)
+        room, creada = obtener_o_crear_sala_directa(current_user, other_user)
+        if not creada:
+            room.oculto_para.remove(current_user)
 
-        new_room = ChatRoom.objects.create(
-            nombre=f"Chat entre {current_user.get_full_name()} y {other_user.get_full_name()}"
+        room_serializer = ChatRoomSerializer(room)
+        return Response(
+            room_serializer.data,
+            status=status.HTTP_201_CREATED if creada else status.HTTP_200_OK,
         )
-        new_room.participantes.add(current_user, other_user)
-
-        room_serializer = ChatRoomSerializer(new_room)
-        return Response(room_serializer.data, status=status.HTTP_201_CREATED)
 
 
 from rest_framework.parsers import MultiPartParser, FormParser
@@ -3018,33 +3097,55 @@ class ChatMessageListView(generics.ListCreateAPIView):
     parser_classes = [MultiPartParser, FormParser]
 
     def get_queryset(self):
-        """
-        Filtra los mensajes para una sala específica.
-        También actualiza el 'leido_por' del usuario.
-        """
+        """Filtra los mensajes para una sala específica."""
         room_id = self.kwargs.get("room_id")
         user = self.request.user
 
         if not user.chat_rooms.filter(id=room_id).exists():
             raise serializers.ValidationError("No tienes permiso para ver esta sala.")
 
-        queryset = ChatMessage.objects.filter(room_id=room_id)
+        return ChatMessage.objects.filter(room_id=room_id)
 
-        since_timestamp = self.request.query_params.get("since")
-        if since_timestamp:
-            try:
-
-                queryset = queryset.filter(creado_en__gt=since_timestamp)
-            except (ValueError, TypeError):
-                pass
+    def list(self, request, *args, **kwargs):
+        """
+        Devuelve una página de mensajes, paginada por id de mensaje:
+        - sin parámetros: los últimos 'page_size' mensajes;
+        - ?before=<id>: los anteriores a ese mensaje (historial);
+        - ?after=<id>: los posteriores a ese mensaje (mensajes nuevos).
+        Los autores se envían una sola vez por página, en 'autores'.
+        Es solo lectura: la lectura se confirma con POST .../leido/.
+        """
+        params = request.query_params
+        try:
+            antes = int(params["before"]) if params.get("before") else None
+            despues = int(params["after"]) if params.get("after") else None
+            page_size = int(params.get("page_size", CHAT_PAGE_SIZE))
+        except ValueError:
+            return Response(
+                {"error": "'before', 'after' y 'page_size' deben ser números."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        page_size = max(1, min(page_size, CHAT_MAX_PAGE_SIZE))
 
-        mensajes_no_leidos = queryset.exclude(leido_por=user).values_list(
-            "id", flat=True
+        mensajes, hay_mas = pagina_mensajes(
+            self.get_queryset(), antes=antes, despues=despues, limite=page_size
+        )
+        autores = (
+            User.objects.filter(id__in={m.autor_id for m in mensajes if m.autor_id})
+            .prefetch_related("groups")
+            .order_by("id")
         )
-        if mensajes_no_leidos:
-            user.mensajes_leidos.add(*mensajes_no_leidos)
 
-        return queryset.order_by("creado_en")
+        context = self.get_serializer_context()
+        return Response(
+            {
+                "mensajes": ChatMensajeSerializer(
+                    mensajes, many=True, context=context
+                ).data,
+                "autores": ChatAutorSerializer(autores, many=True).data,
+                "hay_mas": hay_mas,
+            }
+        )
 
     def perform_create(self, serializer):
         """
@@ -3065,12 +3166,26 @@ class ChatMessageListView(generics.ListCreateAPIView):
         mensaje = serializer.save(autor=user, room=room)
 
         room.save()
-        mensaje.leido_por.add(user)
+        marcar_leido(room.id, user.pk, mensaje.id)
         room.oculto_para.clear()
+        # 'anterior' (el mensaje previo de la sala) le permite al cliente
+        # notar que se perdió algo y pedirlo antes de confirmar la lectura.
+        publicar_en_sala(
+            room.id,
+            "mensaje",
+            {
+                "mensaje": ChatMensajeSerializer(
+                    mensaje, context=self.get_serializer_context()
+                ).data,
+                "autor": ChatAutorSerializer(user).data,
+                "anterior": ChatMessage.objects.filter(room=room, id__lt=mensaje.id)
+                .order_by("-id")
+                .values_list("id", flat=True)
+                .first(),
+            },
+        )
 
         try:
-            destinatarios = room.participantes.exclude(id=user.id)
-
             subject = f"Nuevo mensaje en el chat de {user.first_name}"
 
             if mensaje.archivo and not mensaje.contenido:
@@ -3088,23 +3203,48 @@ class ChatMessageListView(generics.ListCreateAPIView):
                     f"Chat de {user.first_name}: {mensaje.contenido[:50]}..."
                 )
 
-            for destinatario in destinatarios:
-                Notificacion.objects.create(
-                    usuario=destinatario,
-                    mensaje=mensaje_notificacion,
-                    link="/chat",
-                )
-                if destinatario.email:
-                    thread = threading.Thread(
-                        target=enviar_correo_notificacion,
-                        args=(destinatario, subject, message_body),
-                    )
-                    thread.start()
+            destinatarios = list(room.participantes.exclude(id=user.id))
+            notificar_usuarios(
+                destinatarios,
+                mensaje_notificacion,
+                link="/chat",
+                asunto=subject,
+                cuerpo_correo=message_body,
+            )
+            publicar_a_usuarios(
+                [destinatario.pk for destinatario in destinatarios],
+                "chat",
+                {"room": room.id},
+            )
 
         except Exception as e:
             print(f"ERROR al enviar email y notificación de chat: {e}")
 
 
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def marcar_chat_leido(request, room_id):
+    """
+    Endpoint [POST] para confirmar la lectura de una sala de chat.
+    Body opcional: {"hasta": <id del último mensaje visto>}; sin él, se
+    marca como leída la sala completa. Es un solo UPDATE sobre la marca de
+    lectura del usuario (si no participa de la sala, no hay nada que marcar).
+    """
+    hasta = request.data.get("hasta")
+    if hasta is not None:
+        try:
+            hasta = int(hasta)
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "'hasta' debe ser un id de mensaje."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+    if marcar_leido(room_id, request.user.pk, hasta):
+        publicar_a_usuarios([request.user.pk], "chat", {"room": room_id})
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def unread_chat_count(request):
@@ -3113,16 +3253,73 @@ def unread_chat_count(request):
     """
     user = request.user
 
-    count = (
-        ChatMessage.objects.filter(room__participantes=user)
-        .exclude(autor=user)
-        .exclude(leido_por=user)
-        .count()
-    )
+    count = contar_no_leidos(user)
 
     return Response({"unread_count": count}, status=status.HTTP_200_OK)
 
 
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def buscar_mensajes_chat(request):
+    """
+    Endpoint [GET] de búsqueda en el historial del chat, solo en las salas
+    del usuario. Parámetros: ?q=<palabras> (obligatorio), ?room=<id> para
+    buscar en una sola sala y ?before=<id> para la página siguiente.
+    Devuelve los mensajes del más reciente al más antiguo, con los autores
+    una sola vez, igual que el historial de una sala.
+    """
+    params = request.query_params
+    consulta = params.get("q", "").strip()
+    if not consulta:
+        return Response(
+            {"error": "Debe indicar el texto a buscar en 'q'."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    try:
+        room_id = int(params["room"]) if params.get("room") else None
+        antes = int(params["before"]) if params.get("before") else None
+        page_size = int(params.get("page_size", CHAT_PAGE_SIZE))
+    except ValueError:
+        return Response(
+            {"error": "'room', 'before' y 'page_size' deben ser números."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    page_size = max(1, min(page_size, CHAT_MAX_PAGE_SIZE))
+
+    mensajes, hay_mas = buscar_mensajes(
+        request.user, consulta, room_id=room_id, antes=antes, limite=page_size
+    )
+    autores = (
+        User.objects.filter(id__in={m.autor_id for m in mensajes if m.autor_id})
+        .prefetch_related("groups")
+        .order_by("id")
+    )
+    context = {"request": request}
+    return Response(
+        {
+            "mensajes": ChatMensajeSerializer(
+                mensajes, many=True, context=context
+            ).data,
+            "autores": ChatAutorSerializer(autores, many=True).data,
+            "hay_mas": hay_mas,
+        }
+    )
+
+
+class ChatBandejaView(generics.ListAPIView):
+    """
+    Endpoint [GET] de bandeja de entrada del chat: cada sala visible con
+    sus participantes, el último mensaje y sus no leídos, en un número
+    fijo de consultas.
+    """
+
+    permission_classes = [IsAuthenticated]
+    serializer_class = ChatBandejaSerializer
+
+    def get_queryset(self):
+        return bandeja_salas(self.request.user)
+
+
 class ChatRoomDetailView(generics.DestroyAPIView):
     """
     Endpoint [DELETE] para eliminar (o abandonar) una sala de chat.
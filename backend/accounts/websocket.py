@@ -0,0 +1,115 @@
+"""
+Canal WebSocket por sala de chat (ASGI puro, sin dependencias extra).
+
+El cliente abre ws://.../api/v1/ws/chat/<room_id>/?ticket=<ticket> (ver
+ticket_eventos en views.py) y recibe,
+como JSON, cada mensaje que se crea en la sala. Enviar mensajes sigue
+siendo por POST (que guarda, notifica y admite archivos); al guardarse,
+la vista publica el mensaje en el canal "sala:<id>" del mismo broker que
+usan los eventos SSE (ver eventos.py), así que cambiar EVENTOS_BROKER
+cambia también el transporte del chat.
+
+La pertenencia a la sala se comprueba al conectar y otra vez cada vez que
+cambian sus participantes (evento "participantes", que no se reenvía al
+cliente): quien sale de la sala deja de recibir sus mensajes.
+"""
+
+import asyncio
+import json
+import re
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from .authentication import usuario_desde_ticket
+from .eventos import EVENTOS_HEARTBEAT_SEG, canal_sala, obtener_broker
+from .models import ChatRoom
+
+RUTA_CHAT = re.compile(r"^/api/v1/ws/chat/(?P<room_id>\d+)/?$")
+
+# Códigos de cierre propios (rango 4000-4999 reservado a la aplicación).
+CIERRE_NO_AUTENTICADO = 4401
+CIERRE_SIN_ACCESO = 4403
+CIERRE_NO_ENCONTRADO = 4404
+
+
+def _es_participante(room_id, usuario):
+    return ChatRoom.objects.filter(pk=room_id, participantes=usuario).exists()
+
+
+async def _esperar_desconexion(receive):
+    """Consume lo que envíe el cliente (se ignora) hasta que se desconecte."""
+    while True:
+        mensaje = await receive()
+        if mensaje["type"] == "websocket.disconnect":
+            return
+
+
+async def _rechazar(send, codigo):
+    """
+    Acepta y cierra de inmediato con 'codigo': un cierre antes de aceptar
+    llega al navegador como 1006 y el cliente no sabría que no debe
+    reintentar.
+    """
+    await send({"type": "websocket.accept"})
+    await send({"type": "websocket.close", "code": codigo})
+
+
+async def chat_websocket(scope, receive, send):
+    """Aplicación ASGI para las conexiones 'websocket'."""
+    coincidencia = RUTA_CHAT.match(scope["path"])
+
+    conexion = await receive()
+    if conexion["type"] != "websocket.connect":
+        return
+    if coincidencia is None:
+        await _rechazar(send, CIERRE_NO_ENCONTRADO)
+        return
+
+    room_id = int(coincidencia["room_id"])
+    parametros = parse_qs(scope.get("query_string", b"").decode())
+    raw_ticket = (parametros.get("ticket") or [None])[0]
+    try:
+        usuario = await sync_to_async(usuario_desde_ticket)(raw_ticket)
+    except (InvalidToken, AuthenticationFailed):
+        await _rechazar(send, CIERRE_NO_AUTENTICADO)
+        return
+
+    if not await sync_to_async(_es_participante)(room_id, usuario):
+        await _rechazar(send, CIERRE_SIN_ACCESO)
+        return
+
+    # Se suscribe antes de aceptar para no perder mensajes de la conexión.
+    suscripcion = await obtener_broker().suscribir(canal_sala(room_id))
+    desconexion = asyncio.ensure_future(_esperar_desconexion(receive))
+    try:
+        await send({"type": "websocket.accept"})
+        while not desconexion.done():
+            siguiente = asyncio.ensure_future(
+                suscripcion.recibir(timeout=EVENTOS_HEARTBEAT_SEG)
+            )
+            await asyncio.wait(
+                {siguiente, desconexion}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not siguiente.done():
+                siguiente.cancel()
+                break
+            evento = siguiente.result()
+            if evento is None:
+                continue
+            if evento["tipo"] == "participantes":
+                if not await sync_to_async(_es_participante)(room_id, usuario):
+                    await send({"type": "websocket.close", "code": CIERRE_SIN_ACCESO})
+                    break
+            else:
+                await send(
+                    {
+                        "type": "websocket.send",
+                        "text": json.dumps(evento, cls=DjangoJSONEncoder),
+                    }
+                )
+    finally:
+        suscripcion.cancelar()
+        desconexion.cancel()
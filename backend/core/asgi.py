@@ -13,4 +13,19 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from accounts.eventos import obtener_broker  # noqa: E402  (requiere Django configurado)
+from accounts.websocket import chat_websocket  # noqa: E402
+
+# Se crea al arrancar: con varios procesos y sin Redis falla aquí y no
+# cuando se conecta el primer cliente.
+obtener_broker()
+
+
+async def application(scope, receive, send):
+    """HTTP lo atiende Django; las conexiones WebSocket, el chat en tiempo real."""
+    if scope["type"] == "websocket":
+        await chat_websocket(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
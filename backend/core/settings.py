@@ -133,7 +133,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # -----------------------------
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.RolJWTAuthentication',
     ),
 }
 
@@ -173,6 +173,7 @@ SIMPLE_JWT = {
     'SIGNING_KEY': SECRET_KEY,
     'AUTH_HEADER_TYPES': ('Bearer',),
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.tokens.RolTokenRefreshSerializer',
 }
 
 
@@ -184,7 +185,9 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # CONFIGURACIÓN DE CORREO ELECTRÓNICO (SendGrid / Consola)
 # ----------------------------------------------------------------------
 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_BACKEND = config(
+    'EMAIL_BACKEND', default='django.core.mail.backends.smtp.EmailBackend'
+)
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
@@ -192,4 +195,40 @@ EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='joseyenid2@gmail.com')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD') 
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+# Bandeja de salida de correos (accounts/correos.py, comando 'procesar_correos')
+EMAIL_LOTE_MAXIMO = config('EMAIL_LOTE_MAXIMO', default=50, cast=int)
+EMAIL_MAX_INTENTOS = config('EMAIL_MAX_INTENTOS', default=6, cast=int)
+EMAIL_REINTENTO_BASE_SEG = config('EMAIL_REINTENTO_BASE_SEG', default=30, cast=int)
+EMAIL_REINTENTO_MAX_SEG = config('EMAIL_REINTENTO_MAX_SEG', default=3600, cast=int)
+EMAIL_WORKERS = config('EMAIL_WORKERS', default=2, cast=int)
+EMAIL_RECLAMO_SEG = config('EMAIL_RECLAMO_SEG', default=300, cast=int)
+# Solo para desarrollo y pruebas: si se define, todos los correos se envían
+# a esta dirección en vez de al email de cada usuario.
+EMAIL_DESTINATARIO_PRUEBA = config('EMAIL_DESTINATARIO_PRUEBA', default='')
+
+# Eventos en tiempo real (SSE y WebSocket del chat, accounts/eventos.py).
+# Necesitan un servidor ASGI (ver PASOS.txt). Con EVENTOS_REDIS_URL los
+# eventos viajan por Redis y llegan a las conexiones de todos los procesos;
+# sin Redis el broker es en memoria y solo sirve con un único proceso: si
+# WEB_CONCURRENCY (los workers de uvicorn) es mayor que 1, no arranca.
+EVENTOS_REDIS_URL = config('EVENTOS_REDIS_URL', default='')
+EVENTOS_BROKER = config(
+    'EVENTOS_BROKER',
+    default='accounts.eventos.BrokerRedis' if EVENTOS_REDIS_URL else 'accounts.eventos.BrokerEnMemoria'
+)
+EVENTOS_PROCESOS = config('WEB_CONCURRENCY', default=1, cast=int)
+EVENTOS_HEARTBEAT_SEG = config('EVENTOS_HEARTBEAT_SEG', default=20, cast=int)
+# Vigencia del ticket con que se abre el stream o el WebSocket, y duración
+# máxima de una conexión (luego el cliente reconecta con un ticket nuevo).
+EVENTOS_TICKET_SEG = config('EVENTOS_TICKET_SEG', default=60, cast=int)
+EVENTOS_DURACION_MAX_SEG = config('EVENTOS_DURACION_MAX_SEG', default=900, cast=int)
+
+# Horario de atención y grilla de horarios sugeridos (accounts/agenda.py)
+AGENDA_HORA_INICIO = config('AGENDA_HORA_INICIO', default=9, cast=int)
+AGENDA_HORA_FIN = config('AGENDA_HORA_FIN', default=19, cast=int)
+AGENDA_PASO_MINUTOS = config('AGENDA_PASO_MINUTOS', default=30, cast=int)
+
+# Días que se conservan las notificaciones ya leídas (comando 'depurar_notificaciones')
+NOTIFICACIONES_RETENCION_DIAS = config('NOTIFICACIONES_RETENCION_DIAS', default=90, cast=int)
+
 PASSWORD_RESET_TIMEOUT = 1800
\ No newline at end of file
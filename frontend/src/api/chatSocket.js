@@ -0,0 +1,83 @@
+import apiClient from './axios';
+import { useUserStore } from '../store/authStore';
+
+// WebSocket por sala de chat: el servidor empuja cada mensaje nuevo en
+// cuanto se guarda, en vez de que la ventana consulte cada pocos segundos.
+
+const baseURL = import.meta.env.VITE_API_URL || 'http://127.0.0.1:8000/api/v1';
+const wsBaseURL = baseURL.replace(/^http/, 'ws');
+
+const REINTENTO_MAX_MS = 30000;
+// Cierres en los que no tiene sentido reintentar (ver accounts/websocket.py);
+// 4403 también llega si el usuario sale de la sala con el canal abierto.
+const CIERRES_DEFINITIVOS = [4401, 4403, 4404];
+// Intentos fallidos seguidos, sin haber abierto nunca, tras los que se da
+// por hecho que el servidor no atiende WebSocket (p. ej. WSGI).
+const FALLOS_SIN_ABRIR_MAX = 5;
+
+/**
+ * Abre el canal de una sala. 'onMensaje' recibe { mensaje, autor, anterior }
+ * por cada mensaje nuevo ('anterior' es el id del mensaje previo de la sala,
+ * para detectar huecos); 'onAbierto' se llama en cada (re)conexión, útil
+ * para pedir lo que llegó mientras estaba desconectado, y 'onCaido' cada
+ * vez que el canal no está disponible, para que la ventana consulte
+ * periódicamente mientras tanto. Devuelve la función que cierra el canal.
+ */
+export function conectarSalaChat(roomId, { onMensaje, onAbierto, onCaido }) {
+  let socket = null;
+  let reintento = null;
+  let espera = 1000;
+  let cerrado = false;
+  let abrioAlgunaVez = false;
+  let fallosSeguidos = 0;
+
+  const reintentar = () => {
+    onCaido?.();
+    fallosSeguidos += 1;
+    if (!abrioAlgunaVez && fallosSeguidos >= FALLOS_SIN_ABRIR_MAX) return;
+    reintento = setTimeout(abrir, espera);
+    espera = Math.min(espera * 2, REINTENTO_MAX_MS);
+  };
+
+  const abrir = async () => {
+    if (!useUserStore.getState().token || cerrado) return;
+
+    // Ticket de pocos segundos en vez del access token en la URL.
+    let ticket;
+    try {
+      const response = await apiClient.post('/eventos/ticket/');
+      ticket = response.data.ticket;
+    } catch {
+      if (!cerrado) reintentar();
+      return;
+    }
+    if (cerrado) return;
+
+    socket = new WebSocket(`${wsBaseURL}/ws/chat/${roomId}/?ticket=${encodeURIComponent(ticket)}`);
+
+    socket.onopen = () => {
+      espera = 1000;
+      abrioAlgunaVez = true;
+      fallosSeguidos = 0;
+      onAbierto?.();
+    };
+
+    socket.onmessage = (event) => {
+      const evento = JSON.parse(event.data);
+      if (evento.tipo === 'mensaje') onMensaje(evento.datos);
+    };
+
+    socket.onclose = (event) => {
+      if (cerrado || CIERRES_DEFINITIVOS.includes(event.code)) return;
+      reintentar();
+    };
+  };
+
+  abrir();
+
+  return () => {
+    cerrado = true;
+    clearTimeout(reintento);
+    if (socket) socket.close();
+  };
+}
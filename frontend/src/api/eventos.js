@@ -0,0 +1,126 @@
+import apiClient from './axios';
+import { useUserStore } from '../store/authStore';
+
+// Una sola conexión SSE por pestaña, compartida por todos los componentes.
+// El servidor empuja los eventos ('notificacion', 'no_leidas', 'chat'),
+// así que una pestaña inactiva no genera peticiones periódicas.
+// Si el stream no está disponible (servidor WSGI, proxy que lo corta, red
+// caída) se vuelve a consultar cada 30 segundos mientras se reintenta.
+
+const baseURL = import.meta.env.VITE_API_URL || 'http://127.0.0.1:8000/api/v1';
+
+const TIPOS = ['notificacion', 'no_leidas', 'chat'];
+const SONDEO_MS = 30000;
+const REINTENTO_MAX_MS = 5 * 60 * 1000;
+
+let source = null;
+let sesion = null;
+let reintento = null;
+let sondeo = null;
+let espera = 1000;
+const listeners = new Map();
+
+function emitir(tipo, datos) {
+  (listeners.get(tipo) || []).forEach((callback) => callback(datos));
+}
+
+function hayListeners() {
+  return [...listeners.values()].some((callbacks) => callbacks.size > 0);
+}
+
+function iniciarSondeo() {
+  if (sondeo) return;
+  emitir('sincronizar');
+  sondeo = setInterval(() => emitir('sincronizar'), SONDEO_MS);
+}
+
+function detenerSondeo() {
+  clearInterval(sondeo);
+  sondeo = null;
+}
+
+function cerrarConexion() {
+  clearTimeout(reintento);
+  reintento = null;
+  if (source) source.close();
+  source = null;
+}
+
+function reintentar() {
+  iniciarSondeo();
+  clearTimeout(reintento);
+  reintento = setTimeout(conectar, espera);
+  espera = Math.min(espera * 2, REINTENTO_MAX_MS);
+}
+
+async function conectar() {
+  const token = useUserStore.getState().token;
+  if (!token || !hayListeners()) return;
+  cerrarConexion();
+  sesion = token;
+
+  // El stream no admite cabeceras: se abre con un ticket de pocos segundos
+  // en vez de poner el access token en la URL.
+  let ticket;
+  try {
+    const response = await apiClient.post('/eventos/ticket/');
+    ticket = response.data.ticket;
+  } catch {
+    if (sesion === token) reintentar();
+    return;
+  }
+  if (sesion !== token || source || !hayListeners()) return;
+
+  source = new EventSource(`${baseURL}/eventos/?ticket=${encodeURIComponent(ticket)}`);
+  TIPOS.forEach((tipo) => {
+    source.addEventListener(tipo, (event) => emitir(tipo, JSON.parse(event.data)));
+  });
+  source.onopen = () => {
+    espera = 1000;
+    detenerSondeo();
+    emitir('sincronizar');
+  };
+  // El ticket ya no sirve para que EventSource reconecte por su cuenta:
+  // se cierra y se vuelve a abrir con uno nuevo.
+  source.onerror = () => {
+    source.close();
+    source = null;
+    reintentar();
+  };
+}
+
+function desconectar() {
+  cerrarConexion();
+  detenerSondeo();
+  sesion = null;
+  espera = 1000;
+}
+
+/**
+ * Se suscribe a un tipo de evento. 'sincronizar' se dispara en cada
+ * (re)conexión y en cada consulta periódica mientras no hay stream, para
+ * volver a leer el estado que se pudo perder. Devuelve la función para
+ * anular la suscripción.
+ */
+export function suscribirEventos(tipo, callback) {
+  if (!listeners.has(tipo)) listeners.set(tipo, new Set());
+  listeners.get(tipo).add(callback);
+
+  if (!source && !reintento && sesion !== useUserStore.getState().token) conectar();
+  if (sondeo && tipo === 'sincronizar') callback();
+
+  return () => {
+    listeners.get(tipo).delete(callback);
+    if (!hayListeners()) desconectar();
+  };
+}
+
+// Si cambia la sesión (login / logout / token nuevo) se rehace la conexión.
+useUserStore.subscribe((state) => {
+  if (!state.token) {
+    desconectar();
+  } else if (state.token !== sesion && hayListeners()) {
+    espera = 1000;
+    conectar();
+  }
+});
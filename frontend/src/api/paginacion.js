@@ -0,0 +1,26 @@
+import apiClient from './axios';
+
+// Los listados de la API vienen paginados por cursor: { next, previous, results }.
+
+/**
+ * Pide una página. Devuelve { resultados, siguiente }, donde 'siguiente'
+ * es la URL de la próxima página (ya incluye los filtros) o null.
+ */
+export async function obtenerPagina(url, config) {
+  const { data } = await apiClient.get(url, config);
+  return { resultados: data.results, siguiente: data.next };
+}
+
+/**
+ * Recorre todas las páginas. Solo para consultas que el servidor ya acota
+ * (p. ej. ?estado__ne=Finalizado), nunca para un historial completo.
+ */
+export async function obtenerTodas(url, config) {
+  let { resultados, siguiente } = await obtenerPagina(url, config);
+  while (siguiente) {
+    const pagina = await obtenerPagina(siguiente);
+    resultados = resultados.concat(pagina.resultados);
+    siguiente = pagina.siguiente;
+  }
+  return resultados;
+}
@@ -104,7 +104,18 @@ export default function ChatSidebar({ rooms, currentUser, onSelectRoom, selected
                         className={`${styles.roomItem} ${room.id === selectedRoomId ? styles.active : ''}`}
                         onClick={() => onSelectRoom(room.id)}
                     >
-                        <span>{getRoomName(room)}</span>
+                        <div className={styles.roomInfo}>
+                            <span>{getRoomName(room)}</span>
+                            {room.ultimo_mensaje && (
+                                <small className={styles.roomPreview}>
+                                    {room.ultimo_mensaje.contenido || (room.ultimo_mensaje.tiene_archivo ? 'Archivo adjunto' : '')}
+                                </small>
+                            )}
+                        </div>
+
+                        {room.no_leidos > 0 && room.id !== selectedRoomId && (
+                            <span className={styles.unreadBadge}>{room.no_leidos}</span>
+                        )}
                         
                         <button 
                             className={styles.deleteRoomButton}
@@ -1,5 +1,6 @@
 import React, { useState, useEffect, useRef } from 'react';
 import apiClient from '../../api/axios.js';
+import { conectarSalaChat } from '../../api/chatSocket.js';
 import styles from '../../css/chat.module.css';
 import { Send, MessageSquare, Paperclip, XCircle, ArrowLeft } from 'lucide-react';
 import AuthenticatedImage from '../AuthenticatedImage';
@@ -29,63 +30,132 @@ export default function ChatWindow({ roomId, currentUser, chatName, onBack }) {
     ].join(',');
 
     const textInputRef = useRef(null);
-    const lastFetchTimestamp = useRef(null);
+    const lastMessageId = useRef(null);
+    const lastAckedId = useRef(null);
+    const salaActual = useRef(roomId);
+    const SONDEO_MS = 5000;
+    const [hasOlder, setHasOlder] = useState(false);
 
     const scrollToBottom = () => {
         messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
     };
 
+    // La API envía los autores una sola vez por página; se vuelven a
+    // asociar a cada mensaje para el render.
+    const withAuthors = (data) => {
+        const autores = Object.fromEntries(data.autores.map(a => [a.id, a]));
+        return data.mensajes.map(m => ({ ...m, autor: autores[m.autor] || null }));
+    };
+
+    // Une mensajes por id: el socket, la carga inicial y las consultas de
+    // recuperación pueden traer los mismos mensajes en cualquier orden.
+    const mergeMessages = (prev, nuevos) => {
+        const porId = new Map(prev.map(m => [m.id, m]));
+        nuevos.forEach(m => porId.set(m.id, m));
+        return [...porId.values()].sort((a, b) => a.id - b.id);
+    };
+
+    // Confirma la lectura explícitamente (el GET de mensajes no escribe nada).
+    // Solo se llama cuando llegaron mensajes nuevos, no en cada consulta.
+    const acknowledgeRead = async (ultimoId) => {
+        if (lastAckedId.current !== null && ultimoId <= lastAckedId.current) return;
+        lastAckedId.current = ultimoId;
+        try {
+            await apiClient.post(`/chat/rooms/${roomId}/leido/`, { hasta: ultimoId });
+        } catch (error) {
+            console.error("Error al marcar mensajes como leídos:", error);
+        }
+    };
+
     const fetchMessages = async (mode = 'replace') => {
         if (!roomId) return;
         if (mode === 'replace') setIsLoading(true);
         
         let url = `/chat/rooms/${roomId}/messages/`;
-        if (mode === 'append' && lastFetchTimestamp.current) {
-            url += `?since=${lastFetchTimestamp.current}`;
+        if (mode === 'append' && lastMessageId.current) {
+            url += `?after=${lastMessageId.current}`;
+        } else if (mode === 'older' && messages.length > 0) {
+            url += `?before=${messages[0].id}`;
         }
 
         try {
             const response = await apiClient.get(url);
-            const newMessages = response.data.results || response.data;
+            if (salaActual.current !== roomId) return;
+            const newMessages = withAuthors(response.data);
 
+            if (mode !== 'append') {
+                setHasOlder(response.data.hay_mas);
+            }
             if (newMessages.length > 0) {
-                lastFetchTimestamp.current = newMessages[newMessages.length - 1].creado_en;
-                if (mode === 'replace') {
-                    setMessages(newMessages);
-                } else if (mode === 'append') {
-                    setMessages(prev => [
-                        ...prev,
-                        ...newMessages.filter(nm => !prev.find(pm => pm.id === nm.id))
-                    ]);
-                }
-            } else if (mode === 'replace') {
-                 setMessages([]);
+                setMessages(prev => mergeMessages(prev, newMessages));
+                if (mode === 'older') return;
+                // 'lastMessageId' es el último mensaje sin huecos antes que él:
+                // lo avanzan las consultas y los mensajes del socket que
+                // empalman con él (ver onMensaje).
+                const ultimoId = newMessages[newMessages.length - 1].id;
+                lastMessageId.current = Math.max(lastMessageId.current ?? 0, ultimoId);
+                acknowledgeRead(lastMessageId.current);
+                // Un hueco puede ser más largo que una página.
+                if (mode === 'append' && response.data.hay_mas) await fetchMessages('append');
             }
         } catch (error) {
             console.error("Error al cargar mensajes:", error);
-            setErrorModal({ isOpen: true, message: "No se pudieron cargar los mensajes." });
+            // Las consultas de recuperación se repiten solas: sin modal.
+            if (mode !== 'append') {
+                setErrorModal({ isOpen: true, message: "No se pudieron cargar los mensajes." });
+            }
         } finally {
             if (mode === 'replace') setIsLoading(false);
         }
     };
 
     useEffect(() => {
+        salaActual.current = roomId;
+        setMessages([]);
+        lastMessageId.current = null;
+        lastAckedId.current = null;
         if (roomId) {
-            lastFetchTimestamp.current = null;
             fetchMessages('replace');
-            const interval = setInterval(() => {
-                fetchMessages('append');
-            }, 5000); 
-            return () => clearInterval(interval);
-        } else {
-            setMessages([]);
-            lastFetchTimestamp.current = null;
+            // Los mensajes nuevos llegan por WebSocket; en cada apertura se
+            // piden los que hayan llegado desde el último conocido, y
+            // mientras el canal está caído se consulta cada pocos segundos.
+            let sondeo = null;
+            const detenerSondeo = () => {
+                clearInterval(sondeo);
+                sondeo = null;
+            };
+            const cerrarCanal = conectarSalaChat(roomId, {
+                onAbierto: () => {
+                    detenerSondeo();
+                    fetchMessages('append');
+                },
+                onCaido: () => {
+                    if (!sondeo) sondeo = setInterval(() => fetchMessages('append'), SONDEO_MS);
+                },
+                onMensaje: ({ mensaje, autor, anterior }) => {
+                    setMessages(prev => mergeMessages(prev, [{ ...mensaje, autor }]));
+                    if (anterior !== (lastMessageId.current ?? null)) {
+                        // Falta algo entre lo último conocido y este mensaje:
+                        // no se confirma la lectura hasta traer el hueco (la
+                        // consulta la confirma al terminar).
+                        fetchMessages('append');
+                        return;
+                    }
+                    lastMessageId.current = mensaje.id;
+                    if (autor?.username !== currentUser.username) acknowledgeRead(mensaje.id);
+                },
+            });
+            return () => {
+                detenerSondeo();
+                cerrarCanal();
+            };
         }
     }, [roomId]); 
 
+    const newestId = messages.length > 0 ? messages[messages.length - 1].id : null;
     useEffect(() => {
         scrollToBottom();
-    }, [messages]); 
+    }, [newestId]); 
 
     const handleSend = async (e) => {
         e.preventDefault();
@@ -209,6 +279,12 @@ export default function ChatWindow({ roomId, currentUser, chatName, onBack }) {
 
             <div className={styles.messagesContainer}>
                 {isLoading && messages.length === 0 && <p style={{textAlign:'center', color:'#9ca3af'}}>Cargando mensajes...</p>}
+
+                {hasOlder && (
+                    <button type="button" className={styles.loadOlderButton} onClick={() => fetchMessages('older')}>
+                        Cargar mensajes anteriores
+                    </button>
+                )}
                 
                 {messages.map(msg => {
                     const isImage = msg.archivo && (
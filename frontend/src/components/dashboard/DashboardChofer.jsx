@@ -1,5 +1,6 @@
 import React, { useState, useEffect, useMemo } from 'react';
 import apiClient from '../../api/axios.js';
+import { obtenerTodas } from '../../api/paginacion.js';
 import styles from '../../css/dashboardchofer.module.css'; // Estilos principales
 // --- ¡AQUÍ ESTÁ LA CORRECCIÓN! ---
 import detailStyles from '../../css/modalchofer-verdetalle.module.css';
@@ -273,8 +274,7 @@ export default function DashboardChofer() {
     useEffect(() => {
         const fetchOrdenes = async () => {
             try {
-                const response = await apiClient.get('/ordenes/');
-                const activas = (response.data.results || response.data).filter(o => o.estado !== 'Finalizado');
+                const activas = await obtenerTodas('/ordenes/?estado__ne=Finalizado');
                 setOrdenesActivas(activas);
             } catch (err) {
                 setError('No se pudo cargar el estado de tus vehículos.');
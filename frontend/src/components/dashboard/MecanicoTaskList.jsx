@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
-import apiClient from '../../api/axios.js';
+import { obtenerTodas } from '../../api/paginacion.js';
 import { useUserStore } from '../../store/authStore.js';
 import styles from '../../css/mecanicotasklist.module.css';
 import { Wrench, Clock, AlertTriangle } from 'lucide-react';
@@ -51,10 +51,8 @@ export default function MecanicoTaskList() {
 
         const fetchTasks = async () => {
             try {
-                const response = await apiClient.get('/ordenes/');
-                const tasks = response.data.filter(orden =>
-                    orden.usuario_asignado === user.id && orden.estado !== 'Finalizado'
-                );
+                const activas = await obtenerTodas('/ordenes/?estado__ne=Finalizado');
+                const tasks = activas.filter(orden => orden.usuario_asignado === user.id);
                 setAssignedTasks(tasks);
             } catch (err) {
                 setError('No se pudieron cargar las tareas asignadas.');
@@ -6,6 +6,7 @@ import styles from '../../css/mainlayout.module.css';
 import Notificaciones from './Notificaciones.jsx';
 import AccordionMenu from './AccordionMenu.jsx';
 import apiClient from '../../api/axios.js';
+import { suscribirEventos } from '../../api/eventos.js';
 import ConfirmModal from '../modals/ConfirmModal.jsx';
 
 const navLinksByRole = {
@@ -285,9 +286,15 @@ export default function MainLayout() {
     };
 
     fetchUnreadCount();
-    const interval = setInterval(fetchUnreadCount, 30000);
-
-    return () => clearInterval(interval);
+    // Se vuelve a contar cuando el servidor avisa de actividad en el chat y
+    // al sincronizar (reconexión del stream, o cada 30 segundos sin él).
+    const cancelarChat = suscribirEventos('chat', fetchUnreadCount);
+    const cancelarSincronizar = suscribirEventos('sincronizar', fetchUnreadCount);
+
+    return () => {
+      cancelarChat();
+      cancelarSincronizar();
+    };
   }, []);
 
   const toggleSidebar = () => {
@@ -1,6 +1,8 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
 import apiClient from '../../api/axios';
+import { obtenerPagina } from '../../api/paginacion';
+import { suscribirEventos } from '../../api/eventos';
 import styles from '../../css/notificaciones.module.css';
 import { Bell } from 'lucide-react';
 
@@ -9,33 +11,49 @@ export default function Notificaciones() {
     const [isOpen, setIsOpen] = useState(false);
     const navigate = useNavigate();
 
-    const unreadCount = notificaciones.filter(n => !n.leida).length;
+    const [unreadCount, setUnreadCount] = useState(0);
 
     useEffect(() => {
        
-        const fetchNotificaciones = async () => {
+        const fetchNoLeidas = async () => {
             try {
-                const response = await apiClient.get('/notificaciones/');
-                setNotificaciones(response.data.results || response.data);
+                const response = await apiClient.get('/notificaciones/no-leidas/');
+                setUnreadCount(response.data.no_leidas);
             } catch (error) {
                 console.error("Error al cargar notificaciones:", error);
             }
         };
 
-        fetchNotificaciones();
-        const interval = setInterval(fetchNotificaciones, 30000); 
+        fetchNoLeidas();
+        // El servidor avisa cada cambio; 'sincronizar' cubre la reconexión y,
+        // si el stream no está disponible, la consulta cada 30 segundos.
+        const cancelarNoLeidas = suscribirEventos('no_leidas', (data) => setUnreadCount(data.no_leidas));
+        const cancelarNueva = suscribirEventos('notificacion', (data) => setUnreadCount(data.no_leidas));
+        const cancelarSincronizar = suscribirEventos('sincronizar', fetchNoLeidas);
 
-        return () => clearInterval(interval);
+        return () => {
+            cancelarNoLeidas();
+            cancelarNueva();
+            cancelarSincronizar();
+        };
     }, []);
 
     const handleToggle = async () => {
         setIsOpen(!isOpen);
+        if (isOpen) return;
+
+        try {
+            // Solo la primera página: las más recientes.
+            const { resultados } = await obtenerPagina('/notificaciones/');
+            setNotificaciones(resultados);
+        } catch (error) {
+            console.error("Error al cargar notificaciones:", error);
+        }
        
-        if (unreadCount > 0 && !isOpen) {
+        if (unreadCount > 0) {
             try {
                 await apiClient.post('/notificaciones/marcar-como-leidas/');
-               
-                setNotificaciones(notificaciones.map(n => ({ ...n, leida: true })));
+                setUnreadCount(0);
             } catch (error) {
                 console.error("Error al marcar notificaciones como leídas:", error);
             }
@@ -16,7 +16,7 @@ export default function ChatLayout() {
     const fetchRooms = async () => {
         if (!isLoading) setIsLoading(true); 
         try {
-            const response = await apiClient.get('/chat/rooms/');
+            const response = await apiClient.get('/chat/inbox/');
             setRooms(response.data.results || response.data);
         } catch (error) {
             console.error("Error al cargar las salas de chat:", error);
@@ -29,6 +29,12 @@ export default function ChatLayout() {
         fetchRooms();
     }, []);
 
+    const handleSelectRoom = (roomId) => {
+        // Al abrir la sala, ChatWindow confirma la lectura en el servidor.
+        setRooms(prev => prev.map(r => r.id === roomId ? { ...r, no_leidos: 0 } : r));
+        setSelectedRoomId(roomId);
+    };
+
     const handleNewChatSuccess = (newRoom) => {
         setIsModalOpen(false); 
         
@@ -59,7 +65,7 @@ export default function ChatLayout() {
                 <ChatSidebar
                     rooms={rooms}
                     currentUser={user}
-                    onSelectRoom={setSelectedRoomId}
+                    onSelectRoom={handleSelectRoom}
                     selectedRoomId={selectedRoomId}
                     isLoading={isLoading}
                     onNewChat={() => setIsModalOpen(true)}
@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useMemo } from 'react';
+import React, { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 
 
@@ -24,10 +24,6 @@ import { es } from 'date-fns/locale/es';
 import 'react-datepicker/dist/react-datepicker.css';
 registerLocale('es', es);
 
-const HORA_INICIO = 9;
-const HORA_FIN = 19;
-const DURACION_CITA_MINUTOS = 60;
-
 /**
  * @param {Date} date
  * @returns {string} 
@@ -48,7 +44,7 @@ export default function ConfirmarAsignarCita() {
     const [selectedDate, setSelectedDate] = useState(new Date());
     const [selectedMecanicoId, setSelectedMecanicoId] = useState('');
     const [selectedSlot, setSelectedSlot] = useState('');
-    const [agendaMecanico, setAgendaMecanico] = useState([]);
+    const [availableSlots, setAvailableSlots] = useState([]);
     const [isLoadingAgenda, setIsLoadingAgenda] = useState(false);
     const [isLoading, setIsLoading] = useState(true);
     const [error, setError] = useState(null);
@@ -103,73 +99,35 @@ export default function ConfirmarAsignarCita() {
     }, [id]);
 
 
+    // El servidor calcula los horarios libres (horario de atención, citas
+    // del mecánico y del vehículo, duración de la cita) en una sola consulta.
     useEffect(() => {
         if (!selectedMecanicoId || !selectedDate) {
-            setAgendaMecanico([]);
+            setAvailableSlots([]);
             return;
         }
 
-
         const fechaParaAPI = toLocalISOString(selectedDate);
 
-        const fetchAgendaMecanico = async () => {
+        const fetchHorarios = async () => {
             setIsLoadingAgenda(true);
             try {
                 const response = await apiClient.get(
-                    `/mecanicos/${selectedMecanicoId}/agenda/`,
-                    { params: { fecha: fechaParaAPI } }
+                    `/agendamientos/${id}/horarios-disponibles/`,
+                    { params: { desde: fechaParaAPI, mecanicos: selectedMecanicoId } }
                 );
-                setAgendaMecanico(response.data.results || response.data || []);
+                const mecanico = response.data.mecanicos[0];
+                setAvailableSlots(mecanico ? mecanico.inicios.map((inicio) => new Date(inicio)) : []);
             } catch (err) {
-                console.warn('No se pudo cargar la agenda del mecánico', err);
-                setAgendaMecanico([]);
+                console.warn('No se pudieron cargar los horarios disponibles', err);
+                setAvailableSlots([]);
             } finally {
                 setIsLoadingAgenda(false);
             }
         };
 
-        fetchAgendaMecanico();
-    }, [selectedMecanicoId, selectedDate]);
-
-    const availableSlots = useMemo(() => {
-        const slots = [];
-        const fechaString = toLocalISOString(selectedDate);
-        const dayStart = new Date(
-            `${fechaString}T${String(HORA_INICIO).padStart(2, '0')}:00:00`
-        );
-        const dayEnd = new Date(
-            `${fechaString}T${String(HORA_FIN).padStart(2, '0')}:00:00`
-        );
-
-        let currentSlotStart = new Date(dayStart);
-
-        while (currentSlotStart < dayEnd) {
-            slots.push(new Date(currentSlotStart));
-            currentSlotStart.setMinutes(
-                currentSlotStart.getMinutes() + DURACION_CITA_MINUTOS
-            );
-        }
-
-        const bookedTimes = agendaMecanico.map((cita) =>
-            new Date(cita.fecha_hora_programada).getTime()
-        );
-        const available = slots.filter(
-            (slot) => !bookedTimes.includes(slot.getTime())
-        );
-
-        const now = new Date();
-
-        const todayString = toLocalISOString(now);
-        const isToday = fechaString === todayString;
-
-        const nowWithMargin = new Date(now.getTime() + 5 * 60000);
-
-        if (isToday) {
-            return available.filter((slot) => slot.getTime() > nowWithMargin.getTime());
-        }
-
-        return available;
-    }, [selectedDate, agendaMecanico]);
+        fetchHorarios();
+    }, [id, selectedMecanicoId, selectedDate]);
 
 
     const handleSubmit = async (e) => {
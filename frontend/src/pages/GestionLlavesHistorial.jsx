@@ -1,23 +1,36 @@
 import React, { useState, useEffect } from 'react';
-import apiClient from '/src/api/axios.js';
+import { obtenerPagina } from '/src/api/paginacion.js';
 import styles from '../css/gestionllaves.module.css';
 import { History, FileWarning, Search } from 'lucide-react';
 
 const HistorialPrestamos = ({ searchTerm }) => {
     const [prestamos, setPrestamos] = useState([]);
+    const [siguiente, setSiguiente] = useState(null);
     const [isLoading, setIsLoading] = useState(true);
 
     useEffect(() => {
         setIsLoading(true);
         
-        apiClient.get('/prestamos-llaves/', {
+        obtenerPagina('/prestamos-llaves/', {
             params: { search: searchTerm } 
         })
-            .then(res => setPrestamos(res.data.results || res.data))
+            .then(pagina => {
+                setPrestamos(pagina.resultados);
+                setSiguiente(pagina.siguiente);
+            })
             .catch(err => console.error("Error cargando préstamos", err))
             .finally(() => setIsLoading(false));
     }, [searchTerm]);
 
+    const cargarMas = () => {
+        obtenerPagina(siguiente)
+            .then(pagina => {
+                setPrestamos(prev => [...prev, ...pagina.resultados]);
+                setSiguiente(pagina.siguiente);
+            })
+            .catch(err => console.error("Error cargando préstamos", err));
+    };
+
     if (isLoading) return <p className={styles.centeredMessage}>Cargando historial de préstamos...</p>;
 
     return (
@@ -52,6 +65,11 @@ const HistorialPrestamos = ({ searchTerm }) => {
                     </tbody>
                 </table>
             </div>
+            {siguiente && (
+                <button type="button" className={styles.loadMoreButton} onClick={cargarMas}>
+                    Cargar más
+                </button>
+            )}
         </div>
     );
 };
@@ -59,18 +77,31 @@ const HistorialPrestamos = ({ searchTerm }) => {
 
 const HistorialReportes = ({ searchTerm }) => {
     const [reportes, setReportes] = useState([]);
+    const [siguiente, setSiguiente] = useState(null);
     const [isLoading, setIsLoading] = useState(true);
 
     useEffect(() => {
         setIsLoading(true);
-        apiClient.get('/llaves-historial-estado/', {
+        obtenerPagina('/llaves-historial-estado/', {
             params: { search: searchTerm }
         })
-            .then(res => setReportes(res.data.results || res.data))
+            .then(pagina => {
+                setReportes(pagina.resultados);
+                setSiguiente(pagina.siguiente);
+            })
             .catch(err => console.error("Error cargando reportes", err))
             .finally(() => setIsLoading(false));
     }, [searchTerm]); 
 
+    const cargarMas = () => {
+        obtenerPagina(siguiente)
+            .then(pagina => {
+                setReportes(prev => [...prev, ...pagina.resultados]);
+                setSiguiente(pagina.siguiente);
+            })
+            .catch(err => console.error("Error cargando reportes", err));
+    };
+
     if (isLoading) return <p className={styles.centeredMessage}>Cargando historial de reportes...</p>;
 
     return (
@@ -107,6 +138,11 @@ const HistorialReportes = ({ searchTerm }) => {
                     </tbody>
                 </table>
             </div>
+            {siguiente && (
+                <button type="button" className={styles.loadMoreButton} onClick={cargarMas}>
+                    Cargar más
+                </button>
+            )}
         </div>
     );
 };
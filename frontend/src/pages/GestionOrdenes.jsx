@@ -1,6 +1,7 @@
 import React, { useState, useEffect, useMemo } from 'react';
 import { useNavigate } from 'react-router-dom';
 import apiClient from '../api/axios.js';
+import { obtenerTodas } from '../api/paginacion.js';
 import { useUserStore } from '../store/authStore';
 import styles from '../css/gestionordenes.module.css';
 import searchStyles from '../css/gestionusuarios.module.css';
@@ -81,11 +82,7 @@ export default function GestionOrdenes() {
 
         const fetchOrdenes = async () => {
             try {
-                const response = await apiClient.get('/ordenes/');
-                const todasLasOrdenes = response.data.results || response.data || [];
-                const ordenesActivas = todasLasOrdenes.filter(
-                    orden => orden.estado !== 'Finalizado'
-                );
+                const ordenesActivas = await obtenerTodas('/ordenes/?estado__ne=Finalizado');
                 setOrdenes(ordenesActivas);
             } catch (err) {
                 setError("No se pudieron cargar las órdenes de servicio.");
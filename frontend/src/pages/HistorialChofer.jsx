@@ -1,11 +1,12 @@
 import React, { useState, useEffect, useMemo } from 'react';
 import { useNavigate } from 'react-router-dom';
-import apiClient from '../api/axios.js';
+import { obtenerPagina } from '../api/paginacion.js';
 import styles from '../css/gestionagenda.module.css';
 import { History, Eye } from 'lucide-react';
 
 export default function HistorialChofer() {
     const [ordenes, setOrdenes] = useState([]);
+    const [siguiente, setSiguiente] = useState(null);
     const [isLoading, setIsLoading] = useState(true);
     const [error, setError] = useState(null);
     const navigate = useNavigate();
@@ -14,14 +15,9 @@ export default function HistorialChofer() {
         const fetchHistorial = async () => {
             try {
 
-                const response = await apiClient.get('/ordenes/');
-                const todasLasOrdenes = response.data.results || response.data || [];
-
-                const finalizadas = todasLasOrdenes.filter(o => o.estado === 'Finalizado');
-
-                finalizadas.sort((a, b) => new Date(b.fecha_entrega_real) - new Date(a.fecha_entrega_real));
-
-                setOrdenes(finalizadas);
+                const pagina = await obtenerPagina('/ordenes/?estado=Finalizado');
+                setOrdenes(pagina.resultados);
+                setSiguiente(pagina.siguiente);
             } catch (err) {
                 setError("No se pudo cargar tu historial de servicios.");
             } finally {
@@ -32,6 +28,16 @@ export default function HistorialChofer() {
         fetchHistorial();
     }, []);
 
+    const cargarMas = async () => {
+        try {
+            const pagina = await obtenerPagina(siguiente);
+            setOrdenes(prev => [...prev, ...pagina.resultados]);
+            setSiguiente(pagina.siguiente);
+        } catch (err) {
+            setError("No se pudo cargar tu historial de servicios.");
+        }
+    };
+
     if (isLoading) return <p>Cargando historial...</p>;
     if (error) return <p style={{ color: 'red' }}>{error}</p>;
 
@@ -87,6 +93,11 @@ export default function HistorialChofer() {
                         </tbody>
                     </table>
                 </div>
+                {siguiente && (
+                    <button type="button" className={styles.loadMoreButton} onClick={cargarMas}>
+                        Cargar más
+                    </button>
+                )}
             </div>
         </div>
     );
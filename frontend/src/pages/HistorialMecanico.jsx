@@ -1,6 +1,7 @@
 import React, { useState, useEffect, useMemo } from 'react';
 import { useNavigate } from 'react-router-dom';
 import apiClient from '../api/axios.js';
+import { obtenerPagina } from '../api/paginacion.js';
 import styles from '../css/gestionagenda.module.css';
 import searchStyles from '../css/gestionusuarios.module.css';
 import { useUserStore } from '../store/authStore.js';
@@ -68,6 +69,7 @@ const ModalCambiarEstado = ({ orden, onClose, onSave }) => {
 export default function HistorialMecanico() {
 
     const [ordenes, setOrdenes] = useState([]);
+    const [siguiente, setSiguiente] = useState(null);
     const [isLoading, setIsLoading] = useState(true);
     const [error, setError] = useState(null);
     const navigate = useNavigate();
@@ -80,14 +82,9 @@ export default function HistorialMecanico() {
         const fetchHistorialMecanico = async () => {
             try {
 
-                const response = await apiClient.get('/ordenes/');
-                const todasMisOrdenes = response.data.results || response.data || [];
-                const finalizadas = todasMisOrdenes.filter(o => o.estado === 'Finalizado');
-
-
-                finalizadas.sort((a, b) => new Date(b.fecha_entrega_real) - new Date(a.fecha_entrega_real));
-
-                setOrdenes(finalizadas);
+                const pagina = await obtenerPagina('/ordenes/?estado=Finalizado');
+                setOrdenes(pagina.resultados);
+                setSiguiente(pagina.siguiente);
             } catch (err) {
                 setError("No se pudo cargar tu historial de trabajos.");
             } finally {
@@ -120,6 +117,16 @@ export default function HistorialMecanico() {
         }
     };
 
+    const cargarMas = async () => {
+        try {
+            const pagina = await obtenerPagina(siguiente);
+            setOrdenes(prev => [...prev, ...pagina.resultados]);
+            setSiguiente(pagina.siguiente);
+        } catch (err) {
+            setError("No se pudo cargar tu historial de trabajos.");
+        }
+    };
+
     if (isLoading) return <p>Cargando historial...</p>;
     if (error) return <p style={{ color: 'red' }}>{error}</p>;
 
@@ -209,6 +216,11 @@ export default function HistorialMecanico() {
                         </tbody>
                     </table>
                 </div>
+                {siguiente && (
+                    <button type="button" className={styles.loadMoreButton} onClick={cargarMas}>
+                        Cargar más
+                    </button>
+                )}
             </div>
             {ordenSeleccionada && (
                 <ModalCambiarEstado
@@ -1,5 +1,5 @@
 import React, { useState, useEffect, useMemo } from 'react';
-import apiClient from '/src/api/axios.js';
+import { obtenerPagina } from '/src/api/paginacion.js';
 import styles from '../css/gestionllaves.module.css'; 
 import { History, Search, Clock, LogIn, LogOut } from 'lucide-react';
 
@@ -8,6 +8,7 @@ export default function HistorialSeguridad() {
     const [isLoading, setIsLoading] = useState(true);
     const [error, setError] = useState(null);
     const [searchTerm, setSearchTerm] = useState('');
+    const [siguiente, setSiguiente] = useState(null);
 
     useEffect(() => {
         setIsLoading(true);
@@ -17,10 +18,11 @@ export default function HistorialSeguridad() {
         const fetchHistorial = async () => {
             try {
             
-                const response = await apiClient.get('/historial-seguridad/', {
+                const pagina = await obtenerPagina('/historial-seguridad/', {
                     params: { search: searchTerm }
                 });
-                setHistorial(response.data.results || response.data || []);
+                setHistorial(pagina.resultados);
+                setSiguiente(pagina.siguiente);
             } catch (err) {
                 setError("No se pudo cargar el historial de movimientos.");
             } finally {
@@ -35,6 +37,16 @@ export default function HistorialSeguridad() {
         return () => clearTimeout(timerId); 
     }, [searchTerm]);
 
+    const cargarMas = async () => {
+        try {
+            const pagina = await obtenerPagina(siguiente);
+            setHistorial(prev => [...prev, ...pagina.resultados]);
+            setSiguiente(pagina.siguiente);
+        } catch (err) {
+            setError("No se pudo cargar el historial de movimientos.");
+        }
+    };
+
     const formatFecha = (fechaISO) => {
         if (!fechaISO) return null;
         return new Date(fechaISO).toLocaleString('es-CL');
@@ -105,6 +117,11 @@ export default function HistorialSeguridad() {
                         </tbody>
                     </table>
                 </div>
+                {siguiente && !isLoading && (
+                    <button type="button" className={styles.loadMoreButton} onClick={cargarMas}>
+                        Cargar más
+                    </button>
+                )}
             </div>
         </div>
     );
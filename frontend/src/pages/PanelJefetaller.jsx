@@ -1,6 +1,6 @@
 import React, { useState, useEffect, useMemo } from 'react';
 import { useNavigate } from 'react-router-dom';
-import apiClient from '/src/api/axios.js';
+import { obtenerTodas } from '/src/api/paginacion.js';
 import { useUserStore } from '/src/store/authStore.js';
 import styles from '../css/gestionagenda.module.css';
 import { Check, Edit, CalendarCheck } from 'lucide-react';
@@ -17,8 +17,8 @@ export default function PanelJefetaller() {
         const loadAgendamientos = async () => {
             try {
 
-                const res = await apiClient.get('/agendamientos/?estado__ne=Finalizado&estado__ne=Cancelado');
-                setAgendamientos(res.data.results || res.data || []);
+                const citas = await obtenerTodas('/agendamientos/?estado=Programado&estado=Confirmado');
+                setAgendamientos(citas);
             } catch (err) {
                 setError("No se pudieron cargar las citas.");
             } finally {